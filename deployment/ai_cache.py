@@ -0,0 +1,219 @@
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from collections import defaultdict
+
+DAY = 24 * 3600
+# How long each kind of AI answer is reused; the same question gets the same advice for every user
+DEFAULT_TTLS = {
+    'quick_tip': 30 * DAY,
+    'storage_tip': 30 * DAY,
+    'recipe': 7 * DAY,
+    'recipes': 7 * DAY,
+    # Sets where a variant failed or timed out, shown on the dashboard until the next attempt
+    'recipes_partial': 10 * 60,
+    'meal_plan': DAY
+}
+
+
+def normalize_text(text):
+    """Lowercase with runs of whitespace collapsed, so "Whole  Milk" and "whole milk" share an entry"""
+    return ' '.join(str(text).lower().split())
+
+
+def normalize_items(items):
+    """Order-insensitive form of an ingredient list"""
+    return sorted({normalize_text(item) for item in items if normalize_text(item)})
+
+
+class _Flight:
+    """One in-progress computation that identical concurrent requests wait on"""
+    
+    def __init__(self, cache_key):
+        self.cache_key = cache_key
+        self.done = threading.Event()
+        self.value = None
+        self.error = None
+
+
+class AIResponseCache:
+    """Persistent LRU cache of AI assistant answers keyed on the kind of request and its normalized input,
+    shared by every user, with a TTL per kind"""
+    
+    def __init__(self, path='ai_cache.db', max_entries=5000, ttls=None):
+        self.path = path
+        self.max_entries = max_entries
+        self.ttls = dict(DEFAULT_TTLS, **(ttls or {}))
+        self.hits = defaultdict(int)
+        # Misses are model calls; requests that waited on an identical one in flight count as coalesced
+        self.misses = defaultdict(int)
+        self.coalesced = defaultdict(int)
+        self.evictions = 0
+        self.expirations = 0
+        self._lock = threading.Lock()
+        self._flights = {}
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._init_db()
+    
+    def _init_db(self):
+        with self._lock:
+            self._conn.executescript('''
+                CREATE TABLE IF NOT EXISTS ai_responses (
+                    cache_key TEXT PRIMARY KEY,
+                    kind TEXT NOT NULL,
+                    response TEXT NOT NULL,
+                    created_at REAL NOT NULL,
+                    expires_at REAL NOT NULL,
+                    last_used REAL NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS idx_ai_responses_last_used ON ai_responses(last_used);
+                CREATE INDEX IF NOT EXISTS idx_ai_responses_expires_at ON ai_responses(expires_at);
+            ''')
+            self._conn.commit()
+    
+    @staticmethod
+    def make_key(kind, request):
+        """Cache key for a kind of request and its (already normalized) JSON-serializable input"""
+        payload = json.dumps([kind, request], sort_keys=True, separators=(',', ':'))
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+    
+    def _lookup(self, cache_key):
+        """Cached response text, None if missing; an expired entry is deleted. Caller holds the lock"""
+        now = time.time()
+        row = self._conn.execute('SELECT response, expires_at FROM ai_responses WHERE cache_key = ?',
+                                 (cache_key,)).fetchone()
+        if row is None:
+            return None
+        if row[1] <= now:
+            self._conn.execute('DELETE FROM ai_responses WHERE cache_key = ?', (cache_key,))
+            self._conn.commit()
+            self.expirations += 1
+            return None
+        self._conn.execute('UPDATE ai_responses SET last_used = ? WHERE cache_key = ?', (now, cache_key))
+        self._conn.commit()
+        return row[0]
+    
+    def get(self, kind, request):
+        """Return the cached answer, or None on a miss or once it has expired"""
+        with self._lock:
+            response = self._lookup(self.make_key(kind, request))
+            if response is None:
+                self.misses[kind] += 1
+                return None
+            self.hits[kind] += 1
+        return json.loads(response)
+    
+    def peek(self, kind, request):
+        """Like get(), for showing an answer only if one exists; not counted as a hit or a miss"""
+        with self._lock:
+            response = self._lookup(self.make_key(kind, request))
+        return None if response is None else json.loads(response)
+    
+    def put(self, kind, request, response):
+        """Store an answer, dropping expired entries and the least recently used past max_entries"""
+        now = time.time()
+        with self._lock:
+            self._conn.execute('''
+                INSERT OR REPLACE INTO ai_responses
+                (cache_key, kind, response, created_at, expires_at, last_used)
+                VALUES (?, ?, ?, ?, ?, ?)
+            ''', (self.make_key(kind, request), kind, json.dumps(response), now, now + self.ttls[kind], now))
+            
+            cursor = self._conn.execute('DELETE FROM ai_responses WHERE expires_at <= ?', (now,))
+            self.expirations += cursor.rowcount
+            cursor = self._conn.execute('''
+                DELETE FROM ai_responses WHERE cache_key IN (
+                    SELECT cache_key FROM ai_responses
+                    ORDER BY last_used ASC
+                    LIMIT max(0, (SELECT COUNT(*) FROM ai_responses) - ?)
+                )
+            ''', (self.max_entries,))
+            self.evictions += cursor.rowcount
+            self._conn.commit()
+    
+    def invalidate(self, kind, request):
+        cache_key = self.make_key(kind, request)
+        with self._lock:
+            self._conn.execute('DELETE FROM ai_responses WHERE cache_key = ?', (cache_key,))
+            self._conn.commit()
+    
+    def begin(self, kind, request):
+        """Look up an answer, joining any identical request already computing it.
+        Returns (answer, None, False) on a hit, otherwise (None, flight, leader): the leader computes the
+        answer and hands it to finish(), the others wait on flight.done and read flight.value"""
+        cache_key = self.make_key(kind, request)
+        with self._lock:
+            response = self._lookup(cache_key)
+            if response is not None:
+                self.hits[kind] += 1
+                return json.loads(response), None, False
+            flight = self._flights.get(cache_key)
+            if flight is None:
+                flight = self._flights[cache_key] = _Flight(cache_key)
+                self.misses[kind] += 1
+                return None, flight, True
+            self.coalesced[kind] += 1
+            return None, flight, False
+    
+    def finish(self, kind, request, flight, value=None, error=None, cacheable=bool):
+        """End the leader's flight with its answer (or error), storing the answer if it passes cacheable"""
+        flight.value = value
+        flight.error = error
+        try:
+            if error is None and cacheable(value):
+                self.put(kind, request, value)
+        finally:
+            with self._lock:
+                del self._flights[flight.cache_key]
+            flight.done.set()
+    
+    def get_or_compute(self, kind, request, compute, cacheable=bool):
+        """Cached answer, or compute() once however many identical requests arrive meanwhile.
+        Only answers passing cacheable (e.g. not an API error) are stored"""
+        response, flight, leader = self.begin(kind, request)
+        if flight is None:
+            return response
+        if not leader:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.value
+        
+        try:
+            value = compute()
+        except Exception as e:
+            self.finish(kind, request, flight, error=e)
+            raise
+        self.finish(kind, request, flight, value, cacheable=cacheable)
+        return value
+    
+    def stats(self):
+        with self._lock:
+            entries = self._conn.execute('SELECT COUNT(*) FROM ai_responses').fetchone()[0]
+            kinds = sorted(set(self.hits) | set(self.misses) | set(self.coalesced))
+            per_kind = {}
+            for kind in kinds:
+                lookups = self.hits[kind] + self.misses[kind] + self.coalesced[kind]
+                per_kind[kind] = {
+                    'hits': self.hits[kind],
+                    'misses': self.misses[kind],
+                    'coalesced': self.coalesced[kind],
+                    'hit_rate': round(self.hits[kind] / lookups, 3) if lookups else 0.0
+                }
+            hits = sum(self.hits.values())
+            misses = sum(self.misses.values())
+            coalesced = sum(self.coalesced.values())
+        lookups = hits + misses + coalesced
+        return {
+            'entries': entries,
+            'max_entries': self.max_entries,
+            'hits': hits,
+            'misses': misses,
+            'coalesced': coalesced,
+            'evictions': self.evictions,
+            'expirations': self.expirations,
+            'hit_rate': round(hits / lookups, 3) if lookups else 0.0,
+            'kinds': per_kind
+        }
@@ -0,0 +1,151 @@
+import json
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from ai_cache import normalize_items
+
+# /ai/generate-recipes asks for a plain recipe and a quick one, side by side
+RECIPE_VARIANTS = (None, 'quick and easy')
+# Seconds between SSE comments while waiting on an identical generation, so proxies keep the stream open
+KEEPALIVE_SECONDS = 5
+
+
+def sse(event, data):
+    """One server-sent event with a JSON payload"""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+def cache_partial_recipes(cache, request, recipes):
+    """Keep a set missing some variants briefly so the dashboard shows it; generating again still retries"""
+    if 0 < len(recipes) < len(RECIPE_VARIANTS):
+        cache.put('recipes_partial', request, recipes)
+
+
+class AICallPool:
+    """Threads for model calls, so the independent calls behind one request run at the same time and
+    each is bounded by a timeout"""
+    
+    def __init__(self, max_workers=4, timeout=30):
+        self.timeout = timeout
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='ai-call')
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.timeouts = 0
+        self.failures = 0
+    
+    def recipe_results(self, assistant, ingredients, variants=RECIPE_VARIANTS):
+        """Yield (variant, recipe, error) as each variant finishes, error being None, 'failed' or 'timeout'.
+        All variants start together and share one deadline of timeout seconds"""
+        generate = assistant.generate_recipe_from_ingredients
+        futures = {self._executor.submit(generate, ingredients, variant): variant for variant in variants}
+        with self._lock:
+            self.calls += len(futures)
+        deadline = time.monotonic() + self.timeout
+        pending = set(futures)
+        while pending:
+            done, pending = wait(pending, timeout=max(0.0, deadline - time.monotonic()),
+                                 return_when=FIRST_COMPLETED)
+            if not done:
+                break
+            for future in done:
+                try:
+                    recipe = future.result()
+                except Exception as e:
+                    print(f"AI recipe error: {e}")
+                    recipe = None
+                if recipe and recipe.get('recipe_name'):
+                    yield futures[future], recipe, None
+                else:
+                    with self._lock:
+                        self.failures += 1
+                    yield futures[future], None, 'failed'
+        
+        # A call already running cannot be interrupted; its thread is freed when the API call returns
+        for future in pending:
+            future.cancel()
+            with self._lock:
+                self.timeouts += 1
+            yield futures[future], None, 'timeout'
+    
+    def generate_recipes(self, assistant, ingredients, variants=RECIPE_VARIANTS):
+        """Recipes that finished in time, in variant order, and the number that timed out"""
+        recipes = {}
+        timed_out = 0
+        for variant, recipe, error in self.recipe_results(assistant, ingredients, variants):
+            if recipe:
+                recipes[variant] = recipe
+            elif error == 'timeout':
+                timed_out += 1
+        return [recipes[variant] for variant in variants if variant in recipes], timed_out
+    
+    def stats(self):
+        with self._lock:
+            return {
+                'calls': self.calls,
+                'timeouts': self.timeouts,
+                'failures': self.failures,
+                'timeout_seconds': self.timeout
+            }
+
+
+def recipe_stream(pool, assistant, ingredients, cache):
+    """Server-sent events for /ai/generate-recipes/stream: a 'recipe' event per recipe as soon as it is
+    ready, then 'done'. Shares the cache and the in-flight generation with the non-streaming route"""
+    # Sent at once so the browser sees the response start before the first model call returns
+    yield ": generating\n\n"
+    request = normalize_items(ingredients)
+    cached, flight, leader = cache.begin('recipes', request)
+    if flight is None:
+        for recipe in cached:
+            yield sse('recipe', recipe)
+        yield sse('done', {'count': len(cached), 'timed_out': 0, 'cached': True})
+        return
+    
+    if not leader:
+        # The same items are already being generated (another user, tab or route); replay that result
+        while not flight.done.wait(KEEPALIVE_SECONDS):
+            yield ": waiting\n\n"
+        recipes = flight.value or []
+        for recipe in recipes:
+            yield sse('recipe', recipe)
+        yield sse('done', {'count': len(recipes), 'timed_out': 0, 'cached': False})
+        return
+    
+    found = {}
+    timed_out = 0
+    try:
+        for variant, recipe, error in pool.recipe_results(assistant, ingredients):
+            if recipe:
+                found[variant] = recipe
+                yield sse('recipe', recipe)
+            elif error == 'timeout':
+                timed_out += 1
+    finally:
+        # Also reached when the browser disconnects, so waiting requests are released
+        recipes = [found[variant] for variant in RECIPE_VARIANTS if variant in found]
+        cache_partial_recipes(cache, request, recipes)
+        cache.finish('recipes', request, flight, recipes,
+                     cacheable=lambda recipes: len(recipes) == len(RECIPE_VARIANTS))
+    yield sse('done', {'count': len(recipes), 'timed_out': timed_out, 'cached': False})
+
+
+def chat_stream(assistant, message, context):
+    """Server-sent events for one chat reply: 'token' events as the text arrives, then 'done'.
+    Assistants without stream_chat() send their whole reply as one token"""
+    yield ": thinking\n\n"
+    try:
+        if hasattr(assistant, 'stream_chat'):
+            for text in assistant.stream_chat(message, context):
+                yield sse('token', {'text': text})
+        else:
+            result = assistant.chat_with_assistant(message, context)
+            if not result['success']:
+                yield sse('error', {'message': result['response']})
+                return
+            yield sse('token', {'text': result['response']})
+    except Exception as e:
+        print(f"AI chat error: {e}")
+        yield sse('error', {'message': 'The AI assistant is unavailable'})
+        return
+    yield sse('done', {})
@@ -1,20 +1,25 @@
-from flask import Flask, render_template, request, redirect, url_for, flash, session, jsonify
+from flask import Flask, render_template, request, redirect, url_for, flash, session, jsonify, Response
 from werkzeug.security import generate_password_hash, check_password_hash
-from werkzeug.utils import secure_filename
-import mysql.connector
-from datetime import datetime, timedelta
+from datetime import datetime
 import os
-import json
-from ocr_model import ExpiryDateExtractor
-import smtplib
-from email.mime.text import MIMEText
-from email.mime.multipart import MIMEMultipart
+import time
+import zipfile
+from ocr_jobs import OCRJobQueue, queue_upload, read_zip_images
+from ocr_cache import OCRResultCache
+from db_pool import MySQLConnectionPool, init_app
+from change_feed import change_stream
+from food_csv import export_csv, import_csv
+from notifier import NotificationEngine, smtp_config_from_env
+from recipe_index import RecipeIndex
+from repository import (DatabaseUnavailable, MAX_PAGE_SIZE, PAGE_SIZE, MySQLRepository, food_item_dict,
+                        valid_food_items)
 
 app = Flask(__name__)
 app.secret_key = 'your_secret_key_here_change_in_production'
 app.config['UPLOAD_FOLDER'] = 'static/uploads'
 app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # 16MB max file size
 app.config['ALLOWED_EXTENSIONS'] = {'png', 'jpg', 'jpeg', 'gif', 'bmp'}
+app.config['MAX_BATCH_FILES'] = 32  # images per /upload/batch request, lowered to the OCR queue size below
 
 # Database configuration
 DB_CONFIG = {
@@ -24,104 +29,48 @@ DB_CONFIG = {
     'database': 'food_expiry_tracker'
 }
 
-# Email configuration (optional)
-EMAIL_CONFIG = {
-    'smtp_server': 'smtp.gmail.com',
-    'smtp_port': 587,
-    'email': 'your_email@gmail.com',
-    'password': 'your_app_password'
-}
+# Connections are reused across requests; each request checks one out and returns it at teardown
+db_pool = MySQLConnectionPool(DB_CONFIG, size=10, timeout=5)
+init_app(app, db_pool)
 
-# Initialize OCR extractor
-ocr_extractor = ExpiryDateExtractor()
+# Every query the app runs (shared with app_sqlite.py), as prepared statements on the pool
+repository = MySQLRepository(db_pool)
 
-def get_db_connection():
-    """Create database connection"""
-    try:
-        conn = mysql.connector.connect(**DB_CONFIG)
-        return conn
-    except mysql.connector.Error as e:
-        print(f"Database connection error: {e}")
-        return None
+# Hourly status transitions and per-user expiry email digests (notifications table);
+# emails are only sent when SMTP_EMAIL/SMTP_PASSWORD are set
+notification_engine = NotificationEngine(db_pool, smtp_config=smtp_config_from_env(), interval=3600)
+
+# OCR results cached by image content, shared across users
+ocr_cache = OCRResultCache('ocr_cache.db', max_entries=1000)
+
+# OCR runs in a bounded pool of worker processes, off the request thread
+ocr_queue = OCRJobQueue(
+    max_workers=2,
+    max_pending=32,
+    extractor_options={
+        'short_circuit': True,   # skip the PSM 11 pass when PSM 6 already found a date
+        'detect_regions': True   # OCR the text-line crops first, whole image only as fallback
+    },
+    cache=ocr_cache
+)
+# A batch never holds more images than the OCR queue accepts
+app.config['MAX_BATCH_FILES'] = min(app.config['MAX_BATCH_FILES'], ocr_queue.max_pending)
+
+# Recipe catalogue indexed by ingredient once at startup, reloaded when the file changes
+recipe_index = RecipeIndex('recipes.json')
 
 def allowed_file(filename):
     """Check if file extension is allowed"""
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in app.config['ALLOWED_EXTENSIONS']
 
-def update_food_status():
-    """Update food item status based on expiry date"""
-    conn = get_db_connection()
-    if not conn:
-        return
-    
-    cursor = conn.cursor()
-    today = datetime.now().date()
-    near_expiry_date = today + timedelta(days=3)
-    
-    # Update statuses
-    cursor.execute("""
-        UPDATE food_items 
-        SET status = CASE
-            WHEN expiry_date < %s THEN 'Expired'
-            WHEN expiry_date BETWEEN %s AND %s THEN 'Near Expiry'
-            ELSE 'Fresh'
-        END
-    """, (today, today, near_expiry_date))
-    
-    conn.commit()
-    cursor.close()
-    conn.close()
-
-def send_email_notification(user_email, food_name, expiry_date):
-    """Send email notification for near expiry items"""
-    try:
-        msg = MIMEMultipart()
-        msg['From'] = EMAIL_CONFIG['email']
-        msg['To'] = user_email
-        msg['Subject'] = f'Food Expiry Alert: {food_name}'
-        
-        body = f"""
-        Hello,
-        
-        This is a reminder that your food item "{food_name}" is expiring soon.
-        
-        Expiry Date: {expiry_date}
-        
-        Please consume or use it before it expires to avoid food waste.
-        
-        Best regards,
-        Food Expiry Tracker
-        """
-        
-        msg.attach(MIMEText(body, 'plain'))
-        
-        server = smtplib.SMTP(EMAIL_CONFIG['smtp_server'], EMAIL_CONFIG['smtp_port'])
-        server.starttls()
-        server.login(EMAIL_CONFIG['email'], EMAIL_CONFIG['password'])
-        server.send_message(msg)
-        server.quit()
-        
-        return True
-    except Exception as e:
-        print(f"Email notification error: {e}")
-        return False
+def file_extension(filename):
+    """Lowercase extension of a filename allowed_file() accepted"""
+    return filename.rsplit('.', 1)[1].lower()
 
 def get_recipe_suggestions(food_items):
-    """Get recipe suggestions based on near expiry items"""
+    """Recipes using as many of the near expiry items as possible, soonest-expiring first"""
     try:
-        with open('recipes.json', 'r') as f:
-            recipes = json.load(f)
-        
-        suggestions = []
-        for food in food_items:
-            food_name_lower = food['food_name'].lower()
-            for recipe in recipes:
-                ingredients_lower = [ing.lower() for ing in recipe['ingredients']]
-                if any(food_name_lower in ing or ing in food_name_lower for ing in ingredients_lower):
-                    if recipe not in suggestions:
-                        suggestions.append(recipe)
-        
-        return suggestions[:5]  # Return top 5 suggestions
+        return recipe_index.cover([(food.food_name, food.days_remaining) for food in food_items], limit=5)
     except Exception as e:
         print(f"Recipe suggestion error: {e}")
         return []
@@ -142,22 +91,16 @@ def login():
         username = request.form.get('username')
         password = request.form.get('password')
         
-        conn = get_db_connection()
-        if not conn:
+        try:
+            user = repository.get_user_by_username(username)
+        except DatabaseUnavailable:
             flash('Database connection error', 'error')
             return render_template('login.html')
         
-        cursor = conn.cursor(dictionary=True)
-        cursor.execute('SELECT * FROM users WHERE username = %s', (username,))
-        user = cursor.fetchone()
-        
-        cursor.close()
-        conn.close()
-        
-        if user and check_password_hash(user['password_hash'], password):
-            session['user_id'] = user['id']
-            session['username'] = user['username']
-            session['email'] = user['email']
+        if user and check_password_hash(user.password_hash, password):
+            session['user_id'] = user.id
+            session['username'] = user.username
+            session['email'] = user.email
             flash('Login successful!', 'success')
             return redirect(url_for('index'))
         else:
@@ -178,26 +121,16 @@ def signup():
             flash('Passwords do not match', 'error')
             return render_template('signup.html')
         
-        conn = get_db_connection()
-        if not conn:
+        try:
+            created = repository.create_user(username, email, generate_password_hash(password))
+        except DatabaseUnavailable:
             flash('Database connection error', 'error')
             return render_template('signup.html')
         
-        cursor = conn.cursor()
-        
-        try:
-            password_hash = generate_password_hash(password)
-            cursor.execute('INSERT INTO users (username, email, password_hash) VALUES (%s, %s, %s)',
-                         (username, email, password_hash))
-            conn.commit()
+        if created:
             flash('Account created successfully! Please login.', 'success')
-            cursor.close()
-            conn.close()
             return redirect(url_for('login'))
-        except mysql.connector.Error as e:
-            flash('Username or email already exists', 'error')
-            cursor.close()
-            conn.close()
+        flash('Username or email already exists', 'error')
     
     return render_template('signup.html')
 
@@ -214,31 +147,20 @@ def index():
     if 'user_id' not in session:
         return redirect(url_for('login'))
     
-    update_food_status()
-    
-    conn = get_db_connection()
-    if not conn:
+    # First page only; main.js fetches the rest from /api/food_items
+    # main.js keeps the page current from /api/changes, starting at this revision
+    try:
+        revision = repository.current_revision(session['user_id'])
+        food_items, next_cursor = repository.list_items_page(session['user_id'])
+    except DatabaseUnavailable:
         flash('Database connection error', 'error')
-        return render_template('index.html', food_items=[])
+        return render_template('index.html', food_items=[], next_cursor=None, revision=0)
     
-    cursor = conn.cursor(dictionary=True)
-    cursor.execute('''
-        SELECT id, food_name, expiry_date, purchase_date, status, category, quantity, 
-               DATEDIFF(expiry_date, CURDATE()) as days_remaining
-        FROM food_items 
-        WHERE user_id = %s 
-        ORDER BY expiry_date ASC
-    ''', (session['user_id'],))
-    
-    food_items = cursor.fetchall()
-    cursor.close()
-    conn.close()
-    
-    return render_template('index.html', food_items=food_items)
+    return render_template('index.html', food_items=food_items, next_cursor=next_cursor, revision=revision)
 
 @app.route('/upload', methods=['POST'])
 def upload_file():
-    """Handle file upload and OCR processing"""
+    """Handle file upload and queue it for OCR processing"""
     if 'user_id' not in session:
         return jsonify({'success': False, 'message': 'Please login first'})
     
@@ -251,42 +173,94 @@ def upload_file():
         return jsonify({'success': False, 'message': 'No file selected'})
     
     if file and allowed_file(file.filename):
-        filename = secure_filename(file.filename)
-        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-        filename = f"{timestamp}_{filename}"
-        filepath = os.path.join(app.config['UPLOAD_FOLDER'], filename)
-        file.save(filepath)
-        
-        try:
-            # Extract expiry date using OCR
-            expiry_date, extracted_text = ocr_extractor.extract_expiry_date(filepath)
-            food_name = ocr_extractor.extract_food_name(extracted_text)
-            
-            if expiry_date:
-                return jsonify({
-                    'success': True,
-                    'expiry_date': expiry_date,
-                    'food_name': food_name,
-                    'image_path': filename,
-                    'message': 'Expiry date extracted successfully'
-                })
-            else:
-                return jsonify({
-                    'success': False,
-                    'food_name': food_name,
-                    'image_path': filename,
-                    'message': 'Could not extract expiry date. Please enter manually.',
-                    'extracted_text': extracted_text
-                })
-        except Exception as e:
-            return jsonify({
-                'success': False,
-                'message': f'OCR processing error: {str(e)}',
-                'image_path': filename
-            })
+        result, status = queue_upload(ocr_queue, ocr_cache, file.read(), file_extension(file.filename),
+                                      app.config['UPLOAD_FOLDER'], owner=session['user_id'])
+        return jsonify(result), status
     
     return jsonify({'success': False, 'message': 'Invalid file format'})
 
+@app.route('/upload/status/<job_id>')
+def upload_status(job_id):
+    """Poll the result of a queued OCR job"""
+    if 'user_id' not in session:
+        return jsonify({'success': False, 'message': 'Please login first'})
+    
+    result = ocr_queue.status(job_id, owner=session['user_id'])
+    if result is None:
+        return jsonify({'success': False, 'status': 'unknown', 'message': 'OCR job not found'}), 404
+    
+    return jsonify(result)
+
+@app.route('/upload/batch', methods=['POST'])
+def upload_batch():
+    """Queue many images, or a zip of images, for OCR in one request"""
+    if 'user_id' not in session:
+        return jsonify({'success': False, 'message': 'Please login first'})
+    
+    files = request.files.getlist('files') or request.files.getlist('file')
+    if not files:
+        return jsonify({'success': False, 'message': 'No file uploaded'})
+    
+    too_many = {
+        'success': False,
+        'message': f"Too many images (max {app.config['MAX_BATCH_FILES']} per batch)"
+    }
+    images = []
+    for file in files:
+        if file.filename.lower().endswith('.zip'):
+            try:
+                images.extend(read_zip_images(file.stream, app.config['ALLOWED_EXTENSIONS'],
+                                              app.config['MAX_BATCH_FILES'] - len(images),
+                                              app.config['MAX_CONTENT_LENGTH']))
+            except zipfile.BadZipFile:
+                return jsonify({'success': False, 'message': f'Invalid zip file: {file.filename}'})
+            except ValueError:
+                return jsonify(too_many)
+        elif allowed_file(file.filename):
+            images.append((file.filename, file.read()))
+    
+    if not images:
+        return jsonify({'success': False, 'message': 'No valid images found'})
+    if len(images) > app.config['MAX_BATCH_FILES']:
+        return jsonify(too_many)
+    # All or nothing, rather than queueing the first few and rejecting the rest
+    if len(images) > ocr_queue.free_slots():
+        return jsonify({'success': False, 'message': 'OCR queue is busy. Please try again in a moment.'}), 503
+    
+    # Jobs run in parallel across the OCR worker pool
+    items = []
+    rejected = 0
+    for name, data in images:
+        result, status = queue_upload(ocr_queue, ocr_cache, data, file_extension(name),
+                                      app.config['UPLOAD_FOLDER'], owner=session['user_id'])
+        result['filename'] = name
+        items.append(result)
+        # Other requests can still fill the queue in the meantime
+        if status == 503:
+            rejected += 1
+    
+    response = {'success': rejected < len(items), 'count': len(items), 'rejected': rejected, 'items': items}
+    if rejected:
+        response['message'] = f"{rejected} of {len(items)} images were not queued, the OCR queue is busy"
+        return jsonify(response), 207 if rejected < len(items) else 503
+    return jsonify(response), 202
+
+@app.route('/upload/batch/status')
+def upload_batch_status():
+    """Poll several OCR jobs at once (?job_ids=a,b,c)"""
+    if 'user_id' not in session:
+        return jsonify({'success': False, 'message': 'Please login first'})
+    
+    job_ids = [job_id for job_id in request.args.get('job_ids', '').split(',') if job_id]
+    items = []
+    for job_id in job_ids:
+        result = ocr_queue.status(job_id, owner=session['user_id'])
+        items.append(result or {'success': False, 'status': 'unknown', 'job_id': job_id,
+                                'message': 'OCR job not found'})
+    
+    pending = sum(1 for item in items if item['status'] == 'pending')
+    return jsonify({'success': True, 'pending': pending, 'items': items})
+
 @app.route('/add_food', methods=['POST'])
 def add_food():
     """Add food item to database"""
@@ -294,37 +268,113 @@ def add_food():
         flash('Please login first', 'error')
         return redirect(url_for('login'))
     
-    food_name = request.form.get('food_name')
-    expiry_date = request.form.get('expiry_date')
-    purchase_date = request.form.get('purchase_date', datetime.now().date())
-    category = request.form.get('category', 'Other')
-    quantity = request.form.get('quantity', '')
-    notes = request.form.get('notes', '')
-    image_path = request.form.get('image_path', '')
+    item = {
+        'food_name': request.form.get('food_name'),
+        'expiry_date': request.form.get('expiry_date'),
+        'purchase_date': request.form.get('purchase_date'),
+        'category': request.form.get('category', 'Other'),
+        'quantity': request.form.get('quantity', ''),
+        'notes': request.form.get('notes', ''),
+        'image_path': request.form.get('image_path', '')
+    }
     
-    conn = get_db_connection()
-    if not conn:
+    try:
+        repository.add_item(session['user_id'], item)
+        flash('Food item added successfully!', 'success')
+    except DatabaseUnavailable:
         flash('Database connection error', 'error')
-        return redirect(url_for('index'))
+    except (repository.backend_errors + (ValueError,)) as e:
+        flash(f'Error adding food item: {str(e)}', 'error')
     
-    cursor = conn.cursor()
+    return redirect(url_for('index'))
+
+@app.route('/add_food/batch', methods=['POST'])
+def add_food_batch():
+    """Add many confirmed food items in a single transaction"""
+    if 'user_id' not in session:
+        return jsonify({'success': False, 'message': 'Please login first'})
     
+    data = request.get_json(silent=True) or {}
+    if not isinstance(data, dict) or not isinstance(data.get('items', []), list):
+        return jsonify({'success': False, 'message': 'Send {"items": [...]} with a list of food items'}), 400
+    items, skipped = valid_food_items(data.get('items', []))
+    
+    if not items:
+        return jsonify({'success': False, 'message': 'No valid food items provided', 'skipped': skipped})
+    
+    start = time.perf_counter()
     try:
-        cursor.execute('''
-            INSERT INTO food_items 
-            (user_id, food_name, expiry_date, purchase_date, category, quantity, notes, image_path)
-            VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
-        ''', (session['user_id'], food_name, expiry_date, purchase_date, category, quantity, notes, image_path))
-        
-        conn.commit()
-        flash('Food item added successfully!', 'success')
-    except mysql.connector.Error as e:
-        flash(f'Error adding food item: {str(e)}', 'error')
+        # One statement and one commit for the whole batch
+        inserted = repository.add_items(session['user_id'], items)
+    except DatabaseUnavailable:
+        return jsonify({'success': False, 'message': 'Database connection error'})
+    except repository.backend_errors as e:
+        return jsonify({'success': False, 'message': f'Error adding food items: {str(e)}'})
     
-    cursor.close()
-    conn.close()
+    return jsonify({'success': True, 'inserted': inserted, 'skipped': skipped,
+                    'seconds': round(time.perf_counter() - start, 3)})
+
+@app.route('/delete_food/batch', methods=['POST'])
+def delete_food_batch():
+    """Delete many food items in one transaction: {"ids": [...]} or {"status": ..., "category": ...}"""
+    if 'user_id' not in session:
+        return jsonify({'success': False, 'message': 'Please login first'})
     
-    return redirect(url_for('index'))
+    data = request.get_json(silent=True) or {}
+    if not isinstance(data, dict):
+        return jsonify({'success': False, 'message': 'Send a JSON object with ids, status or category'}), 400
+    ids = data.get('ids')
+    if ids is not None and not (isinstance(ids, list) and all(isinstance(i, int) for i in ids)):
+        return jsonify({'success': False, 'message': 'ids must be a list of item ids'}), 400
+    if ids is None and not data.get('status') and not data.get('category'):
+        return jsonify({'success': False, 'message': 'Provide ids, status or category'}), 400
+    
+    start = time.perf_counter()
+    try:
+        deleted = repository.delete_items(session['user_id'], ids=ids, status=data.get('status'),
+                                          category=data.get('category'))
+    except ValueError as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
+    except DatabaseUnavailable:
+        return jsonify({'success': False, 'message': 'Database connection error'})
+    except repository.backend_errors as e:
+        return jsonify({'success': False, 'message': f'Error deleting food items: {str(e)}'})
+    
+    return jsonify({'success': True, 'deleted': deleted, 'seconds': round(time.perf_counter() - start, 3)})
+
+@app.route('/export/food_items.csv')
+def export_food_items():
+    """Download the inventory as CSV, streamed page by page"""
+    if 'user_id' not in session:
+        return redirect(url_for('login'))
+    
+    filename = f"food_items_{datetime.now().strftime('%Y-%m-%d')}.csv"
+    return Response(export_csv(repository, session['user_id']), mimetype='text/csv',
+                    headers={'Content-Disposition': f'attachment; filename={filename}'})
+
+@app.route('/import/food_items', methods=['POST'])
+def import_food_items():
+    """Add items from an uploaded CSV (columns food_name, expiry_date and optional purchase_date,
+    category, quantity)"""
+    if 'user_id' not in session:
+        return jsonify({'success': False, 'message': 'Please login first'})
+    
+    file = request.files.get('file')
+    if not file or file.filename == '':
+        return jsonify({'success': False, 'message': 'No file uploaded'})
+    
+    try:
+        result = import_csv(repository, session['user_id'], file.stream)
+    except (ValueError, UnicodeDecodeError) as e:
+        return jsonify({'success': False, 'message': f'Invalid CSV: {str(e)}'}), 400
+    except DatabaseUnavailable:
+        return jsonify({'success': False, 'message': 'Database connection error'})
+    except repository.backend_errors as e:
+        # Batches before the failing one stay imported
+        return jsonify({'success': False, 'message': f'Error importing food items: {str(e)}'})
+    
+    result['success'] = True
+    return jsonify(result)
 
 @app.route('/delete_food/<int:food_id>', methods=['POST'])
 def delete_food(food_id):
@@ -332,17 +382,11 @@ def delete_food(food_id):
     if 'user_id' not in session:
         return jsonify({'success': False, 'message': 'Please login first'})
     
-    conn = get_db_connection()
-    if not conn:
+    try:
+        repository.delete_item(session['user_id'], food_id)
+    except DatabaseUnavailable:
         return jsonify({'success': False, 'message': 'Database connection error'})
     
-    cursor = conn.cursor()
-    cursor.execute('DELETE FROM food_items WHERE id = %s AND user_id = %s', 
-                  (food_id, session['user_id']))
-    conn.commit()
-    cursor.close()
-    conn.close()
-    
     return jsonify({'success': True, 'message': 'Food item deleted'})
 
 @app.route('/dashboard')
@@ -351,65 +395,14 @@ def dashboard():
     if 'user_id' not in session:
         return redirect(url_for('login'))
     
-    update_food_status()
-    
-    conn = get_db_connection()
-    if not conn:
+    try:
+        # Status counts, category breakdown and monthly expired trend from the summary table
+        stats, category_data, monthly_trend = repository.dashboard(session['user_id'])
+        near_expiry_items = repository.near_expiry_items(session['user_id'])
+    except DatabaseUnavailable:
         flash('Database connection error', 'error')
         return render_template('dashboard.html')
     
-    cursor = conn.cursor(dictionary=True)
-    
-    # Get statistics
-    cursor.execute('''
-        SELECT 
-            COUNT(*) as total_items,
-            SUM(CASE WHEN status = 'Fresh' THEN 1 ELSE 0 END) as fresh_count,
-            SUM(CASE WHEN status = 'Near Expiry' THEN 1 ELSE 0 END) as near_expiry_count,
-            SUM(CASE WHEN status = 'Expired' THEN 1 ELSE 0 END) as expired_count
-        FROM food_items 
-        WHERE user_id = %s
-    ''', (session['user_id'],))
-    
-    stats = cursor.fetchone()
-    
-    # Get near expiry items
-    cursor.execute('''
-        SELECT food_name, expiry_date, DATEDIFF(expiry_date, CURDATE()) as days_remaining
-        FROM food_items 
-        WHERE user_id = %s AND status = 'Near Expiry'
-        ORDER BY expiry_date ASC
-    ''', (session['user_id'],))
-    
-    near_expiry_items = cursor.fetchall()
-    
-    # Get category breakdown
-    cursor.execute('''
-        SELECT category, COUNT(*) as count
-        FROM food_items 
-        WHERE user_id = %s
-        GROUP BY category
-    ''', (session['user_id'],))
-    
-    category_data = cursor.fetchall()
-    
-    # Get monthly trend (last 6 months)
-    cursor.execute('''
-        SELECT 
-            DATE_FORMAT(expiry_date, '%Y-%m') as month,
-            COUNT(*) as expired_count
-        FROM food_items 
-        WHERE user_id = %s AND expiry_date < CURDATE()
-        AND expiry_date >= DATE_SUB(CURDATE(), INTERVAL 6 MONTH)
-        GROUP BY month
-        ORDER BY month
-    ''', (session['user_id'],))
-    
-    monthly_trend = cursor.fetchall()
-    
-    cursor.close()
-    conn.close()
-    
     # Get recipe suggestions
     recipes = get_recipe_suggestions(near_expiry_items)
     
@@ -420,43 +413,104 @@ def dashboard():
                          monthly_trend=monthly_trend,
                          recipes=recipes)
 
-@app.route('/api/check_notifications')
-def check_notifications():
-    """Check and send notifications for near expiry items"""
+@app.route('/api/food_items')
+def api_food_items():
+    """Page of food items (?after=<cursor>&limit=&status=&category=), soonest-expiring first"""
     if 'user_id' not in session:
-        return jsonify({'success': False})
+        return jsonify({'success': False, 'message': 'Please login first'}), 401
     
-    conn = get_db_connection()
-    if not conn:
-        return jsonify({'success': False})
+    limit = min(max(request.args.get('limit', PAGE_SIZE, type=int), 1), MAX_PAGE_SIZE)
+    try:
+        items, next_cursor = repository.list_items_page(
+            session['user_id'],
+            after=request.args.get('after'),
+            limit=limit,
+            status=request.args.get('status') or None,
+            category=request.args.get('category') or None
+        )
+    except ValueError as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
+    except DatabaseUnavailable:
+        return jsonify({'success': False, 'message': 'Database connection error'}), 503
+    
+    response = jsonify({
+        'success': True,
+        'items': [food_item_dict(item) for item in items],
+        'next_cursor': next_cursor
+    })
+    # Private per-user data: the browser may keep it but must revalidate, and gets a 304 if unchanged
+    response.headers['Cache-Control'] = 'private, no-cache'
+    response.add_etag()
+    return response.make_conditional(request)
+
+@app.route('/api/changes')
+def api_changes():
+    """Items written and deleted since a revision (?since=<revision>)"""
+    if 'user_id' not in session:
+        return jsonify({'success': False, 'message': 'Please login first'}), 401
     
-    cursor = conn.cursor(dictionary=True)
+    since = request.args.get('since', type=int)
+    if since is None:
+        return jsonify({'success': False, 'message': 'since is required'}), 400
     
-    today = datetime.now().date()
-    notification_date = today + timedelta(days=3)
+    try:
+        feed = repository.changes_since(session['user_id'], since)
+    except DatabaseUnavailable:
+        return jsonify({'success': False, 'message': 'Database connection error'}), 503
     
-    cursor.execute('''
-        SELECT id, food_name, expiry_date
-        FROM food_items 
-        WHERE user_id = %s 
-        AND status = 'Near Expiry'
-        AND expiry_date <= %s
-    ''', (session['user_id'], notification_date))
+    feed['success'] = True
+    return jsonify(feed)
+
+@app.route('/api/changes/stream')
+def api_changes_stream():
+    """Server-sent events version of /api/changes"""
+    if 'user_id' not in session:
+        return jsonify({'success': False, 'message': 'Please login first'}), 401
     
-    items = cursor.fetchall()
-    notifications = []
+    # EventSource sends the last event id when it reconnects
+    since = request.headers.get('Last-Event-ID', type=int)
+    if since is None:
+        since = request.args.get('since', 0, type=int)
     
-    for item in items:
-        days_left = (item['expiry_date'] - today).days
-        message = f"{item['food_name']} will expire in {days_left} days"
-        notifications.append(message)
+    # Runs after the request ends, so each poll borrows a pool connection only briefly
+    return Response(change_stream(repository, session['user_id'], since), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+@app.route('/api/check_notifications')
+def check_notifications():
+    """Check and send notifications for near expiry items"""
+    if 'user_id' not in session:
+        return jsonify({'success': False})
+    
+    try:
+        items = repository.near_expiry_items(session['user_id'])
+    except DatabaseUnavailable:
+        return jsonify({'success': False})
     
-    cursor.close()
-    conn.close()
+    notifications = [f"{item.food_name} will expire in {item.days_remaining} days" for item in items]
     
     return jsonify({'success': True, 'notifications': notifications})
 
+@app.route('/api/metrics')
+def metrics():
+    """Runtime counters for the OCR queue, OCR cache and database pool"""
+    if 'user_id' not in session:
+        return jsonify({'success': False})
+    
+    return jsonify({
+        'success': True,
+        'ocr_queue': ocr_queue.stats(),
+        'ocr_cache': ocr_cache.stats(),
+        'db_pool': db_pool.stats(),
+        'notifications': notification_engine.stats()
+    })
+
 if __name__ == '__main__':
     # Create upload folder if it doesn't exist
     os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
+    
+    # Only in the reloader's child process, so the engine runs once
+    if os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        notification_engine.start()
+    
     app.run(debug=True, host='0.0.0.0', port=5000)
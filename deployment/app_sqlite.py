@@ -1,12 +1,22 @@
-from flask import Flask, render_template, request, redirect, url_for, flash, session, jsonify
+from flask import Flask, render_template, request, redirect, url_for, flash, session, jsonify, Response
 from werkzeug.security import generate_password_hash, check_password_hash
-from werkzeug.utils import secure_filename
-import sqlite3
-from datetime import datetime, timedelta
+from datetime import datetime
 import os
-import json
-from ocr_model import ExpiryDateExtractor
+import time
+import zipfile
+from ocr_jobs import OCRJobQueue, queue_upload, read_zip_images
+from ocr_cache import OCRResultCache
+from ai_cache import AIResponseCache, normalize_items, normalize_text
+from ai_streaming import RECIPE_VARIANTS, AICallPool, cache_partial_recipes, chat_stream, recipe_stream
+from db_pool import SQLiteConnectionPool, init_app
+from change_feed import change_stream
+from food_csv import export_csv, import_csv
+from notifier import NotificationEngine, smtp_config_from_env
+from recipe_index import RecipeIndex
+from repository import (DatabaseUnavailable, MAX_PAGE_SIZE, PAGE_SIZE, SQLiteRepository, food_item_dict,
+                        valid_food_items)
 from ai_assistant_gemini import FoodAIAssistant  # Using Gemini (FREE)
+from stub_model import StubModelAssistant
 from dotenv import load_dotenv
 
 # Load environment variables
@@ -17,125 +27,85 @@ app.secret_key = os.getenv('SECRET_KEY', 'your_secret_key_here_change_in_product
 app.config['UPLOAD_FOLDER'] = 'static/uploads'
 app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # 16MB max file size
 app.config['ALLOWED_EXTENSIONS'] = {'png', 'jpg', 'jpeg', 'gif', 'bmp'}
+app.config['MAX_BATCH_FILES'] = 32  # images per /upload/batch request, lowered to the OCR queue size below
 
 # SQLite Database
-DATABASE = 'food_tracker.db'
+DATABASE = os.getenv('DATABASE_PATH', 'food_tracker.db')
 
-# Initialize OCR extractor and AI assistant
-ocr_extractor = ExpiryDateExtractor()
-ai_assistant = FoodAIAssistant()
+# WAL-mode connections reused across requests, returned to the pool at app context teardown
+db_pool = SQLiteConnectionPool(
+    DATABASE,
+    size=int(os.getenv('DB_POOL_SIZE', 8)),
+    timeout=float(os.getenv('DB_POOL_TIMEOUT', 10))
+)
+init_app(app, db_pool)
 
-def get_db_connection():
-    """Create database connection"""
-    conn = sqlite3.connect(DATABASE)
-    conn.row_factory = sqlite3.Row
-    return conn
+# Every query the app runs (shared with app.py)
+repository = SQLiteRepository(db_pool)
+
+# Hourly status transitions and per-user expiry email digests (notifications table)
+notification_engine = NotificationEngine(
+    db_pool,
+    smtp_config=smtp_config_from_env(),
+    interval=int(os.getenv('NOTIFY_INTERVAL', 3600))
+)
+
+# Initialize OCR result cache, OCR job queue and AI assistant
+ocr_cache = OCRResultCache(
+    os.getenv('OCR_CACHE_PATH', 'ocr_cache.db'),
+    max_entries=int(os.getenv('OCR_CACHE_MAX_ENTRIES', 1000))
+)
+ocr_queue = OCRJobQueue(
+    max_workers=int(os.getenv('OCR_WORKERS', 2)),
+    max_pending=int(os.getenv('OCR_MAX_PENDING', 32)),
+    extractor_options={
+        'parallel_passes': os.getenv('OCR_PARALLEL_PASSES', 'false').lower() == 'true',
+        'short_circuit': os.getenv('OCR_SHORT_CIRCUIT', 'true').lower() == 'true',
+        'detect_regions': os.getenv('OCR_DETECT_REGIONS', 'true').lower() == 'true',
+        'ocr_backend': os.getenv('OCR_BACKEND', 'pytesseract')
+    },
+    cache=ocr_cache
+)
+# A batch never holds more images than the OCR queue accepts (OCR_MAX_PENDING may be lower)
+app.config['MAX_BATCH_FILES'] = min(app.config['MAX_BATCH_FILES'], ocr_queue.max_pending)
+# AI_BACKEND=stub talks to a local `python stub_model.py` server instead of Gemini, for offline testing
+if os.getenv('AI_BACKEND') == 'stub':
+    ai_assistant = StubModelAssistant(os.getenv('AI_STUB_URL', 'http://127.0.0.1:8808'))
+else:
+    ai_assistant = FoodAIAssistant()
+
+# Independent model calls of one request (the recipe variants) run concurrently, each with a timeout
+ai_calls = AICallPool(
+    max_workers=int(os.getenv('AI_WORKERS', 4)),
+    timeout=float(os.getenv('AI_TIMEOUT', 30))
+)
+
+# AI answers shared across users: storage advice for "milk" is the same for everyone
+ai_cache = AIResponseCache(
+    os.getenv('AI_CACHE_PATH', 'ai_cache.db'),
+    max_entries=int(os.getenv('AI_CACHE_MAX_ENTRIES', 5000))
+)
+
+# Recipe catalogue indexed by ingredient once at startup, reloaded when the file changes
+recipe_index = RecipeIndex(os.getenv('RECIPES_PATH', 'recipes.json'))
 
 def init_db():
     """Initialize database with tables"""
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    
-    # Users table
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS users (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            username TEXT UNIQUE NOT NULL,
-            email TEXT UNIQUE NOT NULL,
-            password_hash TEXT NOT NULL,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        )
-    ''')
-    
-    # Food items table
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS food_items (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            user_id INTEGER NOT NULL,
-            food_name TEXT NOT NULL,
-            expiry_date DATE NOT NULL,
-            purchase_date DATE DEFAULT (date('now')),
-            image_path TEXT,
-            status TEXT DEFAULT 'Fresh',
-            category TEXT,
-            quantity TEXT,
-            notes TEXT,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
-        )
-    ''')
-    
-    # Categories table
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS categories (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            name TEXT UNIQUE NOT NULL,
-            description TEXT
-        )
-    ''')
-    
-    # Insert default categories
-    categories = [
-        ('Dairy', 'Milk, cheese, yogurt, butter'),
-        ('Vegetables', 'Fresh vegetables'),
-        ('Fruits', 'Fresh fruits'),
-        ('Meat & Poultry', 'Chicken, beef, pork, lamb'),
-        ('Seafood', 'Fish and shellfish'),
-        ('Beverages', 'Drinks and juices'),
-        ('Bakery', 'Bread, pastries, cakes'),
-        ('Frozen Foods', 'Frozen meals and items'),
-        ('Canned Goods', 'Canned vegetables, fruits, soups'),
-        ('Condiments', 'Sauces, dressings, spices'),
-        ('Snacks', 'Chips, cookies, crackers'),
-        ('Other', 'Miscellaneous items')
-    ]
-    
-    for cat in categories:
-        cursor.execute('INSERT OR IGNORE INTO categories (name, description) VALUES (?, ?)', cat)
-    
-    conn.commit()
-    conn.close()
+    repository.init_schema()
     print("[OK] Database initialized successfully!")
 
 def allowed_file(filename):
     """Check if file extension is allowed"""
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in app.config['ALLOWED_EXTENSIONS']
 
-def update_food_status():
-    """Update food item status based on expiry date"""
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    today = datetime.now().date()
-    near_expiry_date = today + timedelta(days=3)
-    
-    cursor.execute('''
-        UPDATE food_items 
-        SET status = CASE
-            WHEN expiry_date < date('now') THEN 'Expired'
-            WHEN expiry_date BETWEEN date('now') AND date('now', '+3 days') THEN 'Near Expiry'
-            ELSE 'Fresh'
-        END
-    ''')
-    
-    conn.commit()
-    conn.close()
+def file_extension(filename):
+    """Lowercase extension of a filename allowed_file() accepted"""
+    return filename.rsplit('.', 1)[1].lower()
 
 def get_recipe_suggestions(food_items):
-    """Get recipe suggestions based on near expiry items"""
+    """Recipes using as many of the near expiry items as possible, soonest-expiring first"""
     try:
-        with open('recipes.json', 'r') as f:
-            recipes = json.load(f)
-        
-        suggestions = []
-        for food in food_items:
-            food_name_lower = food['food_name'].lower()
-            for recipe in recipes:
-                ingredients_lower = [ing.lower() for ing in recipe['ingredients']]
-                if any(food_name_lower in ing or ing in food_name_lower for ing in ingredients_lower):
-                    if recipe not in suggestions:
-                        suggestions.append(recipe)
-        
-        return suggestions[:5]
+        return recipe_index.cover([(food.food_name, food.days_remaining) for food in food_items], limit=5)
     except Exception as e:
         print(f"Recipe suggestion error: {e}")
         return []
@@ -156,14 +126,16 @@ def login():
         username = request.form.get('username')
         password = request.form.get('password')
         
-        conn = get_db_connection()
-        user = conn.execute('SELECT * FROM users WHERE username = ?', (username,)).fetchone()
-        conn.close()
+        try:
+            user = repository.get_user_by_username(username)
+        except DatabaseUnavailable:
+            flash('Database connection error', 'error')
+            return render_template('login.html')
         
-        if user and check_password_hash(user['password_hash'], password):
-            session['user_id'] = user['id']
-            session['username'] = user['username']
-            session['email'] = user['email']
+        if user and check_password_hash(user.password_hash, password):
+            session['user_id'] = user.id
+            session['username'] = user.username
+            session['email'] = user.email
             flash('Login successful!', 'success')
             return redirect(url_for('index'))
         else:
@@ -184,19 +156,16 @@ def signup():
             flash('Passwords do not match', 'error')
             return render_template('signup.html')
         
-        conn = get_db_connection()
-        
         try:
-            password_hash = generate_password_hash(password)
-            conn.execute('INSERT INTO users (username, email, password_hash) VALUES (?, ?, ?)',
-                       (username, email, password_hash))
-            conn.commit()
+            created = repository.create_user(username, email, generate_password_hash(password))
+        except DatabaseUnavailable:
+            flash('Database connection error', 'error')
+            return render_template('signup.html')
+        
+        if created:
             flash('Account created successfully! Please login.', 'success')
-            conn.close()
             return redirect(url_for('login'))
-        except sqlite3.IntegrityError:
-            flash('Username or email already exists', 'error')
-            conn.close()
+        flash('Username or email already exists', 'error')
     
     return render_template('signup.html')
 
@@ -213,23 +182,20 @@ def index():
     if 'user_id' not in session:
         return redirect(url_for('login'))
     
-    update_food_status()
-    
-    conn = get_db_connection()
-    food_items = conn.execute('''
-        SELECT id, food_name, expiry_date, purchase_date, status, category, quantity,
-               julianday(expiry_date) - julianday('now') as days_remaining
-        FROM food_items 
-        WHERE user_id = ?
-        ORDER BY expiry_date ASC
-    ''', (session['user_id'],)).fetchall()
-    conn.close()
+    # First page only; main.js fetches the rest from /api/food_items
+    # main.js keeps the page current from /api/changes, starting at this revision
+    try:
+        revision = repository.current_revision(session['user_id'])
+        food_items, next_cursor = repository.list_items_page(session['user_id'])
+    except DatabaseUnavailable:
+        flash('Database connection error', 'error')
+        return render_template('index.html', food_items=[], next_cursor=None, revision=0)
     
-    return render_template('index.html', food_items=food_items)
+    return render_template('index.html', food_items=food_items, next_cursor=next_cursor, revision=revision)
 
 @app.route('/upload', methods=['POST'])
 def upload_file():
-    """Handle file upload and OCR processing"""
+    """Handle file upload and queue it for OCR processing"""
     if 'user_id' not in session:
         return jsonify({'success': False, 'message': 'Please login first'})
     
@@ -242,41 +208,94 @@ def upload_file():
         return jsonify({'success': False, 'message': 'No file selected'})
     
     if file and allowed_file(file.filename):
-        filename = secure_filename(file.filename)
-        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-        filename = f"{timestamp}_{filename}"
-        filepath = os.path.join(app.config['UPLOAD_FOLDER'], filename)
-        file.save(filepath)
-        
-        try:
-            expiry_date, extracted_text = ocr_extractor.extract_expiry_date(filepath)
-            food_name = ocr_extractor.extract_food_name(extracted_text)
-            
-            if expiry_date:
-                return jsonify({
-                    'success': True,
-                    'expiry_date': expiry_date,
-                    'food_name': food_name,
-                    'image_path': filename,
-                    'message': 'Expiry date extracted successfully'
-                })
-            else:
-                return jsonify({
-                    'success': False,
-                    'food_name': food_name,
-                    'image_path': filename,
-                    'message': 'Could not extract expiry date. Please enter manually.',
-                    'extracted_text': extracted_text
-                })
-        except Exception as e:
-            return jsonify({
-                'success': False,
-                'message': f'OCR processing error: {str(e)}',
-                'image_path': filename
-            })
+        result, status = queue_upload(ocr_queue, ocr_cache, file.read(), file_extension(file.filename),
+                                      app.config['UPLOAD_FOLDER'], owner=session['user_id'])
+        return jsonify(result), status
     
     return jsonify({'success': False, 'message': 'Invalid file format'})
 
+@app.route('/upload/status/<job_id>')
+def upload_status(job_id):
+    """Poll the result of a queued OCR job"""
+    if 'user_id' not in session:
+        return jsonify({'success': False, 'message': 'Please login first'})
+    
+    result = ocr_queue.status(job_id, owner=session['user_id'])
+    if result is None:
+        return jsonify({'success': False, 'status': 'unknown', 'message': 'OCR job not found'}), 404
+    
+    return jsonify(result)
+
+@app.route('/upload/batch', methods=['POST'])
+def upload_batch():
+    """Queue many images, or a zip of images, for OCR in one request"""
+    if 'user_id' not in session:
+        return jsonify({'success': False, 'message': 'Please login first'})
+    
+    files = request.files.getlist('files') or request.files.getlist('file')
+    if not files:
+        return jsonify({'success': False, 'message': 'No file uploaded'})
+    
+    too_many = {
+        'success': False,
+        'message': f"Too many images (max {app.config['MAX_BATCH_FILES']} per batch)"
+    }
+    images = []
+    for file in files:
+        if file.filename.lower().endswith('.zip'):
+            try:
+                images.extend(read_zip_images(file.stream, app.config['ALLOWED_EXTENSIONS'],
+                                              app.config['MAX_BATCH_FILES'] - len(images),
+                                              app.config['MAX_CONTENT_LENGTH']))
+            except zipfile.BadZipFile:
+                return jsonify({'success': False, 'message': f'Invalid zip file: {file.filename}'})
+            except ValueError:
+                return jsonify(too_many)
+        elif allowed_file(file.filename):
+            images.append((file.filename, file.read()))
+    
+    if not images:
+        return jsonify({'success': False, 'message': 'No valid images found'})
+    if len(images) > app.config['MAX_BATCH_FILES']:
+        return jsonify(too_many)
+    # All or nothing, rather than queueing the first few and rejecting the rest
+    if len(images) > ocr_queue.free_slots():
+        return jsonify({'success': False, 'message': 'OCR queue is busy. Please try again in a moment.'}), 503
+    
+    # Jobs run in parallel across the OCR worker pool
+    items = []
+    rejected = 0
+    for name, data in images:
+        result, status = queue_upload(ocr_queue, ocr_cache, data, file_extension(name),
+                                      app.config['UPLOAD_FOLDER'], owner=session['user_id'])
+        result['filename'] = name
+        items.append(result)
+        # Other requests can still fill the queue in the meantime
+        if status == 503:
+            rejected += 1
+    
+    response = {'success': rejected < len(items), 'count': len(items), 'rejected': rejected, 'items': items}
+    if rejected:
+        response['message'] = f"{rejected} of {len(items)} images were not queued, the OCR queue is busy"
+        return jsonify(response), 207 if rejected < len(items) else 503
+    return jsonify(response), 202
+
+@app.route('/upload/batch/status')
+def upload_batch_status():
+    """Poll several OCR jobs at once (?job_ids=a,b,c)"""
+    if 'user_id' not in session:
+        return jsonify({'success': False, 'message': 'Please login first'})
+    
+    job_ids = [job_id for job_id in request.args.get('job_ids', '').split(',') if job_id]
+    items = []
+    for job_id in job_ids:
+        result = ocr_queue.status(job_id, owner=session['user_id'])
+        items.append(result or {'success': False, 'status': 'unknown', 'job_id': job_id,
+                                'message': 'OCR job not found'})
+    
+    pending = sum(1 for item in items if item['status'] == 'pending')
+    return jsonify({'success': True, 'pending': pending, 'items': items})
+
 @app.route('/add_food', methods=['POST'])
 def add_food():
     """Add food item to database"""
@@ -284,42 +303,124 @@ def add_food():
         flash('Please login first', 'error')
         return redirect(url_for('login'))
     
-    food_name = request.form.get('food_name')
-    expiry_date = request.form.get('expiry_date')
-    purchase_date = request.form.get('purchase_date') or datetime.now().date()
-    category = request.form.get('category', 'Other')
-    quantity = request.form.get('quantity', '')
-    notes = request.form.get('notes', '')
-    image_path = request.form.get('image_path', '')
-    
-    conn = get_db_connection()
+    item = {
+        'food_name': request.form.get('food_name'),
+        'expiry_date': request.form.get('expiry_date'),
+        'purchase_date': request.form.get('purchase_date'),
+        'category': request.form.get('category', 'Other'),
+        'quantity': request.form.get('quantity', ''),
+        'notes': request.form.get('notes', ''),
+        'image_path': request.form.get('image_path', '')
+    }
     
     try:
-        conn.execute('''
-            INSERT INTO food_items 
-            (user_id, food_name, expiry_date, purchase_date, category, quantity, notes, image_path)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-        ''', (session['user_id'], food_name, expiry_date, purchase_date, category, quantity, notes, image_path))
-        
-        conn.commit()
+        repository.add_item(session['user_id'], item)
         flash('Food item added successfully!', 'success')
+    except DatabaseUnavailable:
+        flash('Database connection error', 'error')
     except Exception as e:
         flash(f'Error adding food item: {str(e)}', 'error')
     
-    conn.close()
     return redirect(url_for('index'))
 
+@app.route('/add_food/batch', methods=['POST'])
+def add_food_batch():
+    """Add many confirmed food items in a single transaction"""
+    if 'user_id' not in session:
+        return jsonify({'success': False, 'message': 'Please login first'})
+    
+    data = request.get_json(silent=True) or {}
+    if not isinstance(data, dict) or not isinstance(data.get('items', []), list):
+        return jsonify({'success': False, 'message': 'Send {"items": [...]} with a list of food items'}), 400
+    items, skipped = valid_food_items(data.get('items', []))
+    
+    if not items:
+        return jsonify({'success': False, 'message': 'No valid food items provided', 'skipped': skipped})
+    
+    start = time.perf_counter()
+    try:
+        # One statement and one commit for the whole batch
+        inserted = repository.add_items(session['user_id'], items)
+    except DatabaseUnavailable:
+        return jsonify({'success': False, 'message': 'Database connection error'})
+    except Exception as e:
+        return jsonify({'success': False, 'message': f'Error adding food items: {str(e)}'})
+    
+    return jsonify({'success': True, 'inserted': inserted, 'skipped': skipped,
+                    'seconds': round(time.perf_counter() - start, 3)})
+
+@app.route('/delete_food/batch', methods=['POST'])
+def delete_food_batch():
+    """Delete many food items in one transaction: {"ids": [...]} or {"status": ..., "category": ...}"""
+    if 'user_id' not in session:
+        return jsonify({'success': False, 'message': 'Please login first'})
+    
+    data = request.get_json(silent=True) or {}
+    if not isinstance(data, dict):
+        return jsonify({'success': False, 'message': 'Send a JSON object with ids, status or category'}), 400
+    ids = data.get('ids')
+    if ids is not None and not (isinstance(ids, list) and all(isinstance(i, int) for i in ids)):
+        return jsonify({'success': False, 'message': 'ids must be a list of item ids'}), 400
+    if ids is None and not data.get('status') and not data.get('category'):
+        return jsonify({'success': False, 'message': 'Provide ids, status or category'}), 400
+    
+    start = time.perf_counter()
+    try:
+        deleted = repository.delete_items(session['user_id'], ids=ids, status=data.get('status'),
+                                          category=data.get('category'))
+    except ValueError as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
+    except DatabaseUnavailable:
+        return jsonify({'success': False, 'message': 'Database connection error'})
+    except Exception as e:
+        return jsonify({'success': False, 'message': f'Error deleting food items: {str(e)}'})
+    
+    return jsonify({'success': True, 'deleted': deleted, 'seconds': round(time.perf_counter() - start, 3)})
+
+@app.route('/export/food_items.csv')
+def export_food_items():
+    """Download the inventory as CSV, streamed page by page"""
+    if 'user_id' not in session:
+        return redirect(url_for('login'))
+    
+    filename = f"food_items_{datetime.now().strftime('%Y-%m-%d')}.csv"
+    return Response(export_csv(repository, session['user_id']), mimetype='text/csv',
+                    headers={'Content-Disposition': f'attachment; filename={filename}'})
+
+@app.route('/import/food_items', methods=['POST'])
+def import_food_items():
+    """Add items from an uploaded CSV (columns food_name, expiry_date and optional purchase_date,
+    category, quantity)"""
+    if 'user_id' not in session:
+        return jsonify({'success': False, 'message': 'Please login first'})
+    
+    file = request.files.get('file')
+    if not file or file.filename == '':
+        return jsonify({'success': False, 'message': 'No file uploaded'})
+    
+    try:
+        result = import_csv(repository, session['user_id'], file.stream)
+    except (ValueError, UnicodeDecodeError) as e:
+        return jsonify({'success': False, 'message': f'Invalid CSV: {str(e)}'}), 400
+    except DatabaseUnavailable:
+        return jsonify({'success': False, 'message': 'Database connection error'})
+    except Exception as e:
+        # Batches before the failing one stay imported
+        return jsonify({'success': False, 'message': f'Error importing food items: {str(e)}'})
+    
+    result['success'] = True
+    return jsonify(result)
+
 @app.route('/delete_food/<int:food_id>', methods=['POST'])
 def delete_food(food_id):
     """Delete food item"""
     if 'user_id' not in session:
         return jsonify({'success': False, 'message': 'Please login first'})
     
-    conn = get_db_connection()
-    conn.execute('DELETE FROM food_items WHERE id = ? AND user_id = ?', 
-                (food_id, session['user_id']))
-    conn.commit()
-    conn.close()
+    try:
+        repository.delete_item(session['user_id'], food_id)
+    except DatabaseUnavailable:
+        return jsonify({'success': False, 'message': 'Database connection error'})
     
     return jsonify({'success': True, 'message': 'Food item deleted'})
 
@@ -329,67 +430,22 @@ def dashboard():
     if 'user_id' not in session:
         return redirect(url_for('login'))
     
-    update_food_status()
-    
-    conn = get_db_connection()
-    
-    # Get statistics
-    stats = conn.execute('''
-        SELECT 
-            COUNT(*) as total_items,
-            SUM(CASE WHEN status = 'Fresh' THEN 1 ELSE 0 END) as fresh_count,
-            SUM(CASE WHEN status = 'Near Expiry' THEN 1 ELSE 0 END) as near_expiry_count,
-            SUM(CASE WHEN status = 'Expired' THEN 1 ELSE 0 END) as expired_count
-        FROM food_items 
-        WHERE user_id = ?
-    ''', (session['user_id'],)).fetchone()
-    
-    # Get near expiry items
-    near_expiry_items = conn.execute('''
-        SELECT food_name, expiry_date, 
-               julianday(expiry_date) - julianday('now') as days_remaining
-        FROM food_items 
-        WHERE user_id = ? AND status = 'Near Expiry'
-        ORDER BY expiry_date ASC
-    ''', (session['user_id'],)).fetchall()
-    
-    # Get category breakdown
-    category_data_rows = conn.execute('''
-        SELECT category, COUNT(*) as count
-        FROM food_items 
-        WHERE user_id = ?
-        GROUP BY category
-    ''', (session['user_id'],)).fetchall()
-    
-    # Get monthly trend
-    monthly_trend_rows = conn.execute('''
-        SELECT 
-            strftime('%Y-%m', expiry_date) as month,
-            COUNT(*) as expired_count
-        FROM food_items 
-        WHERE user_id = ? AND expiry_date < date('now')
-        AND expiry_date >= date('now', '-6 months')
-        GROUP BY month
-        ORDER BY month
-    ''', (session['user_id'],)).fetchall()
-    
-    conn.close()
-    
-    # Convert Row objects to dictionaries for JSON serialization
-    category_data = [dict(row) for row in category_data_rows]
-    monthly_trend = [dict(row) for row in monthly_trend_rows]
-    near_expiry_items = [dict(row) for row in near_expiry_items]
+    try:
+        # Status counts, category breakdown and monthly expired trend from the summary table
+        stats, category_data, monthly_trend = repository.dashboard(session['user_id'])
+        near_expiry_items = repository.near_expiry_items(session['user_id'])
+    except DatabaseUnavailable:
+        flash('Database connection error', 'error')
+        return render_template('dashboard.html')
     
     # Check if AI recipes are cached (don't auto-generate)
     ai_recipes = []
     if near_expiry_items and len(near_expiry_items) > 0:
-        ingredients = [item['food_name'] for item in near_expiry_items[:5]]
-        cache_key = f"recipes_{session['user_id']}_{'_'.join(sorted(ingredients))}"
+        ingredients = [item.food_name for item in near_expiry_items[:5]]
         
-        # Only load from cache, don't generate automatically
-        if cache_key in session and session.get(cache_key):
-            ai_recipes = session[cache_key]
-            print("Using cached recipes")
+        # Only load from cache, don't generate automatically; a partial set stands in for a few minutes
+        request = normalize_items(ingredients)
+        ai_recipes = ai_cache.peek('recipes', request) or ai_cache.peek('recipes_partial', request) or []
     
     # Get fallback recipes from JSON
     fallback_recipes = get_recipe_suggestions(near_expiry_items) if not ai_recipes else []
@@ -402,34 +458,111 @@ def dashboard():
                          ai_recipes=ai_recipes,
                          fallback_recipes=fallback_recipes)
 
+@app.route('/api/food_items')
+def api_food_items():
+    """Page of food items (?after=<cursor>&limit=&status=&category=), soonest-expiring first"""
+    if 'user_id' not in session:
+        return jsonify({'success': False, 'message': 'Please login first'}), 401
+    
+    limit = min(max(request.args.get('limit', PAGE_SIZE, type=int), 1), MAX_PAGE_SIZE)
+    try:
+        items, next_cursor = repository.list_items_page(
+            session['user_id'],
+            after=request.args.get('after'),
+            limit=limit,
+            status=request.args.get('status') or None,
+            category=request.args.get('category') or None
+        )
+    except ValueError as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
+    except DatabaseUnavailable:
+        return jsonify({'success': False, 'message': 'Database connection error'}), 503
+    
+    response = jsonify({
+        'success': True,
+        'items': [food_item_dict(item) for item in items],
+        'next_cursor': next_cursor
+    })
+    # Private per-user data: the browser may keep it but must revalidate, and gets a 304 if unchanged
+    response.headers['Cache-Control'] = 'private, no-cache'
+    response.add_etag()
+    return response.make_conditional(request)
+
+@app.route('/api/changes')
+def api_changes():
+    """Items written and deleted since a revision (?since=<revision>)"""
+    if 'user_id' not in session:
+        return jsonify({'success': False, 'message': 'Please login first'}), 401
+    
+    since = request.args.get('since', type=int)
+    if since is None:
+        return jsonify({'success': False, 'message': 'since is required'}), 400
+    
+    try:
+        feed = repository.changes_since(session['user_id'], since)
+    except DatabaseUnavailable:
+        return jsonify({'success': False, 'message': 'Database connection error'}), 503
+    
+    feed['success'] = True
+    return jsonify(feed)
+
+@app.route('/api/changes/stream')
+def api_changes_stream():
+    """Server-sent events version of /api/changes"""
+    if 'user_id' not in session:
+        return jsonify({'success': False, 'message': 'Please login first'}), 401
+    
+    # EventSource sends the last event id when it reconnects
+    since = request.headers.get('Last-Event-ID', type=int)
+    if since is None:
+        since = request.args.get('since', 0, type=int)
+    
+    # Runs after the request ends, so each poll borrows a pool connection only briefly
+    return Response(change_stream(repository, session['user_id'], since), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
 @app.route('/api/check_notifications')
 def check_notifications():
     """Check and send notifications for near expiry items"""
     if 'user_id' not in session:
         return jsonify({'success': False})
     
-    conn = get_db_connection()
-    
-    items = conn.execute('''
-        SELECT id, food_name, expiry_date
-        FROM food_items 
-        WHERE user_id = ? 
-        AND status = 'Near Expiry'
-        AND expiry_date <= date('now', '+3 days')
-    ''', (session['user_id'],)).fetchall()
-    
-    notifications = []
-    for item in items:
-        days_left = (datetime.strptime(item['expiry_date'], '%Y-%m-%d').date() - datetime.now().date()).days
-        message = f"{item['food_name']} will expire in {days_left} days"
-        notifications.append(message)
+    try:
+        items = repository.near_expiry_items(session['user_id'])
+    except DatabaseUnavailable:
+        return jsonify({'success': False})
     
-    conn.close()
+    notifications = [f"{item.food_name} will expire in {item.days_remaining} days" for item in items]
     
     return jsonify({'success': True, 'notifications': notifications})
 
+@app.route('/api/metrics')
+def metrics():
+    """Runtime counters for the OCR queue, OCR and AI caches, AI calls and database pool"""
+    if 'user_id' not in session:
+        return jsonify({'success': False})
+    
+    return jsonify({
+        'success': True,
+        'ocr_queue': ocr_queue.stats(),
+        'ocr_cache': ocr_cache.stats(),
+        'ai_cache': ai_cache.stats(),
+        'ai_calls': ai_calls.stats(),
+        'db_pool': db_pool.stats(),
+        'notifications': notification_engine.stats()
+    })
+
 # ============ AI ASSISTANT ROUTES ============
 
+def ai_chat_context():
+    """The user's food items and name, sent along with chat messages"""
+    food_items = repository.list_items(session['user_id'], limit=10)
+    return {
+        'food_items': [{'food_name': item.food_name, 'expiry_date': item.expiry_date.isoformat(),
+                        'status': item.status} for item in food_items],
+        'username': session.get('username')
+    }
+
 @app.route('/ai/chat', methods=['POST'])
 def ai_chat():
     """AI chat endpoint"""
@@ -443,20 +576,10 @@ def ai_chat():
         return jsonify({'success': False, 'message': 'No message provided'})
     
     # Get user's food context
-    conn = get_db_connection()
-    food_items = conn.execute('''
-        SELECT food_name, expiry_date, status
-        FROM food_items 
-        WHERE user_id = ?
-        ORDER BY expiry_date ASC
-        LIMIT 10
-    ''', (session['user_id'],)).fetchall()
-    conn.close()
-    
-    context = {
-        'food_items': [dict(item) for item in food_items],
-        'username': session.get('username')
-    }
+    try:
+        context = ai_chat_context()
+    except DatabaseUnavailable:
+        return jsonify({'success': False, 'message': 'Database connection error'})
     
     # Get AI response
     result = ai_assistant.chat_with_assistant(user_message, context)
@@ -466,6 +589,24 @@ def ai_chat():
         'response': result['response']
     })
 
+@app.route('/ai/chat/stream', methods=['POST'])
+def ai_chat_stream():
+    """Chat reply as server-sent events, text arriving as the model produces it"""
+    if 'user_id' not in session:
+        return jsonify({'success': False, 'message': 'Please login first'}), 401
+    
+    user_message = (request.get_json() or {}).get('message', '')
+    if not user_message:
+        return jsonify({'success': False, 'message': 'No message provided'}), 400
+    
+    try:
+        context = ai_chat_context()
+    except DatabaseUnavailable:
+        return jsonify({'success': False, 'message': 'Database connection error'}), 503
+    
+    return Response(chat_stream(ai_assistant, user_message, context), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
 @app.route('/ai/generate-recipe', methods=['POST'])
 def ai_generate_recipe():
     """Generate AI recipe from selected ingredients"""
@@ -479,8 +620,13 @@ def ai_generate_recipe():
     if not ingredients:
         return jsonify({'success': False, 'message': 'No ingredients provided'})
     
-    # Generate recipe
-    recipe = ai_assistant.generate_recipe_from_ingredients(ingredients, dietary_prefs)
+    # Generate recipe (or reuse one generated for the same ingredients and preferences)
+    recipe = ai_cache.get_or_compute(
+        'recipe',
+        [normalize_items(ingredients), normalize_text(dietary_prefs or '')],
+        lambda: ai_assistant.generate_recipe_from_ingredients(ingredients, dietary_prefs),
+        cacheable=lambda recipe: bool(recipe and recipe.get('recipe_name'))
+    )
     
     return jsonify({
         'success': True,
@@ -493,18 +639,18 @@ def ai_storage_tip(food_id):
     if 'user_id' not in session:
         return jsonify({'success': False, 'message': 'Please login first'})
     
-    conn = get_db_connection()
-    food = conn.execute('''
-        SELECT food_name FROM food_items 
-        WHERE id = ? AND user_id = ?
-    ''', (food_id, session['user_id'])).fetchone()
-    conn.close()
+    try:
+        food = repository.get_item(session['user_id'], food_id)
+    except DatabaseUnavailable:
+        return jsonify({'success': False, 'message': 'Database connection error'})
     
     if not food:
         return jsonify({'success': False, 'message': 'Food item not found'})
     
     # Get storage advice
-    advice = ai_assistant.get_food_storage_advice(food['food_name'])
+    advice = ai_cache.get_or_compute('storage_tip', normalize_text(food.food_name),
+                                     lambda: ai_assistant.get_food_storage_advice(food.food_name),
+                                     cacheable=lambda advice: advice.get('success'))
     
     return jsonify({
         'success': advice['success'],
@@ -517,24 +663,22 @@ def ai_meal_plan():
     if 'user_id' not in session:
         return jsonify({'success': False, 'message': 'Please login first'})
     
-    conn = get_db_connection()
-    items = conn.execute('''
-        SELECT food_name, 
-               julianday(expiry_date) - julianday('now') as days_left
-        FROM food_items 
-        WHERE user_id = ? AND status != 'Expired'
-        ORDER BY expiry_date ASC
-        LIMIT 15
-    ''', (session['user_id'],)).fetchall()
-    conn.close()
+    try:
+        items = repository.unexpired_items(session['user_id'], limit=15)
+    except DatabaseUnavailable:
+        return jsonify({'success': False, 'message': 'Database connection error'})
     
     available_items = [
-        {'name': item['food_name'], 'days_left': int(item['days_left'])}
+        {'name': item.food_name, 'days_left': item.days_remaining}
         for item in items
     ]
     
     # Generate meal plan
-    result = ai_assistant.suggest_meals_for_week(available_items)
+    result = ai_cache.get_or_compute('meal_plan',
+                                     sorted([normalize_text(item['name']), item['days_left']]
+                                            for item in available_items),
+                                     lambda: ai_assistant.suggest_meals_for_week(available_items),
+                                     cacheable=lambda result: result.get('success'))
     
     return jsonify({
         'success': result['success'],
@@ -547,7 +691,10 @@ def ai_quick_tip(food_name):
     if 'user_id' not in session:
         return jsonify({'success': False, 'message': 'Please login first'})
     
-    tip = ai_assistant.get_quick_tip(food_name)
+    # The assistant answers with the tip text; anything else (e.g. None on an API error) is not cached
+    tip = ai_cache.get_or_compute('quick_tip', normalize_text(food_name),
+                                  lambda: ai_assistant.get_quick_tip(food_name),
+                                  cacheable=lambda tip: isinstance(tip, str) and bool(tip.strip()))
     
     return jsonify({
         'success': True,
@@ -562,15 +709,7 @@ def generate_recipes_endpoint():
     
     try:
         # Get near expiry items
-        conn = get_db_connection()
-        near_expiry_items = conn.execute('''
-            SELECT food_name, expiry_date
-            FROM food_items 
-            WHERE user_id = ? AND status = 'Near Expiry'
-            ORDER BY expiry_date ASC
-            LIMIT 5
-        ''', (session['user_id'],)).fetchall()
-        conn.close()
+        near_expiry_items = repository.near_expiry_items(session['user_id'], limit=5)
         
         if not near_expiry_items or len(near_expiry_items) == 0:
             return jsonify({
@@ -579,25 +718,26 @@ def generate_recipes_endpoint():
             })
         
         # Get ingredients
-        ingredients = [item['food_name'] for item in near_expiry_items]
-        cache_key = f"recipes_{session['user_id']}_{'_'.join(sorted(ingredients))}"
+        ingredients = [item.food_name for item in near_expiry_items]
+        timed_out = 0
         
-        # Generate 2 AI recipes
-        ai_recipes = []
-        for i in range(2):
-            dietary_pref = None if i == 0 else "quick and easy"
-            ai_recipe = ai_assistant.generate_recipe_from_ingredients(ingredients, dietary_pref)
-            if ai_recipe and ai_recipe.get('recipe_name'):
-                ai_recipes.append(ai_recipe)
+        def generate():
+            # Generate the 2 AI recipes concurrently, keeping whichever finish within AI_TIMEOUT
+            nonlocal timed_out
+            ai_recipes, timed_out = ai_calls.generate_recipes(ai_assistant, ingredients)
+            cache_partial_recipes(ai_cache, normalize_items(ingredients), ai_recipes)
+            return ai_recipes
         
-        # Cache recipes
-        session[cache_key] = ai_recipes
-        session.permanent = True
+        # Cached server-side for everyone with the same near-expiry items, picked up by the dashboard;
+        # a partial set is only kept briefly for display so the next request tries again
+        ai_recipes = ai_cache.get_or_compute('recipes', normalize_items(ingredients), generate,
+                                             cacheable=lambda recipes: len(recipes) == len(RECIPE_VARIANTS))
         
         return jsonify({
             'success': True,
             'recipes': ai_recipes,
-            'count': len(ai_recipes)
+            'count': len(ai_recipes),
+            'timed_out': timed_out
         })
         
     except Exception as e:
@@ -607,15 +747,45 @@ def generate_recipes_endpoint():
             'message': f'Error: {str(e)}'
         })
 
+@app.route('/ai/generate-recipes/stream')
+def generate_recipes_stream():
+    """Server-sent events version of /ai/generate-recipes, one event per recipe as it is ready"""
+    if 'user_id' not in session:
+        return jsonify({'success': False, 'message': 'Please login first'}), 401
+    
+    try:
+        near_expiry_items = repository.near_expiry_items(session['user_id'], limit=5)
+    except DatabaseUnavailable:
+        return jsonify({'success': False, 'message': 'Database connection error'}), 503
+    
+    if not near_expiry_items:
+        return jsonify({
+            'success': False,
+            'message': 'No near-expiry items found. Add some food items first!'
+        }), 404
+    
+    ingredients = [item.food_name for item in near_expiry_items]
+    stream = recipe_stream(ai_calls, ai_assistant, ingredients, ai_cache)
+    return Response(stream, mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
 @app.route('/ai/regenerate-recipes', methods=['POST'])
 def regenerate_recipes():
     """Clear recipe cache and regenerate"""
     if 'user_id' not in session:
         return jsonify({'success': False, 'message': 'Please login first'})
     
-    # Clear all recipe caches for this user
-    keys_to_remove = [key for key in session.keys() if key.startswith(f'recipes_{session["user_id"]}_')]
-    for key in keys_to_remove:
+    # Drop the cached recipes for the user's current near-expiry items
+    try:
+        near_expiry_items = repository.near_expiry_items(session['user_id'], limit=5)
+    except DatabaseUnavailable:
+        return jsonify({'success': False, 'message': 'Database connection error'})
+    request = normalize_items(item.food_name for item in near_expiry_items)
+    ai_cache.invalidate('recipes', request)
+    ai_cache.invalidate('recipes_partial', request)
+    
+    # Recipes cached in the session cookie by older versions
+    for key in [key for key in session.keys() if key.startswith('recipes_')]:
         session.pop(key, None)
     
     return jsonify({
@@ -630,5 +800,10 @@ if __name__ == '__main__':
     # Initialize database
     init_db()
     
+    # In-process scheduler (only in the reloader's child process); set NOTIFY_IN_PROCESS=false
+    # when running `python notifier.py` as a separate worker instead
+    if os.getenv('NOTIFY_IN_PROCESS', 'true').lower() == 'true' and os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        notification_engine.start()
+    
     # Run app
     app.run(debug=True, host='0.0.0.0', port=5000)
@@ -0,0 +1,276 @@
+import argparse
+import json
+import os
+import platform
+import random
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date, datetime, timedelta
+
+import cv2
+import numpy as np
+
+from ocr_model import ExpiryDateExtractor
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_CORPUS = os.path.join(BASE_DIR, 'benchmark', 'corpus.json')
+
+# Every layout DateRecognizer understands, rendered for the synthetic corpus
+DATE_FORMATS = {
+    'dd/mm/yyyy': lambda d: d.strftime('%d/%m/%Y'),
+    'dd-mm-yyyy': lambda d: d.strftime('%d-%m-%Y'),
+    'dd.mm.yy': lambda d: d.strftime('%d.%m.%y'),
+    'yyyy-mm-dd': lambda d: d.strftime('%Y-%m-%d'),
+    'mon dd, yyyy': lambda d: d.strftime('%b %d, %Y').upper(),
+    'month dd yyyy': lambda d: d.strftime('%B %d %Y'),
+    'dd mon yyyy': lambda d: d.strftime('%d %b %Y').upper(),
+    'dd month yy': lambda d: d.strftime('%d %B %y')
+}
+DATE_PREFIXES = ['EXP', 'EXPIRY', 'BEST BEFORE', 'USE BY', 'BB']
+PRODUCT_NAMES = ['Whole Milk', 'Greek Yogurt', 'Cheddar Cheese', 'Orange Juice', 'Baked Beans',
+                 'Sandwich Bread', 'Chicken Breast', 'Peanut Butter']
+DISTORTIONS = ['clean', 'blur', 'noise', 'rotate']
+
+# Filled in by the pool initializer in each worker
+_bench_extractor = None
+
+
+def _init_worker(options):
+    """Create one extractor per benchmark worker process"""
+    global _bench_extractor
+    _bench_extractor = ExpiryDateExtractor(**options)
+
+
+def _extract(path):
+    """OCR one image and report its result and stage timings (runs in a worker)"""
+    start = time.perf_counter()
+    try:
+        expiry_date, text = _bench_extractor.extract_expiry_date(path)
+        food_name = _bench_extractor.extract_food_name(text)
+        error = None
+    except Exception as e:
+        expiry_date, food_name, error = None, "Unknown", str(e)
+    return {
+        'expiry_date': expiry_date,
+        'food_name': food_name,
+        'error': error,
+        'timings': dict(_bench_extractor.last_timings),
+        'seconds': time.perf_counter() - start
+    }
+
+
+def load_corpus(path):
+    """Read the labelled corpus, skipping entries whose image is missing"""
+    with open(path) as f:
+        corpus = json.load(f)
+    base = os.path.dirname(os.path.dirname(os.path.abspath(path)))
+    items = []
+    for entry in corpus['images']:
+        image = os.path.join(base, entry['image'])
+        if not os.path.exists(image):
+            print(f"Skipping missing corpus image: {entry['image']}")
+            continue
+        items.append({
+            'image': image,
+            'expected_date': entry.get('expected_date'),
+            'expected_name': entry.get('expected_name'),
+            'tags': entry.get('tags', [])
+        })
+    return items
+
+
+def distort(image, distortion, rng):
+    """Apply one of the DISTORTIONS to a rendered label"""
+    if distortion == 'blur':
+        return cv2.GaussianBlur(image, (5, 5), 1.5)
+    if distortion == 'noise':
+        noise = rng.normal(0, 18, image.shape)
+        return np.clip(image.astype(np.float32) + noise, 0, 255).astype(np.uint8)
+    if distortion == 'rotate':
+        height, width = image.shape[:2]
+        angle = float(rng.uniform(-7, 7))
+        matrix = cv2.getRotationMatrix2D((width / 2, height / 2), angle, 1.0)
+        return cv2.warpAffine(image, matrix, (width, height), borderValue=(255, 255, 255))
+    return image
+
+
+def render_label(product, date_text):
+    """Draw a plain two-line label (product name over the date) on white"""
+    image = np.full((220, 900, 3), 255, dtype=np.uint8)
+    cv2.putText(image, product, (30, 85), cv2.FONT_HERSHEY_DUPLEX, 1.6, (0, 0, 0), 3, cv2.LINE_AA)
+    cv2.putText(image, date_text, (30, 170), cv2.FONT_HERSHEY_SIMPLEX, 1.3, (0, 0, 0), 2, cv2.LINE_AA)
+    return image
+
+
+def generate_synthetic(output_dir, per_format=2, seed=0):
+    """Render every date format under every distortion, returns labelled corpus items"""
+    rng = random.Random(seed)
+    noise_rng = np.random.default_rng(seed)
+    items = []
+    for format_name, render in DATE_FORMATS.items():
+        for index in range(per_format):
+            expiry = date.today() + timedelta(days=rng.randint(1, 900))
+            product = rng.choice(PRODUCT_NAMES)
+            text = f"{rng.choice(DATE_PREFIXES)} {render(expiry)}"
+            label = render_label(product, text)
+            for distortion in DISTORTIONS:
+                slug = format_name.replace('/', '').replace(' ', '_').replace(',', '').replace('.', '')
+                path = os.path.join(output_dir, f"{slug}_{index}_{distortion}.png")
+                cv2.imwrite(path, distort(label, distortion, noise_rng))
+                items.append({
+                    'image': path,
+                    'expected_date': expiry.isoformat(),
+                    'expected_name': product,
+                    'tags': ['synthetic', format_name, distortion]
+                })
+    return items
+
+
+def percentiles(values):
+    """p50/p90/p95/p99/max in milliseconds"""
+    if not values:
+        return {}
+    ms = np.array(values) * 1000
+    summary = {f'p{p}': round(float(np.percentile(ms, p)), 2) for p in (50, 90, 95, 99)}
+    summary['max'] = round(float(ms.max()), 2)
+    summary['count'] = len(values)
+    return summary
+
+
+def run_pool(items, options, workers):
+    """OCR every item with the given number of worker processes, returns (results, seconds)"""
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(options,)) as executor:
+        results = list(executor.map(_extract, [item['image'] for item in items]))
+    return results, time.perf_counter() - start
+
+
+def score(items, results):
+    """Exact-match date accuracy and name accuracy, overall and per tag"""
+    groups = defaultdict(lambda: {'images': 0, 'date_correct': 0, 'names': 0, 'name_correct': 0})
+    failures = []
+    for item, result in zip(items, results):
+        date_ok = result['expiry_date'] == item['expected_date']
+        name_ok = None
+        if item['expected_name']:
+            name_ok = item['expected_name'].lower() in result['food_name'].lower()
+        for tag in ['all'] + item['tags']:
+            group = groups[tag]
+            group['images'] += 1
+            group['date_correct'] += date_ok
+            if name_ok is not None:
+                group['names'] += 1
+                group['name_correct'] += name_ok
+        if not date_ok or name_ok is False or result['error']:
+            failures.append({
+                'image': os.path.relpath(item['image'], BASE_DIR) if 'synthetic' not in item['tags']
+                else os.path.basename(item['image']),
+                'expected_date': item['expected_date'],
+                'expiry_date': result['expiry_date'],
+                'expected_name': item['expected_name'],
+                'food_name': result['food_name'],
+                'error': result['error']
+            })
+    
+    accuracy = {}
+    for tag, group in groups.items():
+        accuracy[tag] = {
+            'images': group['images'],
+            'date_accuracy': round(group['date_correct'] / group['images'], 3),
+            'name_accuracy': round(group['name_correct'] / group['names'], 3) if group['names'] else None
+        }
+    return accuracy, failures
+
+
+def stage_latencies(results):
+    """Percentiles for every timed stage (preprocess.*, each PSM pass, regions, parse)"""
+    samples = defaultdict(list)
+    for result in results:
+        for stage, seconds in result['timings'].items():
+            samples[stage].append(seconds)
+        samples['total'].append(result['seconds'])
+    return {stage: percentiles(values) for stage, values in sorted(samples.items())}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark OCR speed and accuracy on a labelled corpus.')
+    parser.add_argument('--corpus', default=DEFAULT_CORPUS, help='labelled corpus JSON')
+    parser.add_argument('--synthetic', type=int, default=2,
+                        help='synthetic labels per date format (0 disables them)')
+    parser.add_argument('--seed', type=int, default=0, help='seed for synthetic labels')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1,
+                        help='worker processes for the multi-core run')
+    parser.add_argument('--parallel-passes', action='store_true',
+                        help='run the PSM passes concurrently')
+    parser.add_argument('--no-short-circuit', action='store_true',
+                        help='always run every PSM pass')
+    parser.add_argument('--detect-regions', action='store_true',
+                        help='OCR text-line crops before the whole image')
+    parser.add_argument('--backend', help='OCR engine (pytesseract or tesserocr)')
+    parser.add_argument('--output', default='benchmark_results.json', help='where to write the report')
+    args = parser.parse_args(argv)
+    
+    options = {
+        'parallel_passes': args.parallel_passes,
+        'short_circuit': not args.no_short_circuit,
+        'detect_regions': args.detect_regions,
+        'ocr_backend': args.backend
+    }
+    extractor = ExpiryDateExtractor(**options)
+    
+    with tempfile.TemporaryDirectory() as synthetic_dir:
+        items = load_corpus(args.corpus)
+        if args.synthetic:
+            items += generate_synthetic(synthetic_dir, args.synthetic, args.seed)
+        if not items:
+            print("No images to benchmark")
+            return 1
+        
+        print(f"Benchmarking {len(items)} images...")
+        single_results, single_seconds = run_pool(items, options, 1)
+        workers = max(1, min(args.workers, len(items)))
+        _, multi_seconds = run_pool(items, options, workers)
+    
+    accuracy, failures = score(items, single_results)
+    report = {
+        'run': {
+            'timestamp': datetime.now().isoformat(timespec='seconds'),
+            'host': platform.node(),
+            'python': platform.python_version(),
+            'cpu_count': os.cpu_count(),
+            'backend': extractor.ocr_backend.name,
+            'options': {key: value for key, value in options.items() if key != 'ocr_backend'},
+            'config_signature': extractor.config_signature(),
+            'images': len(items)
+        },
+        'throughput': {
+            'single_core_images_per_sec': round(len(items) / single_seconds, 3),
+            'multi_core_images_per_sec': round(len(items) / multi_seconds, 3),
+            'multi_core_workers': workers
+        },
+        'latency_ms': stage_latencies(single_results),
+        'accuracy': accuracy,
+        'failures': failures
+    }
+    
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+    
+    overall = accuracy['all']
+    print("=" * 50)
+    print(f"Date accuracy: {overall['date_accuracy']:.1%} of {overall['images']} images")
+    if overall['name_accuracy'] is not None:
+        print(f"Name accuracy: {overall['name_accuracy']:.1%}")
+    print(f"Single core: {report['throughput']['single_core_images_per_sec']:.2f} images/sec")
+    print(f"{workers} workers: {report['throughput']['multi_core_images_per_sec']:.2f} images/sec")
+    print(f"Median latency: {report['latency_ms']['total']['p50']:.0f} ms")
+    print(f"Report written to {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,84 @@
+import json
+import time
+from datetime import datetime, timedelta
+
+# Deletions are remembered this long; a client that last synced before that reloads its list
+DELETION_RETENTION_DAYS = 7
+# Longest change set sent as a delta, bigger ones tell the client to reload instead
+MAX_CHANGES = 500
+# A stream re-checks the revision this often and closes after STREAM_SECONDS (EventSource reconnects)
+STREAM_POLL_SECONDS = 15
+STREAM_SECONDS = 300
+
+
+class ChangeFeed:
+    """Per-user revision counter behind /api/changes, bumped by every food_items write"""
+    
+    # user_revisions holds each user's latest revision; written food_items rows carry the revision of
+    # the write, deletions leave a row in food_deletions
+    def __init__(self, dialect):
+        self.dialect = dialect
+        self.param = '%s' if dialect == 'mysql' else '?'
+        if dialect == 'mysql':
+            self.bump_sql = '''
+                INSERT INTO user_revisions (user_id, revision) VALUES (%s, 1)
+                ON DUPLICATE KEY UPDATE revision = revision + 1
+            '''
+        else:
+            self.bump_sql = '''
+                INSERT INTO user_revisions (user_id, revision) VALUES (?, 1)
+                ON CONFLICT (user_id) DO UPDATE SET revision = revision + 1
+            '''
+    
+    def _sql(self, query):
+        return query.replace('?', self.param)
+    
+    def next_revision(self, cursor, user_id):
+        """Increment and return the user's revision; the row stays locked until the transaction ends,
+        so revisions commit in order"""
+        cursor.execute(self.bump_sql, (user_id,))
+        cursor.execute(self._sql('SELECT revision FROM user_revisions WHERE user_id = ?'), (user_id,))
+        return cursor.fetchone()[0]
+    
+    def record_deleted(self, cursor, user_id, food_ids, revision):
+        """Leave tombstones for deleted items"""
+        cursor.executemany(self._sql('''
+            INSERT INTO food_deletions (user_id, food_item_id, revision, deleted_at)
+            VALUES (?, ?, ?, ?)
+        '''), [(user_id, food_id, revision, datetime.now().strftime('%Y-%m-%d %H:%M:%S'))
+               for food_id in food_ids])
+    
+    def prune(self, conn, now=None):
+        """Drop tombstones older than DELETION_RETENTION_DAYS, remembering the newest dropped revision
+        per user so older clients are told to reload"""
+        now = now or datetime.now()
+        cutoff = (now - timedelta(days=DELETION_RETENTION_DAYS)).strftime('%Y-%m-%d %H:%M:%S')
+        cursor = conn.cursor()
+        cursor.execute(self._sql('''
+            SELECT user_id, MAX(revision) FROM food_deletions
+            WHERE deleted_at < ?
+            GROUP BY user_id
+        '''), (cutoff,))
+        pruned = cursor.fetchall()
+        if pruned:
+            cursor.executemany(self._sql('UPDATE user_revisions SET pruned_through = ? WHERE user_id = ?'),
+                               [(revision, user_id) for user_id, revision in pruned])
+            cursor.execute(self._sql('DELETE FROM food_deletions WHERE deleted_at < ?'), (cutoff,))
+        conn.commit()
+        cursor.close()
+        return len(pruned)
+
+
+def change_stream(repository, user_id, since):
+    """Server-sent events for one client: a 'changes' event whenever the user's revision moves"""
+    deadline = time.monotonic() + STREAM_SECONDS
+    yield f"retry: {STREAM_POLL_SECONDS * 1000}\n\n"
+    while time.monotonic() < deadline:
+        feed = repository.changes_since(user_id, since)
+        if feed['revision'] != since:
+            since = feed['revision']
+            yield f"id: {since}\nevent: changes\ndata: {json.dumps(feed)}\n\n"
+        else:
+            # Comment line, keeps proxies from closing an idle connection
+            yield ": idle\n\n"
+        repository.wait_for_change(STREAM_POLL_SECONDS)
@@ -0,0 +1,170 @@
+import argparse
+import os
+import sys
+from datetime import datetime, timedelta
+
+from db_pool import MySQLConnectionPool, SQLiteConnectionPool
+
+NEAR_EXPIRY_DAYS = 3
+TREND_MONTHS = 6
+STATUSES = ('Fresh', 'Near Expiry', 'Expired')
+
+
+def item_status(expiry_date, today=None):
+    """Status of an item with the given expiry date (date or YYYY-MM-DD string)"""
+    today = today or datetime.now().date()
+    if isinstance(expiry_date, str):
+        expiry_date = datetime.strptime(expiry_date, '%Y-%m-%d').date()
+    if expiry_date < today:
+        return 'Expired'
+    if expiry_date <= today + timedelta(days=NEAR_EXPIRY_DAYS):
+        return 'Near Expiry'
+    return 'Fresh'
+
+
+class DashboardSummary:
+    """Per-user dashboard counters in dashboard_summary, kept in step with every food_items write"""
+    
+    # Rows are (user_id, dimension, bucket, item_count); dimension is 'category' or 'expiry_date'
+    # (YYYY-MM-DD). Statuses and the expired trend are rolled up from expiry dates against today when
+    # read, so they never wait on the notification engine's status run
+    def __init__(self, dialect):
+        self.dialect = dialect
+        self.param = '%s' if dialect == 'mysql' else '?'
+        if dialect == 'mysql':
+            self.upsert_sql = '''
+                INSERT INTO dashboard_summary (user_id, dimension, bucket, item_count)
+                VALUES (%s, %s, %s, %s)
+                ON DUPLICATE KEY UPDATE item_count = item_count + VALUES(item_count)
+            '''
+        else:
+            self.upsert_sql = '''
+                INSERT INTO dashboard_summary (user_id, dimension, bucket, item_count)
+                VALUES (?, ?, ?, ?)
+                ON CONFLICT (user_id, dimension, bucket)
+                DO UPDATE SET item_count = item_count + excluded.item_count
+            '''
+    
+    def _sql(self, query):
+        return query.replace('?', self.param)
+    
+    def _apply(self, cursor, deltas):
+        """Add {(user_id, dimension, bucket): delta} to the counters"""
+        rows = [(user_id, dimension, bucket, delta)
+                for (user_id, dimension, bucket), delta in deltas.items() if delta]
+        if rows:
+            cursor.executemany(self.upsert_sql, rows)
+    
+    @staticmethod
+    def _add(deltas, key, delta):
+        deltas[key] = deltas.get(key, 0) + delta
+    
+    def _item_deltas(self, items, sign, deltas=None):
+        """Counter changes for adding (sign=1) or removing (sign=-1) (user_id, category, status, expiry_date)
+        items; the stored status is not counted, it is derived from the expiry date when read"""
+        deltas = {} if deltas is None else deltas
+        for user_id, category, status, expiry_date in items:
+            self._add(deltas, (user_id, 'category', category or ''), sign)
+            self._add(deltas, (user_id, 'expiry_date', str(expiry_date)[:10]), sign)
+        return deltas
+    
+    def record_added(self, cursor, items):
+        """Count newly inserted (user_id, category, status, expiry_date) items"""
+        self._apply(cursor, self._item_deltas(items, 1))
+    
+    def record_removed(self, cursor, items):
+        """Uncount deleted (user_id, category, status, expiry_date) items"""
+        self._apply(cursor, self._item_deltas(items, -1))
+    
+    def load(self, cursor, user_id, today=None):
+        """(stats, category_data, monthly_trend) for the dashboard from one indexed lookup, with each
+        expiry date bucket classed against today"""
+        today = today or datetime.now().date()
+        cursor.execute(self._sql('''
+            SELECT dimension, bucket, item_count FROM dashboard_summary
+            WHERE user_id = ? AND item_count > 0
+            ORDER BY dimension, bucket
+        '''), (user_id,))
+        rows = cursor.fetchall()
+        
+        status_counts = {status: 0 for status in STATUSES}
+        category_data = []
+        expired_months = {}
+        months_back = today.year * 12 + today.month - 1 - TREND_MONTHS
+        first_month = f"{months_back // 12:04d}-{months_back % 12 + 1:02d}"
+        for dimension, bucket, count in rows:
+            if dimension == 'category':
+                category_data.append({'category': bucket or None, 'count': count})
+            elif dimension == 'expiry_date':
+                status = item_status(bucket, today)
+                status_counts[status] += count
+                if status == 'Expired' and bucket[:7] >= first_month:
+                    expired_months[bucket[:7]] = expired_months.get(bucket[:7], 0) + count
+        monthly_trend = [{'month': month, 'expired_count': count}
+                         for month, count in sorted(expired_months.items())]
+        
+        stats = {
+            'total_items': sum(status_counts.values()),
+            'fresh_count': status_counts['Fresh'],
+            'near_expiry_count': status_counts['Near Expiry'],
+            'expired_count': status_counts['Expired']
+        }
+        return stats, category_data, monthly_trend
+    
+    def rebuild(self, conn, today=None):
+        """Recompute stored statuses (used by notifications) and every counter from food_items"""
+        today = today or datetime.now().date()
+        cursor = conn.cursor()
+        cursor.execute(self._sql('''
+            UPDATE food_items SET status = CASE
+                WHEN expiry_date < ? THEN 'Expired'
+                WHEN expiry_date <= ? THEN 'Near Expiry'
+                ELSE 'Fresh'
+            END
+        '''), (today.isoformat(), (today + timedelta(days=NEAR_EXPIRY_DAYS)).isoformat()))
+        cursor.execute('DELETE FROM dashboard_summary')
+        cursor.execute('''
+            INSERT INTO dashboard_summary (user_id, dimension, bucket, item_count)
+            SELECT user_id, 'category', COALESCE(category, ''), COUNT(*)
+            FROM food_items GROUP BY user_id, COALESCE(category, '')
+        ''')
+        cursor.execute('''
+            INSERT INTO dashboard_summary (user_id, dimension, bucket, item_count)
+            SELECT user_id, 'expiry_date', expiry_date, COUNT(*)
+            FROM food_items GROUP BY user_id, expiry_date
+        ''')
+        cursor.execute('SELECT COUNT(*) FROM dashboard_summary')
+        rows = cursor.fetchone()[0]
+        conn.commit()
+        cursor.close()
+        return rows
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Rebuild the per-user dashboard summary table.')
+    parser.add_argument('--mysql', action='store_true',
+                        help='use MySQL (MYSQL_HOST/MYSQL_USER/MYSQL_PASSWORD/MYSQL_DATABASE)')
+    parser.add_argument('--database', default='food_tracker.db', help='SQLite database file')
+    args = parser.parse_args(argv)
+    
+    if args.mysql:
+        pool = MySQLConnectionPool({
+            'host': os.getenv('MYSQL_HOST', 'localhost'),
+            'user': os.getenv('MYSQL_USER', 'root'),
+            'password': os.getenv('MYSQL_PASSWORD', ''),
+            'database': os.getenv('MYSQL_DATABASE', 'food_expiry_tracker')
+        }, size=1)
+    else:
+        pool = SQLiteConnectionPool(args.database, size=1)
+    
+    conn = pool.connection()
+    try:
+        rows = DashboardSummary(pool.dialect).rebuild(conn)
+    finally:
+        conn.close()
+    print(f"Dashboard summary rebuilt ({rows} rows)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -24,6 +24,7 @@ CREATE TABLE IF NOT EXISTS food_items (
     category VARCHAR(100),
     quantity VARCHAR(50),
     notes TEXT,
+    revision INT NOT NULL DEFAULT 0,
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
     updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
     FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
@@ -34,14 +35,43 @@ CREATE TABLE IF NOT EXISTS notifications (
     id INT AUTO_INCREMENT PRIMARY KEY,
     user_id INT NOT NULL,
     food_item_id INT NOT NULL,
+    kind VARCHAR(20) NOT NULL DEFAULT 'near_expiry',
     message TEXT NOT NULL,
     is_sent BOOLEAN DEFAULT FALSE,
     sent_at TIMESTAMP,
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    UNIQUE KEY uq_notification_item_kind (food_item_id, kind),
     FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE,
     FOREIGN KEY (food_item_id) REFERENCES food_items(id) ON DELETE CASCADE
 );
 
+-- Per-user dashboard counters by category and expiry date, maintained incrementally (see dashboard_summary.py)
+CREATE TABLE IF NOT EXISTS dashboard_summary (
+    user_id INT NOT NULL,
+    dimension VARCHAR(20) NOT NULL,
+    bucket VARCHAR(100) NOT NULL,
+    item_count INT NOT NULL DEFAULT 0,
+    PRIMARY KEY (user_id, dimension, bucket),
+    FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
+);
+
+-- Change feed: each user's latest revision, and tombstones of deleted items (see change_feed.py)
+CREATE TABLE IF NOT EXISTS user_revisions (
+    user_id INT PRIMARY KEY,
+    revision INT NOT NULL DEFAULT 0,
+    pruned_through INT NOT NULL DEFAULT 0,
+    FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
+);
+
+CREATE TABLE IF NOT EXISTS food_deletions (
+    user_id INT NOT NULL,
+    food_item_id INT NOT NULL,
+    revision INT NOT NULL,
+    deleted_at DATETIME NOT NULL,
+    INDEX idx_food_deletions_user_revision (user_id, revision),
+    INDEX idx_food_deletions_deleted_at (deleted_at)
+);
+
 -- Food Categories Table
 CREATE TABLE IF NOT EXISTS categories (
     id INT AUTO_INCREMENT PRIMARY KEY,
@@ -65,7 +95,12 @@ INSERT INTO categories (name, description) VALUES
 ('Other', 'Miscellaneous items');
 
 -- Create indexes for better performance
-CREATE INDEX idx_user_id ON food_items(user_id);
-CREATE INDEX idx_expiry_date ON food_items(expiry_date);
-CREATE INDEX idx_status ON food_items(status);
+-- Per-user lists filtered/sorted (and keyset-paginated) by (expiry_date, id); food_name makes
+-- the near-expiry lists covering
+CREATE INDEX idx_food_user_expiry_id ON food_items(user_id, expiry_date, id, food_name);
+-- Change feed: rows written after a given revision
+CREATE INDEX idx_food_user_revision ON food_items(user_id, revision);
+-- Notification engine: expiry date ranges filtered on status
+CREATE INDEX idx_food_expiry_status ON food_items(expiry_date, status);
 CREATE INDEX idx_user_notifications ON notifications(user_id);
+CREATE INDEX idx_notifications_unsent ON notifications(is_sent, user_id);
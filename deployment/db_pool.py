@@ -0,0 +1,267 @@
+import queue
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import deque
+
+from flask import g, has_app_context
+
+try:
+    import mysql.connector
+except ImportError:
+    mysql = None
+
+
+class PoolTimeout(Exception):
+    """No connection became free within the pool's checkout timeout"""
+
+
+class PooledConnection:
+    """Checked-out connection; close() hands it back to the pool instead of closing it"""
+    
+    def __init__(self, pool, conn):
+        self._pool = pool
+        self._conn = conn
+        # Set while the connection belongs to a Flask app context (returned at teardown)
+        self.bound = False
+    
+    def __getattr__(self, name):
+        if self._conn is None:
+            raise AttributeError(f"connection already returned to the pool ({name})")
+        return getattr(self._conn, name)
+    
+    @property
+    def raw_connection(self):
+        """The driver connection, for per-connection caches"""
+        return self._conn
+    
+    @property
+    def closed(self):
+        return self._conn is None
+    
+    def close(self):
+        # Helpers like update_food_status close "their" connection mid-request
+        if not self.bound:
+            self.release()
+    
+    def release(self):
+        if self._conn is not None:
+            conn, self._conn = self._conn, None
+            self._pool.release(conn)
+
+
+class ConnectionPool(ABC):
+    """Bounded pool of reusable connections with idle health checks and wait-time metrics"""
+    
+    def __init__(self, size=5, timeout=10, health_check_interval=30):
+        self.size = size
+        self.timeout = timeout
+        # Connections idle longer than this are checked before being handed out
+        self.health_check_interval = health_check_interval
+        self._idle = queue.LifoQueue()
+        self._lock = threading.Lock()
+        self._created = 0
+        self.in_use = 0
+        self.checkouts = 0
+        self.timeouts = 0
+        self.discarded = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+        self._recent_waits = deque(maxlen=1000)
+        # Optional callable receiving every SQL statement run on new connections (SQLite only)
+        self.trace_callback = None
+    
+    @abstractmethod
+    def _connect(self):
+        """Open a new driver connection"""
+    
+    @abstractmethod
+    def _is_healthy(self, conn):
+        """True if an idle connection can still be used"""
+    
+    def _reset(self, conn):
+        """Roll back anything the borrower left uncommitted"""
+        if conn.in_transaction:
+            conn.rollback()
+    
+    def _close(self, conn):
+        try:
+            conn.close()
+        except Exception:
+            pass
+    
+    def _discard(self, conn):
+        self._close(conn)
+        with self._lock:
+            self._created -= 1
+            self.discarded += 1
+    
+    def _take(self, deadline):
+        """Return (connection, last_used) from the idle stack, or open a new one if under size"""
+        while True:
+            try:
+                return self._idle.get_nowait()
+            except queue.Empty:
+                pass
+            with self._lock:
+                if self._created < self.size:
+                    self._created += 1
+                    break
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                raise PoolTimeout(f"no database connection free after {self.timeout}s")
+            try:
+                return self._idle.get(timeout=remaining)
+            except queue.Empty:
+                continue
+        try:
+            return self._connect(), time.time()
+        except Exception:
+            with self._lock:
+                self._created -= 1
+            raise
+    
+    def connection(self):
+        """Check out a connection, waiting up to timeout seconds for one to be returned"""
+        start = time.perf_counter()
+        deadline = start + self.timeout
+        try:
+            while True:
+                conn, last_used = self._take(deadline)
+                if time.time() - last_used < self.health_check_interval or self._is_healthy(conn):
+                    break
+                self._discard(conn)
+        except PoolTimeout:
+            with self._lock:
+                self.timeouts += 1
+            raise
+        
+        waited = time.perf_counter() - start
+        with self._lock:
+            self.in_use += 1
+            self.checkouts += 1
+            self.wait_total += waited
+            self.wait_max = max(self.wait_max, waited)
+            self._recent_waits.append(waited)
+        return PooledConnection(self, conn)
+    
+    def release(self, conn):
+        """Return a connection to the pool (called by PooledConnection.close)"""
+        with self._lock:
+            self.in_use -= 1
+        try:
+            self._reset(conn)
+        except Exception:
+            self._discard(conn)
+            return
+        self._idle.put((conn, time.time()))
+    
+    def close_all(self):
+        """Close every idle connection"""
+        while True:
+            try:
+                conn, _ = self._idle.get_nowait()
+            except queue.Empty:
+                return
+            self._discard(conn)
+    
+    def stats(self):
+        with self._lock:
+            waits = sorted(self._recent_waits)
+            return {
+                'size': self.size,
+                'open': self._created,
+                'in_use': self.in_use,
+                'idle': self._idle.qsize(),
+                'checkouts': self.checkouts,
+                'timeouts': self.timeouts,
+                'discarded': self.discarded,
+                'wait_ms_avg': round(self.wait_total / self.checkouts * 1000, 3) if self.checkouts else 0.0,
+                'wait_ms_p95': round(waits[int(len(waits) * 0.95)] * 1000, 3) if waits else 0.0,
+                'wait_ms_max': round(self.wait_max * 1000, 3)
+            }
+
+
+class MySQLConnectionPool(ConnectionPool):
+    """Pool of mysql.connector connections opened with the given config"""
+    
+    # SQL flavour and placeholder used by code written for either backend
+    dialect = 'mysql'
+    paramstyle = '%s'
+    
+    def __init__(self, config, size=5, timeout=10, health_check_interval=30):
+        if mysql is None:
+            raise RuntimeError("mysql-connector-python is not installed")
+        super().__init__(size, timeout, health_check_interval)
+        self.config = config
+    
+    def _connect(self):
+        return mysql.connector.connect(**self.config)
+    
+    def _is_healthy(self, conn):
+        try:
+            conn.ping(reconnect=True, attempts=1)
+            return True
+        except mysql.connector.Error:
+            return False
+
+
+class SQLiteConnectionPool(ConnectionPool):
+    """Pool of SQLite connections in WAL mode, each used by one thread at a time"""
+    
+    dialect = 'sqlite'
+    paramstyle = '?'
+    
+    PRAGMAS = (
+        'PRAGMA journal_mode = WAL',      # readers no longer block the writer
+        'PRAGMA synchronous = NORMAL',    # fsync at checkpoints only, safe with WAL
+        'PRAGMA foreign_keys = ON',
+        'PRAGMA busy_timeout = 5000',     # wait for the write lock instead of failing
+        'PRAGMA cache_size = -16000',     # 16MB page cache per connection
+        'PRAGMA temp_store = MEMORY',
+        'PRAGMA mmap_size = 134217728'
+    )
+    
+    def __init__(self, path, size=8, timeout=10, health_check_interval=300):
+        super().__init__(size, timeout, health_check_interval)
+        self.path = path
+    
+    def _connect(self):
+        # Checked out by whichever request thread needs it, never shared concurrently
+        conn = sqlite3.connect(self.path, check_same_thread=False)
+        conn.row_factory = sqlite3.Row
+        for pragma in self.PRAGMAS:
+            conn.execute(pragma)
+        if self.trace_callback:
+            conn.set_trace_callback(self.trace_callback)
+        return conn
+    
+    def _is_healthy(self, conn):
+        try:
+            conn.execute('SELECT 1')
+            return True
+        except sqlite3.Error:
+            return False
+
+
+def request_connection(pool):
+    """Connection checked out for the current app context, reused by every call in the request"""
+    if not has_app_context():
+        # Startup code and background jobs close the connection themselves
+        return pool.connection()
+    conn = g.get('db_conn')
+    if conn is None or conn.closed:
+        conn = pool.connection()
+        conn.bound = True
+        g.db_conn = conn
+    return conn
+
+
+def init_app(app, pool):
+    """Return the request's connection to the pool when the app context ends"""
+    @app.teardown_appcontext
+    def release_db_connection(exception):
+        conn = g.pop('db_conn', None)
+        if conn is not None:
+            conn.release()
@@ -0,0 +1,58 @@
+import csv
+import io
+import time
+
+from repository import MAX_PAGE_SIZE, valid_food_items
+
+# Columns written by export and read by import (status is informational, import derives it)
+CSV_FIELDS = ('food_name', 'expiry_date', 'purchase_date', 'category', 'quantity', 'status')
+# Rows inserted per transaction while importing
+IMPORT_BATCH_SIZE = 500
+
+
+def export_csv(repository, user_id):
+    """Yield the user's inventory as CSV text, one keyset page at a time"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(CSV_FIELDS)
+    cursor = None
+    while True:
+        items, cursor = repository.list_items_page(user_id, after=cursor, limit=MAX_PAGE_SIZE)
+        for item in items:
+            writer.writerow([item.food_name, item.expiry_date, item.purchase_date or '', item.category or '',
+                             item.quantity or '', item.status])
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+        if not cursor:
+            return
+
+
+def import_csv(repository, user_id, stream):
+    """Insert rows from a CSV file object in IMPORT_BATCH_SIZE transactions, reading it incrementally.
+    Returns counts and timing"""
+    start = time.perf_counter()
+    reader = csv.DictReader(io.TextIOWrapper(stream, encoding='utf-8-sig', newline=''))
+    missing = {'food_name', 'expiry_date'} - set(reader.fieldnames or ())
+    if missing:
+        raise ValueError(f"CSV is missing columns: {', '.join(sorted(missing))}")
+    
+    counts = {'inserted': 0, 'skipped': 0, 'batches': 0}
+    batch = []
+    for row in reader:
+        batch.append({field: (row.get(field) or '').strip() for field in CSV_FIELDS if field != 'status'})
+        if len(batch) >= IMPORT_BATCH_SIZE:
+            _insert_batch(repository, user_id, batch, counts)
+            batch = []
+    if batch:
+        _insert_batch(repository, user_id, batch, counts)
+    
+    counts['seconds'] = round(time.perf_counter() - start, 3)
+    return counts
+
+
+def _insert_batch(repository, user_id, batch, counts):
+    items, skipped = valid_food_items(batch)
+    counts['inserted'] += repository.add_items(user_id, items)
+    counts['skipped'] += skipped
+    counts['batches'] += 1
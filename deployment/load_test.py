@@ -0,0 +1,319 @@
+import argparse
+import io
+import json
+import os
+import platform
+import random
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from collections import defaultdict
+from datetime import date, datetime, timedelta
+
+from werkzeug.security import generate_password_hash
+
+from query_audit import CATEGORIES, OfflineAssistant
+
+PASSWORD = 'load-test'
+# 1x1 PNG; a random suffix makes every upload a different image, so none is answered from the OCR cache
+PNG_BYTES = bytes.fromhex(
+    '89504e470d0a1a0a0000000d4948445200000001000000010806000000'
+    '1f15c4890000000d49444154789c6360000002000001e221bc330000000049454e44ae426082'
+)
+
+# Relative weights of each request type
+MIXES = {
+    'browse': {'index': 40, 'food_items': 20, 'dashboard': 20, 'changes': 15, 'check_notifications': 5},
+    'mixed': {'index': 25, 'food_items': 10, 'dashboard': 15, 'changes': 10, 'check_notifications': 10,
+              'add_food': 15, 'delete_food': 10, 'upload': 5},
+    'write': {'index': 10, 'dashboard': 5, 'changes': 5, 'add_food': 45, 'delete_food': 30, 'upload': 5}
+}
+
+
+class StubOCRQueue:
+    """Answers every upload at once with a fixed result, so no OCR worker processes are started"""
+    
+    config_signature = 'load-test-stub'
+    
+    def __init__(self):
+        self._jobs = {}
+        self._lock = threading.Lock()
+    
+    def submit(self, filepath, filename, owner=None, cache_key=None):
+        job_id = uuid.uuid4().hex
+        with self._lock:
+            self._jobs[job_id] = (owner, filename)
+        return job_id
+    
+    def status(self, job_id, owner=None):
+        with self._lock:
+            job = self._jobs.pop(job_id, None)
+        if job is None or (owner is not None and job[0] != owner):
+            return None
+        return {'success': True, 'status': 'done', 'job_id': job_id, 'image_path': job[1],
+                'expiry_date': (date.today() + timedelta(days=7)).isoformat(), 'food_name': 'Stub Item',
+                'candidates': []}
+    
+    def stats(self):
+        return {'workers': 0, 'pending': len(self._jobs)}
+
+
+def load_app(args, workdir):
+    """Import the SQLite or MySQL app configured for the test, with OCR and AI stubbed"""
+    if args.mysql:
+        import app as app_module
+        from ocr_cache import OCRResultCache
+        app_module.db_pool.config = {
+            'host': os.getenv('MYSQL_HOST', 'localhost'),
+            'user': os.getenv('MYSQL_USER', 'root'),
+            'password': os.getenv('MYSQL_PASSWORD', ''),
+            'database': os.getenv('MYSQL_DATABASE', 'food_expiry_tracker')
+        }
+        app_module.db_pool.size = args.pool_size
+        app_module.ocr_cache = OCRResultCache(os.path.join(workdir, 'ocr_cache.db'))
+    else:
+        os.environ['DATABASE_PATH'] = os.path.join(workdir, 'load_test.db')
+        os.environ['OCR_CACHE_PATH'] = os.path.join(workdir, 'ocr_cache.db')
+        os.environ['AI_CACHE_PATH'] = os.path.join(workdir, 'ai_cache.db')
+        os.environ['DB_POOL_SIZE'] = str(args.pool_size)
+        import app_sqlite as app_module
+        app_module.ai_assistant = OfflineAssistant()
+        app_module.init_db()
+    app_module.ocr_queue = StubOCRQueue()
+    app_module.app.config['UPLOAD_FOLDER'] = os.path.join(workdir, 'uploads')
+    os.makedirs(app_module.app.config['UPLOAD_FOLDER'], exist_ok=True)
+    # Route exceptions reach the worker, which classifies them
+    app_module.app.config['PROPAGATE_EXCEPTIONS'] = True
+    return app_module
+
+
+def seed(app_module, users, items_per_user, prefix):
+    """Create users with items spread from 30 days expired to 90 days ahead, returns the usernames"""
+    repository = app_module.repository
+    today = date.today()
+    # Cheap hash so seeding many users stays fast; login still verifies it like any other
+    password_hash = generate_password_hash(PASSWORD, method='pbkdf2:sha256:1000')
+    usernames = []
+    for index in range(users):
+        username = f'{prefix}{index}'
+        repository.create_user(username, f'{username}@example.com', password_hash)
+        user = repository.get_user_by_username(username)
+        repository.add_items(user.id, [{
+            'food_name': f'Item {n}',
+            'expiry_date': (today + timedelta(days=n % 120 - 30)).isoformat(),
+            'category': CATEGORIES[n % len(CATEGORIES)],
+            'quantity': '1'
+        } for n in range(items_per_user)])
+        usernames.append(username)
+    
+    if app_module.repository.dialect == 'sqlite':
+        conn = app_module.db_pool.connection()
+        conn.execute('ANALYZE')
+        conn.commit()
+        conn.close()
+    return usernames
+
+
+def is_lock_error(error):
+    """SQLite 'database is locked' or a MySQL lock wait timeout/deadlock"""
+    if isinstance(error, sqlite3.OperationalError):
+        return 'locked' in str(error) or 'busy' in str(error)
+    return getattr(error, 'errno', None) in (1205, 1213)
+
+
+class Worker(threading.Thread):
+    """One simulated user sending requests from the mix until the shared budget runs out"""
+    
+    def __init__(self, app_module, username, mix, budget, rng):
+        super().__init__(daemon=True)
+        self.client = app_module.app.test_client()
+        self.username = username
+        self.routes = list(mix)
+        self.weights = [mix[route] for route in self.routes]
+        self.budget = budget
+        self.rng = rng
+        self.samples = defaultdict(list)
+        self.errors = defaultdict(int)
+        self.error_messages = []
+        self.revision = 0
+        self.food_ids = []
+    
+    def run(self):
+        self.client.post('/login', data={'username': self.username, 'password': PASSWORD})
+        page = self.client.get('/api/food_items', query_string={'limit': 200}).get_json()
+        self.food_ids = [item['id'] for item in page['items']]
+        while self.budget.take():
+            route = self.rng.choices(self.routes, self.weights)[0]
+            start = time.perf_counter()
+            try:
+                status = getattr(self, f'request_{route}')()
+            except Exception as e:
+                kind = 'lock_wait' if is_lock_error(e) else 'exception'
+                self.errors[kind] += 1
+                if len(self.error_messages) < 5:
+                    self.error_messages.append(f'{route}: {type(e).__name__}: {e}')
+                status = None
+            self.samples[route].append(time.perf_counter() - start)
+            if status is not None and status >= 400:
+                self.errors[f'http_{status}'] += 1
+    
+    def request_index(self):
+        return self.client.get('/index').status_code
+    
+    def request_food_items(self):
+        status = self.rng.choice([None, 'Fresh', 'Near Expiry', 'Expired'])
+        return self.client.get('/api/food_items', query_string={'status': status} if status else {}).status_code
+    
+    def request_dashboard(self):
+        return self.client.get('/dashboard').status_code
+    
+    def request_changes(self):
+        response = self.client.get('/api/changes', query_string={'since': self.revision})
+        self.revision = response.get_json().get('revision', self.revision)
+        return response.status_code
+    
+    def request_check_notifications(self):
+        return self.client.get('/api/check_notifications').status_code
+    
+    def request_add_food(self):
+        expiry = date.today() + timedelta(days=self.rng.randint(-5, 60))
+        return self.client.post('/add_food', data={
+            'food_name': f'Load Item {self.rng.randint(0, 10 ** 6)}',
+            'expiry_date': expiry.isoformat(),
+            'category': self.rng.choice(CATEGORIES),
+            'quantity': '1'
+        }).status_code
+    
+    def request_delete_food(self):
+        if not self.food_ids:
+            return self.request_add_food()
+        food_id = self.food_ids.pop(self.rng.randrange(len(self.food_ids)))
+        return self.client.post(f'/delete_food/{food_id}').status_code
+    
+    def request_upload(self):
+        data = PNG_BYTES + os.urandom(8)
+        response = self.client.post('/upload', data={'file': (io.BytesIO(data), 'label.png')})
+        job_id = (response.get_json() or {}).get('job_id')
+        if job_id:
+            return self.client.get(f'/upload/status/{job_id}').status_code
+        return response.status_code
+
+
+class Budget:
+    """Shared request counter, optionally bounded by a deadline"""
+    
+    def __init__(self, requests, seconds=None):
+        self.remaining = requests
+        self.deadline = time.perf_counter() + seconds if seconds else None
+        self._lock = threading.Lock()
+    
+    def take(self):
+        if self.deadline and time.perf_counter() >= self.deadline:
+            return False
+        with self._lock:
+            if self.remaining <= 0:
+                return False
+            self.remaining -= 1
+            return True
+
+
+def percentiles(values):
+    """p50/p95/p99/max in milliseconds"""
+    if not values:
+        return {}
+    ms = sorted(value * 1000 for value in values)
+    summary = {f'p{p}': round(ms[min(len(ms) - 1, int(len(ms) * p / 100))], 2) for p in (50, 95, 99)}
+    summary['max'] = round(ms[-1], 2)
+    summary['count'] = len(values)
+    return summary
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description='Load-test the app end to end with the Flask test client (OCR and AI stubbed).')
+    parser.add_argument('--users', type=int, default=20, help='seeded users, one client thread each')
+    parser.add_argument('--items', type=int, default=200, help='seeded food items per user')
+    parser.add_argument('--requests', type=int, default=2000, help='total requests to send')
+    parser.add_argument('--duration', type=float, help='stop after this many seconds')
+    parser.add_argument('--mix', choices=sorted(MIXES), default='mixed', help='request mix')
+    parser.add_argument('--pool-size', type=int, default=8, help='database connections in the pool')
+    parser.add_argument('--seed', type=int, default=0, help='seed for the request sequence')
+    parser.add_argument('--mysql', action='store_true',
+                        help='test app.py against a local MySQL database instead of a temporary SQLite '
+                             'one (MYSQL_HOST/MYSQL_USER/MYSQL_PASSWORD/MYSQL_DATABASE; seeded rows '
+                             'are left in place)')
+    parser.add_argument('--output', default='load_test_results.json', help='where to write the report')
+    args = parser.parse_args(argv)
+    
+    workdir = tempfile.mkdtemp(prefix='load_test_')
+    app_module = load_app(args, workdir)
+    
+    print(f"Seeding {args.users} users x {args.items} items...")
+    prefix = f"load{datetime.now().strftime('%H%M%S')}_"
+    usernames = seed(app_module, args.users, args.items, prefix)
+    
+    rng = random.Random(args.seed)
+    budget = Budget(args.requests, args.duration)
+    pool_before = app_module.db_pool.stats()
+    workers = [Worker(app_module, username, MIXES[args.mix], budget, random.Random(rng.random()))
+               for username in usernames]
+    print(f"Sending {args.requests} requests ({args.mix} mix) from {len(workers)} clients...")
+    start = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    seconds = time.perf_counter() - start
+    pool_after = app_module.db_pool.stats()
+    
+    samples = defaultdict(list)
+    errors = defaultdict(int)
+    messages = []
+    for worker in workers:
+        for route, values in worker.samples.items():
+            samples[route] += values
+        for kind, count in worker.errors.items():
+            errors[kind] += count
+        messages += worker.error_messages
+    errors['pool_timeouts'] = pool_after['timeouts'] - pool_before['timeouts']
+    sent = sum(len(values) for values in samples.values())
+    
+    report = {
+        'run': {
+            'timestamp': datetime.now().isoformat(timespec='seconds'),
+            'host': platform.node(),
+            'python': platform.python_version(),
+            'database': app_module.repository.dialect,
+            'users': args.users,
+            'items_per_user': args.items,
+            'mix': args.mix,
+            'clients': len(workers),
+            'pool_size': args.pool_size
+        },
+        'throughput': {
+            'requests': sent,
+            'seconds': round(seconds, 3),
+            'requests_per_sec': round(sent / seconds, 1) if seconds else 0.0
+        },
+        'latency_ms': {route: percentiles(values) for route, values in sorted(samples.items())},
+        'errors': dict(errors),
+        'error_samples': messages[:10],
+        'db_pool': pool_after
+    }
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+    
+    print(f"{sent} requests in {seconds:.1f}s = {report['throughput']['requests_per_sec']} req/s")
+    for route, summary in report['latency_ms'].items():
+        print(f"  {route:<20} n={summary['count']:<6} p50={summary['p50']}ms p95={summary['p95']}ms "
+              f"p99={summary['p99']}ms")
+    print(f"Errors: {dict(errors)}")
+    print(f"Report written to {args.output}")
+    return 1 if errors.get('lock_wait') or errors.get('exception') else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
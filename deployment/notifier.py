@@ -0,0 +1,296 @@
+import argparse
+import os
+import smtplib
+import sys
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from email.mime.multipart import MIMEMultipart
+from email.mime.text import MIMEText
+
+from change_feed import ChangeFeed
+from dashboard_summary import NEAR_EXPIRY_DAYS, DashboardSummary
+from db_pool import MySQLConnectionPool, SQLiteConnectionPool
+
+# Expired items are looked for this far back, so a worker that was down for a few days catches up
+EXPIRED_LOOKBACK_DAYS = 7
+
+
+class NotificationEngine:
+    """Moves items across the Near Expiry/Expired boundaries and emails each user one digest"""
+    
+    def __init__(self, pool, smtp_config=None, interval=3600):
+        self.pool = pool
+        self.summary = DashboardSummary(pool.dialect)
+        self.changes = ChangeFeed(pool.dialect)
+        # {'smtp_server', 'smtp_port', 'email', 'password'}; without it notifications stay queued
+        self.smtp_config = smtp_config
+        self.interval = interval
+        self.last_run = None
+        self.last_result = None
+        self._stop = threading.Event()
+        self._thread = None
+    
+    def _sql(self, query):
+        return query.replace('?', self.pool.paramstyle)
+    
+    def transition_statuses(self, conn, today):
+        """Update the stored status (and change feed) of rows that crossed a boundary"""
+        cursor = conn.cursor()
+        near_expiry_date = today + timedelta(days=NEAR_EXPIRY_DAYS)
+        # Both ranges are bounded on expiry_date, so only recently crossing rows are read
+        cursor.execute(self._sql('''
+            SELECT id, user_id, status, expiry_date, 'Expired' FROM food_items
+            WHERE expiry_date >= ? AND expiry_date < ? AND status <> 'Expired'
+        '''), ((today - timedelta(days=EXPIRED_LOOKBACK_DAYS)).isoformat(), today.isoformat()))
+        rows = cursor.fetchall()
+        cursor.execute(self._sql('''
+            SELECT id, user_id, status, expiry_date, 'Near Expiry' FROM food_items
+            WHERE expiry_date BETWEEN ? AND ? AND status = 'Fresh'
+        '''), (today.isoformat(), near_expiry_date.isoformat()))
+        rows += cursor.fetchall()
+        
+        if rows:
+            # One new revision per affected user, taken in user order so concurrent writers cannot deadlock
+            revisions = {user_id: self.changes.next_revision(cursor, user_id)
+                         for user_id in sorted({row[1] for row in rows})}
+            cursor.executemany(self._sql('UPDATE food_items SET status = ?, revision = ? WHERE id = ?'),
+                               [(new_status, revisions[user_id], food_id)
+                                for food_id, user_id, _, _, new_status in rows])
+        conn.commit()
+        cursor.close()
+        expired = sum(1 for row in rows if row[4] == 'Expired')
+        return expired, len(rows) - expired
+    
+    def queue_notifications(self, conn, today):
+        """Insert one notification per item and kind; re-running finds nothing new"""
+        cursor = conn.cursor()
+        near_expiry_date = today + timedelta(days=NEAR_EXPIRY_DAYS)
+        cursor.execute(self._sql('''
+            SELECT f.id, f.user_id, f.food_name, f.expiry_date
+            FROM food_items f
+            WHERE f.expiry_date BETWEEN ? AND ?
+            AND NOT EXISTS (
+                SELECT 1 FROM notifications n
+                WHERE n.food_item_id = f.id AND n.kind = 'near_expiry'
+            )
+        '''), (today.isoformat(), near_expiry_date.isoformat()))
+        rows = []
+        for food_id, user_id, food_name, expiry_date in cursor.fetchall():
+            expiry = datetime.strptime(str(expiry_date), '%Y-%m-%d').date()
+            days_left = (expiry - today).days
+            if days_left == 0:
+                message = f"{food_name} expires today ({expiry})"
+            else:
+                message = f"{food_name} will expire in {days_left} days ({expiry})"
+            rows.append((user_id, food_id, 'near_expiry', message))
+        
+        # Items past their date, including ones added already expired or never flagged as near expiry;
+        # bounded by the lookback so old items are not announced when the engine first runs
+        cursor.execute(self._sql('''
+            SELECT f.id, f.user_id, f.food_name, f.expiry_date
+            FROM food_items f
+            WHERE f.expiry_date >= ? AND f.expiry_date < ?
+            AND NOT EXISTS (
+                SELECT 1 FROM notifications n
+                WHERE n.food_item_id = f.id AND n.kind = 'expired'
+            )
+        '''), ((today - timedelta(days=EXPIRED_LOOKBACK_DAYS)).isoformat(), today.isoformat()))
+        for food_id, user_id, food_name, expiry_date in cursor.fetchall():
+            expiry = datetime.strptime(str(expiry_date), '%Y-%m-%d').date()
+            days_ago = (today - expiry).days
+            if days_ago == 1:
+                message = f"{food_name} expired yesterday ({expiry})"
+            else:
+                message = f"{food_name} expired {days_ago} days ago ({expiry})"
+            rows.append((user_id, food_id, 'expired', message))
+        
+        if rows:
+            cursor.executemany(self._sql('''
+                INSERT INTO notifications (user_id, food_item_id, kind, message)
+                VALUES (?, ?, ?, ?)
+            '''), rows)
+        conn.commit()
+        cursor.close()
+        return len(rows)
+    
+    def _pending_by_user(self, conn):
+        """Unsent notifications grouped as {(user_id, email): [(id, kind, message)]}"""
+        cursor = conn.cursor()
+        cursor.execute('''
+            SELECT n.id, n.user_id, u.email, n.kind, n.message
+            FROM notifications n
+            JOIN users u ON u.id = n.user_id
+            WHERE n.is_sent = 0
+            ORDER BY n.user_id, n.id
+        ''')
+        pending = OrderedDict()
+        for notification_id, user_id, email, kind, message in cursor.fetchall():
+            pending.setdefault((user_id, email), []).append((notification_id, kind, message))
+        cursor.close()
+        return pending
+    
+    def _build_digest(self, to_email, notifications):
+        """One email for a user's (kind, message) notifications, expiring items before expired ones"""
+        msg = MIMEMultipart()
+        msg['From'] = self.smtp_config['email']
+        msg['To'] = to_email
+        expiring = [message for kind, message in notifications if kind != 'expired']
+        expired = [message for kind, message in notifications if kind == 'expired']
+        summary = []
+        if expiring:
+            summary.append(f"{len(expiring)} item{'s' if len(expiring) != 1 else ''} expiring soon")
+        if expired:
+            summary.append(f"{len(expired)} item{'s' if len(expired) != 1 else ''} expired")
+        msg['Subject'] = f"Food Expiry Alert: {', '.join(summary)}"
+        
+        lines = ['Hello,', '']
+        if expiring:
+            lines += ['These food items in your tracker are expiring soon:', '']
+            lines += [f'  - {message}' for message in expiring]
+            lines += ['', 'Please consume or use them before they expire to avoid food waste.', '']
+        if expired:
+            lines += ['These food items in your tracker have expired:', '']
+            lines += [f'  - {message}' for message in expired]
+            lines += ['', 'Please check them and remove anything no longer safe to eat.', '']
+        body = '\n'.join(lines + ['Best regards,', 'Food Expiry Tracker'])
+        msg.attach(MIMEText(body, 'plain'))
+        return msg
+    
+    def deliver(self, conn):
+        """Email each user their unsent notifications over one SMTP connection"""
+        if not self.smtp_config:
+            return 0
+        pending = self._pending_by_user(conn)
+        if not pending:
+            return 0
+        
+        sent = 0
+        server = smtplib.SMTP(self.smtp_config['smtp_server'], self.smtp_config['smtp_port'])
+        try:
+            server.starttls()
+            server.login(self.smtp_config['email'], self.smtp_config['password'])
+            cursor = conn.cursor()
+            for (user_id, email), notifications in pending.items():
+                try:
+                    server.send_message(self._build_digest(email, [(k, m) for _, k, m in notifications]))
+                except smtplib.SMTPRecipientsRefused as e:
+                    print(f"Email notification error for user {user_id}: {e}")
+                    continue
+                # Marked per user right after sending, so a crash re-sends at most one digest
+                ids = [notification_id for notification_id, _, _ in notifications]
+                placeholders = ', '.join([self.pool.paramstyle] * len(ids))
+                cursor.execute(self._sql('UPDATE notifications SET is_sent = 1, sent_at = ? ')
+                               + f'WHERE id IN ({placeholders}) AND is_sent = 0',
+                               [datetime.now().strftime('%Y-%m-%d %H:%M:%S')] + ids)
+                conn.commit()
+                sent += len(ids)
+            cursor.close()
+        finally:
+            try:
+                server.quit()
+            except smtplib.SMTPException:
+                pass
+        return sent
+    
+    def run_once(self, today=None):
+        """One full cycle: transitions, new notifications, email delivery"""
+        today = today or datetime.now().date()
+        start = time.perf_counter()
+        conn = self.pool.connection()
+        try:
+            expired, near_expiry = self.transition_statuses(conn, today)
+            queued = self.queue_notifications(conn, today)
+            try:
+                sent = self.deliver(conn)
+            except (smtplib.SMTPException, OSError) as e:
+                # Undelivered notifications stay queued for the next run; the rest of the cycle still runs
+                print(f"Email delivery error: {e}")
+                sent = 0
+            self.changes.prune(conn)
+        finally:
+            conn.close()
+        self.last_run = datetime.now().isoformat(timespec='seconds')
+        self.last_result = {
+            'expired': expired,
+            'near_expiry': near_expiry,
+            'queued': queued,
+            'sent': sent,
+            'seconds': round(time.perf_counter() - start, 3)
+        }
+        return self.last_result
+    
+    def _loop(self):
+        while not self._stop.is_set():
+            try:
+                self.run_once()
+            except Exception as e:
+                print(f"Notification run error: {e}")
+            self._stop.wait(self.interval)
+    
+    def start(self):
+        """Run in a daemon thread every interval seconds"""
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._loop, name='notification-engine', daemon=True)
+            self._thread.start()
+    
+    def stop(self):
+        self._stop.set()
+    
+    def stats(self):
+        return {
+            'running': self._thread is not None and self._thread.is_alive(),
+            'interval': self.interval,
+            'last_run': self.last_run,
+            'last_result': self.last_result
+        }
+
+
+def smtp_config_from_env():
+    """SMTP settings from SMTP_EMAIL/SMTP_PASSWORD (plus optional SMTP_SERVER/SMTP_PORT)"""
+    if not os.getenv('SMTP_EMAIL') or not os.getenv('SMTP_PASSWORD'):
+        return None
+    return {
+        'smtp_server': os.getenv('SMTP_SERVER', 'smtp.gmail.com'),
+        'smtp_port': int(os.getenv('SMTP_PORT', 587)),
+        'email': os.getenv('SMTP_EMAIL'),
+        'password': os.getenv('SMTP_PASSWORD')
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Expiry status and email notification worker.')
+    parser.add_argument('--mysql', action='store_true',
+                        help='use MySQL (MYSQL_HOST/MYSQL_USER/MYSQL_PASSWORD/MYSQL_DATABASE)')
+    parser.add_argument('--database', default='food_tracker.db', help='SQLite database file')
+    parser.add_argument('--interval', type=int, default=3600, help='seconds between runs')
+    parser.add_argument('--once', action='store_true', help='run one cycle and exit')
+    args = parser.parse_args(argv)
+    
+    if args.mysql:
+        pool = MySQLConnectionPool({
+            'host': os.getenv('MYSQL_HOST', 'localhost'),
+            'user': os.getenv('MYSQL_USER', 'root'),
+            'password': os.getenv('MYSQL_PASSWORD', ''),
+            'database': os.getenv('MYSQL_DATABASE', 'food_expiry_tracker')
+        }, size=1)
+    else:
+        pool = SQLiteConnectionPool(args.database, size=1)
+    
+    engine = NotificationEngine(pool, smtp_config_from_env(), args.interval)
+    if engine.smtp_config is None:
+        print("SMTP_EMAIL/SMTP_PASSWORD not set, notifications are queued but not emailed")
+    
+    while True:
+        result = engine.run_once()
+        print(f"[{engine.last_run}] expired={result['expired']} near_expiry={result['near_expiry']} "
+              f"queued={result['queued']} sent={result['sent']} ({result['seconds']}s)")
+        if args.once:
+            return 0
+        time.sleep(args.interval)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,155 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+# Leading bytes of the image formats uploads are accepted in, for files whose name gives no extension
+IMAGE_SIGNATURES = (
+    (b'\x89PNG\r\n\x1a\n', 'png'),
+    (b'\xff\xd8\xff', 'jpg'),
+    (b'GIF87a', 'gif'),
+    (b'GIF89a', 'gif'),
+    (b'BM', 'bmp'),
+)
+
+# Part of every cache key, bumped when what is stored changes so older rows are never read
+# (2: candidates are stored unranked and ranked against the current date when served)
+RESULT_FORMAT = 2
+
+
+def hash_bytes(data):
+    """Content hash used to identify an uploaded image"""
+    return hashlib.sha256(data).hexdigest()
+
+
+def detect_image_extension(data):
+    """Extension matching the image's content ('png'), or None if the format is not recognised"""
+    for signature, extension in IMAGE_SIGNATURES:
+        if data.startswith(signature):
+            return extension
+    return None
+
+
+class OCRResultCache:
+    """Persistent LRU cache of OCR results keyed on image bytes + extractor config"""
+
+    def __init__(self, path='ocr_cache.db', max_entries=1000):
+        self.path = path
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        # Shared by request threads and the OCR queue's completion callbacks
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._init_db()
+
+    def _init_db(self):
+        with self._lock:
+            self._conn.executescript('''
+                CREATE TABLE IF NOT EXISTS ocr_results (
+                    cache_key TEXT PRIMARY KEY,
+                    expiry_date TEXT,
+                    extracted_text TEXT,
+                    food_name TEXT,
+                    candidates TEXT,
+                    created_at REAL NOT NULL,
+                    last_used REAL NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS idx_ocr_results_last_used ON ocr_results(last_used);
+
+                CREATE TABLE IF NOT EXISTS uploads (
+                    image_hash TEXT PRIMARY KEY,
+                    filename TEXT NOT NULL
+                );
+            ''')
+            # Caches created before ranked candidates were stored
+            columns = [row['name'] for row in self._conn.execute('PRAGMA table_info(ocr_results)')]
+            if 'candidates' not in columns:
+                self._conn.execute('ALTER TABLE ocr_results ADD COLUMN candidates TEXT')
+            self._conn.commit()
+
+    @staticmethod
+    def make_key(image_hash, config_signature):
+        """Cache key for an image under a given extractor configuration"""
+        return hash_bytes(f"{image_hash}:{config_signature}:{RESULT_FORMAT}".encode('utf-8'))
+
+    def get(self, cache_key):
+        """Return the cached result dict, or None on a miss"""
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT expiry_date, extracted_text, food_name, candidates FROM ocr_results '
+                'WHERE cache_key = ?',
+                (cache_key,)
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+
+            self.hits += 1
+            self._conn.execute('UPDATE ocr_results SET last_used = ? WHERE cache_key = ?',
+                               (time.time(), cache_key))
+            self._conn.commit()
+            result = dict(row)
+            result['candidates'] = json.loads(result['candidates'] or '[]')
+            return result
+
+    def put(self, cache_key, expiry_date, extracted_text, food_name, candidates=None):
+        """Store a result, evicting least recently used entries past max_entries.
+        candidates are unranked (ExpiryDateExtractor.collect_candidates), the caller ranks them"""
+        now = time.time()
+        with self._lock:
+            self._conn.execute('''
+                INSERT OR REPLACE INTO ocr_results
+                (cache_key, expiry_date, extracted_text, food_name, candidates, created_at, last_used)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+            ''', (cache_key, expiry_date, extracted_text, food_name, json.dumps(candidates or []),
+                  now, now))
+
+            cursor = self._conn.execute('''
+                DELETE FROM ocr_results WHERE cache_key IN (
+                    SELECT cache_key FROM ocr_results
+                    ORDER BY last_used ASC
+                    LIMIT max(0, (SELECT COUNT(*) FROM ocr_results) - ?)
+                )
+            ''', (self.max_entries,))
+            self.evictions += cursor.rowcount
+            self._conn.commit()
+
+    def store_upload(self, image_hash, data, extension, upload_folder):
+        """Write an upload to disk once per distinct content, returns the stored filename.
+        Named from the hash and extension only, so later uploaders never see the first one's filename;
+        without an extension one is detected from the content"""
+        with self._lock:
+            row = self._conn.execute('SELECT filename FROM uploads WHERE image_hash = ?',
+                                     (image_hash,)).fetchone()
+            # Older rows named the file after its first upload, or stored it without an extension
+            if row and row['filename'].startswith(image_hash + '.') and \
+                    os.path.exists(os.path.join(upload_folder, row['filename'])):
+                return row['filename']
+
+            extension = extension or detect_image_extension(data)
+            stored_name = f"{image_hash}.{extension}" if extension else image_hash
+            with open(os.path.join(upload_folder, stored_name), 'wb') as f:
+                f.write(data)
+
+            self._conn.execute('INSERT OR REPLACE INTO uploads (image_hash, filename) VALUES (?, ?)',
+                               (image_hash, stored_name))
+            self._conn.commit()
+            return stored_name
+
+    def stats(self):
+        with self._lock:
+            entries = self._conn.execute('SELECT COUNT(*) FROM ocr_results').fetchone()[0]
+        lookups = self.hits + self.misses
+        return {
+            'entries': entries,
+            'max_entries': self.max_entries,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'hit_rate': round(self.hits / lookups, 3) if lookups else 0.0
+        }
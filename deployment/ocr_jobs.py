@@ -0,0 +1,276 @@
+import multiprocessing
+import os
+import threading
+import time
+import uuid
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from ocr_cache import hash_bytes
+from ocr_model import ExpiryDateExtractor, NO_TEXT_MESSAGE, rank_collected_candidates
+
+# Number of ranked date candidates returned to the browser
+MAX_CANDIDATES = 5
+
+# One extractor per worker process, created by the pool initializer
+_worker_extractor = None
+
+
+def _init_worker(extractor_options):
+    """Create the OCR extractor once per worker process"""
+    global _worker_extractor
+    _worker_extractor = ExpiryDateExtractor(**extractor_options)
+
+
+def build_ocr_response(expiry_date, extracted_text, food_name, filename, candidates=None):
+    """Build the JSON payload returned to the browser for an OCR result"""
+    if expiry_date:
+        response = {
+            'success': True,
+            'expiry_date': expiry_date,
+            'food_name': food_name,
+            'image_path': filename,
+            'message': 'Expiry date extracted successfully'
+        }
+    else:
+        response = {
+            'success': False,
+            'food_name': food_name,
+            'image_path': filename,
+            'message': 'Could not extract expiry date. Please enter manually.',
+            'extracted_text': extracted_text
+        }
+    # Ranked alternatives, best first, so the user can pick another date in one click
+    response['candidates'] = candidates or []
+    return response
+
+
+def run_ocr(filepath):
+    """Run OCR on a saved upload (executed inside a worker process)"""
+    extractor = _worker_extractor or ExpiryDateExtractor()
+    try:
+        expiry_date, extracted_text = extractor.extract_expiry_date(filepath)
+        food_name = extractor.extract_food_name(extracted_text)
+    except Exception as e:
+        return {'error': f'OCR processing error: {str(e)}'}
+    return {
+        'expiry_date': expiry_date,
+        'extracted_text': extracted_text,
+        'food_name': food_name,
+        'candidates': extractor.last_candidates[:MAX_CANDIDATES],
+        # Cached instead of the ranking, whose plausibility part depends on the day it is served
+        'collected_candidates': extractor.last_collected,
+        # Per-stage/pass seconds, so we can see what the second PSM pass costs
+        'timings': dict(extractor.last_timings)
+    }
+
+
+def read_zip_images(stream, allowed_extensions, max_files, max_file_size):
+    """Return [(basename, bytes)] for the image members of a zip archive.
+    Raises ValueError if it holds more than max_files images"""
+    images = []
+    with zipfile.ZipFile(stream) as archive:
+        for member in archive.infolist():
+            name = os.path.basename(member.filename)
+            if member.is_dir() or not name or member.filename.startswith('__MACOSX/'):
+                continue
+            if '.' not in name or name.rsplit('.', 1)[1].lower() not in allowed_extensions:
+                continue
+            if member.file_size > max_file_size:
+                continue
+            if len(images) >= max_files:
+                raise ValueError(f"More than {max_files} images in the archive")
+            images.append((name, archive.read(member)))
+    return images
+
+
+def queue_upload(queue, cache, data, extension, upload_folder, owner=None):
+    """Store an uploaded image (extension from its original filename, e.g. 'jpg') and answer from the
+    cache or queue it, returns (payload, HTTP status)"""
+    # Identical images are stored once and their OCR result is reused
+    image_hash = hash_bytes(data)
+    filename = cache.store_upload(image_hash, data, extension, upload_folder)
+    filepath = os.path.join(upload_folder, filename)
+    
+    cache_key = cache.make_key(image_hash, queue.config_signature)
+    cached = cache.get(cache_key)
+    if cached:
+        candidates = rank_collected_candidates(cached['candidates'])
+        expiry_date = candidates[0]['date'] if candidates else None
+        result = build_ocr_response(expiry_date, cached['extracted_text'], cached['food_name'], filename,
+                                    candidates[:MAX_CANDIDATES])
+        result['cached'] = True
+        return result, 200
+    
+    job_id = queue.submit(filepath, filename, owner=owner, cache_key=cache_key)
+    if job_id is None:
+        return {
+            'success': False,
+            'message': 'OCR queue is busy. Please try again in a moment.',
+            'image_path': filename
+        }, 503
+    
+    return {
+        'success': True,
+        'status': 'queued',
+        'job_id': job_id,
+        'image_path': filename,
+        'message': 'Image queued for OCR processing'
+    }, 202
+
+
+class OCRJobQueue:
+    """Bounded process pool that runs OCR jobs off the request thread"""
+
+    def __init__(self, max_workers=None, max_pending=32, result_ttl=600, extractor_options=None,
+                 cache=None):
+        self.max_workers = max_workers or min(4, os.cpu_count() or 1)
+        self.max_pending = max_pending
+        self.result_ttl = result_ttl
+        # Keyword arguments for ExpiryDateExtractor in each worker
+        self.extractor_options = extractor_options or {}
+        self.config_signature = ExpiryDateExtractor(**self.extractor_options).config_signature()
+        # Optional OCRResultCache filled in as jobs finish
+        self.cache = cache
+        self._executor = None
+        self._jobs = {}
+        # cache_key -> future of the job currently processing that image
+        self._inflight = {}
+        self._lock = threading.Lock()
+        self.completed = 0
+        self.rejected = 0
+
+    def _get_executor(self):
+        # Created lazily so importing the app (or the debug reloader) does not spawn workers
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.max_workers,
+                mp_context=multiprocessing.get_context('spawn'),
+                initializer=_init_worker,
+                initargs=(self.extractor_options,)
+            )
+        return self._executor
+
+    def _prune(self):
+        """Forget finished jobs whose results were not collected in time"""
+        now = time.time()
+        expired = [job_id for job_id, job in self._jobs.items()
+                   if job['finished_at'] and now - job['finished_at'] > self.result_ttl]
+        for job_id in expired:
+            del self._jobs[job_id]
+
+    def pending_count(self):
+        return sum(1 for job in self._jobs.values() if not job['future'].done())
+
+    def free_slots(self):
+        """Jobs that can be submitted before the queue starts rejecting them"""
+        with self._lock:
+            return max(0, self.max_pending - self.pending_count())
+
+    def submit(self, filepath, filename, owner=None, cache_key=None):
+        """Queue an image for OCR, returns the job id or None if the queue is full"""
+        with self._lock:
+            self._prune()
+            if self.pending_count() >= self.max_pending:
+                self.rejected += 1
+                return None
+
+            job_id = uuid.uuid4().hex
+            shared = self._inflight.get(cache_key) if cache_key else None
+            if shared is not None and not shared.done():
+                # The same image is already being processed (e.g. twice in one batch)
+                future = shared
+            else:
+                shared = None
+                try:
+                    future = self._get_executor().submit(run_ocr, filepath)
+                except BrokenProcessPool:
+                    # A worker died (e.g. OpenCV crashed on a bad image); start a fresh pool
+                    self._executor = None
+                    future = self._get_executor().submit(run_ocr, filepath)
+                if cache_key:
+                    self._inflight[cache_key] = future
+            job = {
+                'future': future,
+                'filename': filename,
+                'owner': owner,
+                'submitted_at': time.time(),
+                'finished_at': None
+            }
+            self._jobs[job_id] = job
+
+        def _on_done(_future):
+            with self._lock:
+                job['finished_at'] = time.time()
+                self.completed += 1
+                if cache_key and self._inflight.get(cache_key) is _future:
+                    del self._inflight[cache_key]
+            if shared is None and self.cache is not None and cache_key:
+                self._store_result(cache_key, _future)
+
+        future.add_done_callback(_on_done)
+        return job_id
+
+    def _store_result(self, cache_key, future):
+        """Cache a finished job's result unless OCR failed outright"""
+        try:
+            result = future.result()
+        except Exception:
+            return
+        if 'error' in result or result['extracted_text'] == NO_TEXT_MESSAGE:
+            return
+        try:
+            self.cache.put(cache_key, result['expiry_date'], result['extracted_text'],
+                           result['food_name'], result['collected_candidates'])
+        except Exception as e:
+            print(f"OCR cache error: {e}")
+
+    def status(self, job_id, owner=None):
+        """Return the job's JSON payload, or None if the job is unknown"""
+        with self._lock:
+            self._prune()
+            job = self._jobs.get(job_id)
+
+        if job is None or (owner is not None and job['owner'] != owner):
+            return None
+
+        future = job['future']
+        if not future.done():
+            return {
+                'success': False,
+                'status': 'pending',
+                'job_id': job_id,
+                'image_path': job['filename'],
+                'message': 'Processing image with OCR...'
+            }
+
+        try:
+            raw = future.result()
+        except Exception as e:
+            raw = {'error': f'OCR processing error: {str(e)}'}
+
+        if 'error' in raw:
+            result = {'success': False, 'message': raw['error'], 'image_path': job['filename']}
+        else:
+            result = build_ocr_response(raw['expiry_date'], raw['extracted_text'],
+                                        raw['food_name'], job['filename'], raw['candidates'])
+            result['timings'] = raw['timings']
+        result['status'] = 'done'
+        result['job_id'] = job_id
+        return result
+
+    def stats(self):
+        with self._lock:
+            return {
+                'workers': self.max_workers,
+                'pending': self.pending_count(),
+                'tracked': len(self._jobs),
+                'completed': self.completed,
+                'rejected': self.rejected
+            }
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
@@ -1,28 +1,329 @@
+import argparse
 import cv2
+import hashlib
+import os
 import pytesseract
 import re
-from datetime import datetime
+import sys
+import tempfile
+import threading
+import time
+import zipfile
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from datetime import date
 import numpy as np
 
-# Configure Tesseract path (update this based on your installation)
-pytesseract.pytesseract.tesseract_cmd = r'C:\Program Files\Tesseract-OCR\tesseract.exe'
+# Returned in place of OCR text when Tesseract produced nothing
+NO_TEXT_MESSAGE = "Could not extract text from image"
+
+try:
+    import tesserocr
+except ImportError:
+    tesserocr = None
+
+# Tesseract binary for the pytesseract backend: TESSERACT_CMD, else the standard Windows
+# install location if present, else whatever `tesseract` is on PATH
+WINDOWS_TESSERACT_CMD = r'C:\Program Files\Tesseract-OCR\tesseract.exe'
+TESSERACT_CMD = os.getenv('TESSERACT_CMD') or (
+    WINDOWS_TESSERACT_CMD if os.path.exists(WINDOWS_TESSERACT_CMD) else None
+)
+if TESSERACT_CMD:
+    pytesseract.pytesseract.tesseract_cmd = TESSERACT_CMD
+
+CONFIG_OPTION_PATTERN = re.compile(r'--(oem|psm)\s+(\d+)')
+
+
+class PytesseractBackend:
+    """Runs the tesseract binary for every call (writes a temp image, reloads eng.traineddata)"""
+    
+    name = 'pytesseract'
+    
+    def __init__(self, lang='eng'):
+        self.lang = lang
+    
+    def image_to_data(self, image, config):
+        return pytesseract.image_to_data(image, lang=self.lang, config=config,
+                                         output_type=pytesseract.Output.DICT)
+
+
+class TesserocrBackend:
+    """Long-lived in-process Tesseract engine: language data loaded once per thread, no temp files"""
+    
+    name = 'tesserocr'
+    
+    def __init__(self, lang='eng', tessdata_path=None):
+        if tesserocr is None:
+            raise RuntimeError("tesserocr is not installed")
+        self.lang = lang
+        self.tessdata_path = tessdata_path or os.getenv('TESSDATA_PREFIX')
+        # TessBaseAPI is not thread-safe, so each thread (e.g. parallel passes) gets its own
+        self._local = threading.local()
+    
+    def _api(self):
+        api = getattr(self._local, 'api', None)
+        if api is None:
+            kwargs = {'lang': self.lang}
+            if self.tessdata_path:
+                kwargs['path'] = self.tessdata_path
+            api = tesserocr.PyTessBaseAPI(**kwargs)
+            self._local.api = api
+        return api
+    
+    def image_to_data(self, image, config):
+        """Same dict layout as pytesseract.image_to_data (text/conf/block/par/line)"""
+        options = dict(CONFIG_OPTION_PATTERN.findall(config))
+        api = self._api()
+        api.SetPageSegMode(int(options.get('psm', tesserocr.PSM.AUTO)))
+        
+        image = np.ascontiguousarray(image)
+        height, width = image.shape[:2]
+        channels = 1 if image.ndim == 2 else image.shape[2]
+        api.SetImageBytes(image.tobytes(), width, height, channels, width * channels)
+        api.Recognize()
+        
+        data = {'text': [], 'conf': [], 'block_num': [], 'par_num': [], 'line_num': []}
+        iterator = api.GetIterator()
+        if iterator is None:
+            return data
+        
+        level = tesserocr.RIL.WORD
+        block = paragraph = line = 0
+        for word in tesserocr.iterate_level(iterator, level):
+            if word.IsAtBeginningOf(tesserocr.RIL.BLOCK):
+                block += 1
+                paragraph = line = 0
+            if word.IsAtBeginningOf(tesserocr.RIL.PARA):
+                paragraph += 1
+                line = 0
+            if word.IsAtBeginningOf(tesserocr.RIL.TEXTLINE):
+                line += 1
+            data['text'].append(word.GetUTF8Text(level) or '')
+            data['conf'].append(word.Confidence(level))
+            data['block_num'].append(block)
+            data['par_num'].append(paragraph)
+            data['line_num'].append(line)
+        return data
+
+
+OCR_BACKENDS = {
+    PytesseractBackend.name: PytesseractBackend,
+    TesserocrBackend.name: TesserocrBackend,
+}
+
+
+def get_ocr_backend(name=None):
+    """Create the named backend (default: OCR_BACKEND env var), falling back to pytesseract"""
+    name = name or os.getenv('OCR_BACKEND', PytesseractBackend.name)
+    backend_class = OCR_BACKENDS.get(name)
+    if backend_class is None:
+        raise ValueError(f"Unknown OCR backend: {name}")
+    try:
+        return backend_class()
+    except RuntimeError as e:
+        print(f"OCR backend '{name}' unavailable ({e}), using pytesseract")
+        return PytesseractBackend()
+
+# A date found in OCR text: ISO date string, character span, keyword before it (or None)
+DateCandidate = namedtuple('DateCandidate', ['date', 'start', 'end', 'prefix', 'text'])
+
+# Output of one Tesseract pass; words holds (start, end, confidence) spans into text
+PassResult = namedtuple('PassResult', ['name', 'text', 'seconds', 'words'])
+
+# Keywords that mark a date as the expiry date, or as some other date on the label
+EXPIRY_KEYWORDS = {'EXP', 'EXPIRY', 'BEST BEFORE', 'USE BY', 'BB'}
+OTHER_DATE_KEYWORDS = {'MFG', 'MFD', 'PKD', 'PACKED'}
+# Whole words only, so "export", "express" or "unpacked" on a label do not count; "EXP12/27" still does
+NEARBY_EXPIRY_PATTERN = re.compile(r'\bexp(?:iry|ires?|ired|iration|\.|\b|(?=\d))|\bbest\s*before|\buse\s*by|\bbb\b',
+                                   re.IGNORECASE)
+NEARBY_OTHER_PATTERN = re.compile(r'\b(?:mfg|mfd|pkd|packed|manufactured|made\s+on)(?:\b|(?=\d))', re.IGNORECASE)
+
+
+class DateRecognizer:
+    """Single-pass date finder: one compiled regex and direct integer date construction"""
+    
+    MONTHS = {
+        'jan': 1, 'feb': 2, 'mar': 3, 'apr': 4, 'may': 5, 'jun': 6,
+        'jul': 7, 'aug': 8, 'sep': 9, 'oct': 10, 'nov': 11, 'dec': 12
+    }
+    DAYS_IN_MONTH = (31, 28, 31, 30, 31, 30, 31, 31, 30, 31, 30, 31)
+    
+    PATTERN = re.compile(r'''
+        \b
+        (?:(?P<prefix>exp(?:iry)?|best\s+before|use\s+by|bb|mfg|mfd|pkd|packed)[:.\s]*)?
+        (?:
+            (?P<n1>\d{1,4})[/.-](?P<n2>\d{1,2})[/.-](?P<n3>\d{1,4})                   # DD/MM/YYYY, YYYY-MM-DD, DD.MM.YY
+          | (?P<mon1>jan|feb|mar|apr|may|jun|jul|aug|sep|oct|nov|dec)[a-z]*\.?\s+
+            (?P<d1>\d{1,2})[,\s]+(?P<y1>\d{2}|\d{4})                                   # Month DD, YYYY
+          | (?P<d2>\d{1,2})\s+
+            (?P<mon2>jan|feb|mar|apr|may|jun|jul|aug|sep|oct|nov|dec)[a-z]*\.?\s+
+            (?P<y2>\d{2}|\d{4})                                                        # DD Month YYYY
+        )
+        \b
+    ''', re.IGNORECASE | re.VERBOSE)
+    
+    def _make_date(self, year, month, day):
+        """Build YYYY-MM-DD from integers, or None if the date does not exist"""
+        if year < 100:
+            year += 2000
+        if not 1 <= month <= 12 or day < 1:
+            return None
+        days = self.DAYS_IN_MONTH[month - 1]
+        if month == 2 and year % 4 == 0 and (year % 100 != 0 or year % 400 == 0):
+            days = 29
+        if day > days:
+            return None
+        return f"{year:04d}-{month:02d}-{day:02d}"
+    
+    def _numeric_date(self, n1, n2, n3):
+        """Interpret three numbers as day-first, falling back to year-first"""
+        if len(n1) == 4:
+            return self._make_date(int(n1), int(n2), int(n3)) if len(n3) <= 2 else None
+        if len(n1) > 2 or len(n3) == 3:
+            return None
+        if len(n3) in (2, 4):
+            parsed = self._make_date(int(n3), int(n2), int(n1))
+            if parsed:
+                return parsed
+        # YY/MM/DD
+        if len(n1) == 2 and len(n3) <= 2:
+            return self._make_date(int(n1), int(n2), int(n3))
+        return None
+    
+    def find(self, text):
+        """Return a DateCandidate for every valid date in text, in reading order"""
+        candidates = []
+        for match in self.PATTERN.finditer(text):
+            groups = match.groupdict()
+            if groups['n1']:
+                parsed = self._numeric_date(groups['n1'], groups['n2'], groups['n3'])
+            elif groups['mon1']:
+                parsed = self._make_date(int(groups['y1']), self.MONTHS[groups['mon1'].lower()],
+                                         int(groups['d1']))
+            else:
+                parsed = self._make_date(int(groups['y2']), self.MONTHS[groups['mon2'].lower()],
+                                         int(groups['d2']))
+            if parsed:
+                prefix = groups['prefix']
+                if prefix:
+                    prefix = ' '.join(prefix.upper().split())
+                candidates.append(DateCandidate(parsed, match.start(), match.end(), prefix,
+                                                match.group(0)))
+        return candidates
+
+
+def plausibility_score(iso_date, today):
+    """Expiry dates are usually a little in the past up to a few years ahead"""
+    days = (date.fromisoformat(iso_date) - today).days
+    if days < -365 or days > 5 * 365:
+        return -1.0
+    if days < -30:
+        return -0.5
+    if days <= 3 * 365:
+        return 0.5
+    return 0.0
+
+
+def rank_collected_candidates(candidates, today=None):
+    """Add today's plausibility to candidates from collect_candidates(), best first.
+    Kept separate so a cached result can be ranked again on a later day"""
+    today = today or date.today()
+    ranked = [dict(entry, score=round(entry['score'] + plausibility_score(entry['date'], today), 3))
+              for entry in candidates]
+    return sorted(ranked, key=lambda entry: entry['score'], reverse=True)
+
 
 class ExpiryDateExtractor:
-    def __init__(self):
-        self.date_patterns = [
-            r'\b(\d{1,2})[/-](\d{1,2})[/-](\d{2,4})\b',  # DD/MM/YYYY or DD-MM-YYYY
-            r'\b(\d{2,4})[/-](\d{1,2})[/-](\d{1,2})\b',  # YYYY/MM/DD or YYYY-MM-DD
-            r'\b(Jan|Feb|Mar|Apr|May|Jun|Jul|Aug|Sep|Oct|Nov|Dec)[a-z]*\s+(\d{1,2})[,\s]+(\d{2,4})\b',  # Month DD, YYYY
-            r'\b(\d{1,2})\s+(Jan|Feb|Mar|Apr|May|Jun|Jul|Aug|Sep|Oct|Nov|Dec)[a-z]*\s+(\d{2,4})\b',  # DD Month YYYY
-            r'\b(EXP|Exp|exp|EXPIRY|Expiry)[:\s]+(\d{1,2})[/-](\d{1,2})[/-](\d{2,4})\b',  # EXP: DD/MM/YYYY
-            r'\b(BEST BEFORE|Best Before|USE BY|Use By)[:\s]+(\d{1,2})[/-](\d{1,2})[/-](\d{2,4})\b',  # Best Before: DD/MM/YYYY
-            r'\b(\d{1,2})\.(\d{1,2})\.(\d{2,4})\b',  # DD.MM.YYYY
+    def __init__(self, parallel_passes=False, short_circuit=False, max_height=1600,
+                 denoise_threshold=5.0, preprocess_stages=None, detect_regions=False,
+                 max_regions=8, ocr_backend=None):
+        # Preprocessing stages, run in order; each is a _stage_<name> method and is timed
+        self.preprocess_stages = preprocess_stages or ['grayscale', 'downscale', 'threshold',
+                                                       'denoise', 'contrast']
+        # Taller images are downscaled to this height before any other work
+        self.max_height = max_height
+        # Estimated noise sigma below which fastNlMeansDenoising is skipped
+        self.denoise_threshold = denoise_threshold
+        
+        # Engine that runs the passes: a backend instance or name ('pytesseract', 'tesserocr')
+        if ocr_backend is None or isinstance(ocr_backend, str):
+            ocr_backend = get_ocr_backend(ocr_backend)
+        self.ocr_backend = ocr_backend
+        
+        # Tesseract page segmentation passes, run in this order
+        self.psm_passes = [
+            ('psm6', r'--oem 3 --psm 6'),    # uniform block of text
+            ('psm11', r'--oem 3 --psm 11'),  # sparse text
         ]
+        # Run the passes concurrently (each pass is its own tesseract process or engine)
+        self.parallel_passes = parallel_passes
+        self._pass_executor = None
+        # Skip the remaining passes once a pass yields a parseable date
+        self.short_circuit = short_circuit
+        # OCR only small text-line crops first; fall back to the full passes if no date is found
+        self.detect_regions = detect_regions
+        self.max_regions = max_regions
+        self.region_config = r'--oem 3 --psm 6'
         
-        self.month_map = {
-            'jan': 1, 'feb': 2, 'mar': 3, 'apr': 4, 'may': 5, 'jun': 6,
-            'jul': 7, 'aug': 8, 'sep': 9, 'oct': 10, 'nov': 11, 'dec': 12
+        # Timings (seconds) of the last extraction, keyed by stage/pass name
+        self.last_timings = {}
+        # Decisions made while preprocessing the last image (scale, noise, skipped stages)
+        self.last_preprocess_info = {}
+        # Ranked date candidates from the last extract_expiry_date call, and the same before ranking
+        self.last_candidates = []
+        self.last_collected = []
+        # Running counters: how often later passes were needed and what they cost
+        self.pass_stats = {
+            'images': 0,
+            'passes_run': {name: 0 for name, _ in self.psm_passes},
+            'passes_skipped': {name: 0 for name, _ in self.psm_passes},
+            'pass_seconds': {name: 0.0 for name, _ in self.psm_passes}
         }
+        
+        # Compiled once; finds every date in OCR text in a single scan
+        self.date_recognizer = DateRecognizer()
+    
+    def estimate_noise(self, gray):
+        """Fast estimate of the Gaussian noise sigma of a grayscale image (Immerkaer)"""
+        height, width = gray.shape
+        if height < 3 or width < 3:
+            return 0.0
+        kernel = np.array([[1, -2, 1], [-2, 4, -2], [1, -2, 1]], dtype=np.float32)
+        response = cv2.filter2D(gray.astype(np.float32), -1, kernel)
+        total = np.sum(np.abs(response[1:-1, 1:-1]))
+        return float(total * np.sqrt(0.5 * np.pi) / (6.0 * (width - 2) * (height - 2)))
+    
+    def _stage_grayscale(self, image, info):
+        if image.ndim == 2:
+            return None
+        return cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+    
+    def _stage_downscale(self, image, info):
+        height = image.shape[0]
+        if not self.max_height or height <= self.max_height:
+            return None
+        scale = self.max_height / height
+        info['scale'] = round(scale, 4)
+        return cv2.resize(image, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+    
+    def _stage_threshold(self, image, info):
+        # Decide on denoising from the grayscale image, before it is binarised
+        info['noise_sigma'] = round(self.estimate_noise(image), 3)
+        _, thresh = cv2.threshold(image, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+        info['binary'] = True
+        return thresh
+    
+    def _stage_denoise(self, image, info):
+        if info.get('noise_sigma', self.denoise_threshold) < self.denoise_threshold:
+            return None
+        info['binary'] = False
+        return cv2.fastNlMeansDenoising(image, None, 10, 7, 21)
+    
+    def _stage_contrast(self, image, info):
+        # Scaling a pure black/white image by 1.5 changes nothing
+        if info.get('binary'):
+            return None
+        return cv2.convertScaleAbs(image, alpha=1.5, beta=0)
     
     def preprocess_image(self, image_path):
         """Preprocess image for better OCR accuracy"""
@@ -32,114 +333,307 @@ class ExpiryDateExtractor:
         if img is None:
             raise ValueError("Unable to read image")
         
-        # Convert to grayscale
-        gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+        info = {'height': img.shape[0], 'width': img.shape[1], 'skipped': []}
+        processed = img
+        for name in self.preprocess_stages:
+            start = time.perf_counter()
+            result = getattr(self, f'_stage_{name}')(processed, info)
+            self.last_timings[f'preprocess.{name}'] = time.perf_counter() - start
+            if result is None:
+                info['skipped'].append(name)
+            else:
+                processed = result
+        
+        self.last_preprocess_info = info
+        return img, processed
+    
+    def config_signature(self):
+        """Stable hash of every setting that changes extraction results"""
+        settings = repr((self.ocr_backend.name, self.psm_passes, DateRecognizer.PATTERN.pattern,
+                         self.short_circuit,
+                         self.preprocess_stages, self.max_height, self.denoise_threshold,
+                         self.detect_regions, self.max_regions, self.region_config,
+                         sorted(EXPIRY_KEYWORDS), sorted(OTHER_DATE_KEYWORDS),
+                         NEARBY_EXPIRY_PATTERN.pattern, NEARBY_OTHER_PATTERN.pattern))
+        return hashlib.sha256(settings.encode('utf-8')).hexdigest()
+    
+    def run_pass(self, name, processed, config):
+        """Run a single Tesseract pass, returns a PassResult with word confidences"""
+        start = time.perf_counter()
+        data = self.ocr_backend.image_to_data(processed, config)
+        text, words = self._data_to_text(data)
+        return PassResult(name, text, time.perf_counter() - start, words)
+    
+    def _data_to_text(self, data):
+        """Rebuild line-structured text from image_to_data output, keeping word confidences"""
+        lines = []
+        words = []
+        offset = 0
+        current_line = None
+        line_words = []
+        for i, word in enumerate(data['text']):
+            word = word.strip()
+            if not word:
+                continue
+            line_key = (data['block_num'][i], data['par_num'][i], data['line_num'][i])
+            if line_key != current_line:
+                if line_words:
+                    lines.append(' '.join(line_words))
+                    offset += len(lines[-1]) + 1
+                current_line = line_key
+                line_words = []
+            start = offset + sum(len(w) + 1 for w in line_words)
+            words.append((start, start + len(word), float(data['conf'][i])))
+            line_words.append(word)
+        if line_words:
+            lines.append(' '.join(line_words))
+        return '\n'.join(lines), words
+    
+    def _run_passes_sequential(self, processed):
+        """Run the PSM passes one after the other"""
+        results = []
+        for name, config in self.psm_passes:
+            result = self.run_pass(name, processed, config)
+            results.append(result)
+            if self.short_circuit and self.find_dates(result.text):
+                break
+        return results
+    
+    def _run_passes_parallel(self, processed):
+        """Run the PSM passes concurrently, collecting results in pass order"""
+        # Kept for the extractor's lifetime so per-thread OCR engines are reused
+        if self._pass_executor is None:
+            self._pass_executor = ThreadPoolExecutor(max_workers=len(self.psm_passes))
+        futures = [self._pass_executor.submit(self.run_pass, name, processed, config)
+                   for name, config in self.psm_passes]
+        results = []
+        try:
+            for future in futures:
+                result = future.result()
+                results.append(result)
+                if self.short_circuit and self.find_dates(result.text):
+                    break
+            return results
+        finally:
+            # Passes that are no longer needed are cancelled or left to finish unobserved
+            for future in futures[len(results):]:
+                future.cancel()
+    
+    def find_text_regions(self, processed):
+        """Locate text-line boxes (x, y, w, h) in a preprocessed image"""
+        height, width = processed.shape[:2]
+        
+        # Character edges, whatever the text polarity
+        ellipse = cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (3, 3))
+        gradient = cv2.morphologyEx(processed, cv2.MORPH_GRADIENT, ellipse)
+        _, edges = cv2.threshold(gradient, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
         
-        # Apply thresholding
-        _, thresh = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+        # Join characters of a line into one blob
+        line_kernel = cv2.getStructuringElement(cv2.MORPH_RECT, (max(9, width // 40), 1))
+        connected = cv2.morphologyEx(edges, cv2.MORPH_CLOSE, line_kernel)
+        # Connected components rather than external contours, so a frame around the label
+        # does not swallow the text inside it
+        count, _, stats, _ = cv2.connectedComponentsWithStats(connected, connectivity=8)
         
-        # Noise removal
-        denoised = cv2.fastNlMeansDenoising(thresh, None, 10, 7, 21)
+        regions = []
+        for x, y, w, h, area in stats[1:count]:
+            if h < 8 or h > height // 3 or w < 2 * h:
+                continue
+            # Reject blobs that are mostly empty (borders, stray lines)
+            if area < 0.3 * w * h:
+                continue
+            regions.append((int(x), int(y), int(w), int(h)))
+        return self._merge_line_regions(regions)
+    
+    def _merge_line_regions(self, regions):
+        """Merge boxes that sit on the same line with a word-sized gap between them"""
+        merged = []
+        for x, y, w, h in sorted(regions):
+            for i, (mx, my, mw, mh) in enumerate(merged):
+                overlap = min(y + h, my + mh) - max(y, my)
+                gap = x - (mx + mw)
+                if overlap >= 0.5 * min(h, mh) and gap <= max(h, mh):
+                    nx, ny = min(x, mx), min(y, my)
+                    merged[i] = (nx, ny, max(x + w, mx + mw) - nx, max(y + h, my + mh) - ny)
+                    break
+            else:
+                merged.append((x, y, w, h))
+        return merged
+    
+    def _build_region_montage(self, processed, regions):
+        """Stack region crops vertically into one small image for a single OCR call"""
+        # Tallest lines first (usually the product name), then likely date lines in reading order
+        by_height = sorted(regions, key=lambda r: r[3], reverse=True)
+        names = sorted(by_height[:2], key=lambda r: (r[1], r[0]))
+        others = sorted(by_height[2:], key=lambda r: r[2] * r[3], reverse=True)
+        chosen = names + sorted(others[:max(0, self.max_regions - len(names))],
+                                key=lambda r: (r[1], r[0]))
         
-        # Morphological operations
-        kernel = np.ones((1, 1), np.uint8)
-        processed = cv2.dilate(denoised, kernel, iterations=1)
-        processed = cv2.erode(processed, kernel, iterations=1)
+        pad = 8
+        crops = []
+        for x, y, w, h in chosen:
+            crop = processed[max(0, y - 2):y + h + 2, max(0, x - 2):x + w + 2]
+            # Tesseract reads best with text around 32px high
+            if crop.shape[0] < 32:
+                scale = 32.0 / crop.shape[0]
+                crop = cv2.resize(crop, None, fx=scale, fy=scale, interpolation=cv2.INTER_CUBIC)
+            crops.append(crop)
         
-        # Increase contrast
-        processed = cv2.convertScaleAbs(processed, alpha=1.5, beta=0)
+        montage_width = max(crop.shape[1] for crop in crops) + 2 * pad
+        rows = []
+        for crop in crops:
+            border = np.concatenate([crop[0, :], crop[-1, :], crop[:, 0], crop[:, -1]])
+            background = int(np.median(border))
+            rows.append(cv2.copyMakeBorder(crop, pad, pad, pad, montage_width - crop.shape[1] - pad,
+                                           cv2.BORDER_CONSTANT, value=background))
+        return np.vstack(rows)
+    
+    def _run_region_pass(self, processed):
+        """OCR only the detected text-line crops, returns [PassResult] or []"""
+        start = time.perf_counter()
+        regions = self.find_text_regions(processed)
+        self.last_timings['regions.detect'] = time.perf_counter() - start
+        self.last_preprocess_info['regions'] = len(regions)
+        if not regions:
+            return []
         
-        return img, processed
+        montage = self._build_region_montage(processed, regions)
+        return [self.run_pass('regions', montage, self.region_config)]
+    
+    def _record_pass_stats(self, results):
+        """Update per-pass timings and counters for the last image"""
+        self.pass_stats['images'] += 1
+        ran = set()
+        for name, _, seconds, _ in results:
+            ran.add(name)
+            self.last_timings[name] = seconds
+            self.pass_stats['passes_run'][name] = self.pass_stats['passes_run'].get(name, 0) + 1
+            self.pass_stats['pass_seconds'][name] = self.pass_stats['pass_seconds'].get(name, 0.0) + seconds
+        for name, _ in self.psm_passes:
+            if name not in ran:
+                self.pass_stats['passes_skipped'][name] += 1
     
     def extract_text(self, image_path):
         """Extract text from image using Tesseract OCR"""
+        return "\n".join(result.text for result in self.extract_passes(image_path))
+    
+    def extract_passes(self, image_path):
+        """Run OCR and return the PassResult of every pass whose text was used"""
+        self.last_timings = {}
         try:
+            start = time.perf_counter()
             original, processed = self.preprocess_image(image_path)
+            self.last_timings['preprocess'] = time.perf_counter() - start
             
-            # Try with different PSM modes for better accuracy
-            custom_config = r'--oem 3 --psm 6'
-            text1 = pytesseract.image_to_string(processed, config=custom_config)
+            region_results = self._run_region_pass(processed) if self.detect_regions else []
+            if region_results and self.find_dates(region_results[0].text):
+                results = region_results
+                self._record_pass_stats(results)
+            else:
+                # Try with different PSM modes for better accuracy
+                if self.parallel_passes:
+                    results = self._run_passes_parallel(processed)
+                else:
+                    results = self._run_passes_sequential(processed)
+                # A region attempt that found no date still counts toward the cost
+                self._record_pass_stats(region_results + results)
             
-            custom_config = r'--oem 3 --psm 11'
-            text2 = pytesseract.image_to_string(processed, config=custom_config)
-            
-            # Combine texts
-            text = text1 + "\n" + text2
-            
-            return text
+            return results
         except Exception as e:
             print(f"Error in OCR extraction: {str(e)}")
-            return ""
+            return []
     
     def parse_date(self, date_string):
         """Parse various date formats"""
-        # Clean the string
-        date_string = date_string.strip()
-        
-        # Try different date formats
-        formats = [
-            '%d/%m/%Y', '%d-%m-%Y', '%d.%m.%Y',
-            '%Y/%m/%d', '%Y-%m-%d',
-            '%d/%m/%y', '%d-%m-%y', '%d.%m.%y',
-            '%y/%m/%d', '%y-%m-%d',
-            '%d %B %Y', '%d %b %Y',
-            '%B %d, %Y', '%b %d, %Y'
-        ]
+        candidates = self.date_recognizer.find(date_string.strip())
+        return candidates[0].date if candidates else None
+    
+    def find_date_candidates(self, text):
+        """Return every date in text with its position and prefix keyword"""
+        return self.date_recognizer.find(text)
+    
+    def find_dates(self, text):
+        """Return all parseable dates in text (YYYY-MM-DD), in reading order"""
+        return [candidate.date for candidate in self.date_recognizer.find(text)]
+    
+    def _word_confidence(self, words, start, end):
+        """Mean Tesseract confidence (0-1) of the words overlapping a text span"""
+        confs = [conf for w_start, w_end, conf in words if w_start < end and w_end > start and conf >= 0]
+        if not confs:
+            return 0.5
+        return sum(confs) / len(confs) / 100.0
+    
+    def _keyword_score(self, candidate, text):
+        """Reward dates labelled as expiry, penalise manufacture/packing dates"""
+        if candidate.prefix in EXPIRY_KEYWORDS:
+            return 1.0
+        if candidate.prefix in OTHER_DATE_KEYWORDS:
+            return -1.0
+        # Keyword a little before the date, e.g. on the previous line
+        before = text[max(0, candidate.start - 40):candidate.start]
+        if NEARBY_EXPIRY_PATTERN.search(before):
+            return 0.5
+        if NEARBY_OTHER_PATTERN.search(before):
+            return -0.5
+        return 0.0
+    
+    def collect_candidates(self, pass_results):
+        """Every date found across passes, scored on everything but today's date (unsorted)"""
+        ranked = {}
+        for result in pass_results:
+            for candidate in self.date_recognizer.find(result.text):
+                confidence = self._word_confidence(result.words, candidate.start, candidate.end)
+                score = confidence + self._keyword_score(candidate, result.text)
+                entry = ranked.setdefault(candidate.date, {
+                    'date': candidate.date,
+                    'score': None,
+                    'confidence': 0.0,
+                    'prefix': None,
+                    'passes': [],
+                    'occurrences': 0
+                })
+                entry['occurrences'] += 1
+                if result.name not in entry['passes']:
+                    entry['passes'].append(result.name)
+                if entry['score'] is None or score > entry['score']:
+                    entry['score'] = score
+                    entry['confidence'] = round(confidence, 3)
+                    entry['prefix'] = candidate.prefix
         
-        for fmt in formats:
-            try:
-                parsed_date = datetime.strptime(date_string, fmt)
-                # Convert 2-digit year to 4-digit
-                if parsed_date.year < 100:
-                    parsed_date = parsed_date.replace(year=parsed_date.year + 2000)
-                return parsed_date.strftime('%Y-%m-%d')
-            except ValueError:
-                continue
+        for entry in ranked.values():
+            # Agreement between passes and repeated reads
+            entry['score'] += 0.3 * (len(entry['passes']) - 1) + 0.1 * min(entry['occurrences'] - 1, 3)
+            entry['score'] = round(entry['score'], 3)
         
-        return None
+        return list(ranked.values())
+    
+    def rank_candidates(self, pass_results, today=None):
+        """Score every date found across passes, best first"""
+        return rank_collected_candidates(self.collect_candidates(pass_results), today)
+    
+    def extract_expiry_candidates(self, image_path):
+        """Return (ranked candidate list, combined OCR text)"""
+        results = self.extract_passes(image_path)
+        text = "\n".join(result.text for result in results)
+        
+        self.last_collected = []
+        if not text:
+            return [], NO_TEXT_MESSAGE
+        
+        start = time.perf_counter()
+        self.last_collected = self.collect_candidates(results)
+        candidates = rank_collected_candidates(self.last_collected)
+        self.last_timings['parse'] = time.perf_counter() - start
+        return candidates, text
     
     def extract_expiry_date(self, image_path):
         """Main function to extract expiry date from image"""
-        text = self.extract_text(image_path)
+        candidates, text = self.extract_expiry_candidates(image_path)
+        self.last_candidates = candidates
         
-        if not text:
-            return None, "Could not extract text from image"
-        
-        dates_found = []
-        
-        # Search for date patterns
-        for pattern in self.date_patterns:
-            matches = re.finditer(pattern, text, re.IGNORECASE)
-            for match in matches:
-                groups = match.groups()
-                
-                # Handle different pattern types
-                if len(groups) >= 3:
-                    # Skip prefix words like EXP, BEST BEFORE
-                    if groups[0].lower() in ['exp', 'expiry', 'best before', 'use by']:
-                        groups = groups[1:]
-                    
-                    # Check if first group is a month name
-                    if groups[0].lower()[:3] in self.month_map:
-                        month = self.month_map[groups[0].lower()[:3]]
-                        day = int(groups[1])
-                        year = int(groups[2])
-                        date_str = f"{day:02d}/{month:02d}/{year}"
-                    elif groups[1].lower()[:3] in self.month_map:
-                        day = int(groups[0])
-                        month = self.month_map[groups[1].lower()[:3]]
-                        year = int(groups[2])
-                        date_str = f"{day:02d}/{month:02d}/{year}"
-                    else:
-                        date_str = f"{groups[0]}/{groups[1]}/{groups[2]}"
-                    
-                    parsed = self.parse_date(date_str)
-                    if parsed:
-                        dates_found.append(parsed)
-        
-        if dates_found:
-            # Return the first valid date found
-            return dates_found[0], text
+        if candidates:
+            # Return the highest scoring date
+            return candidates[0]['date'], text
         
         return None, text
     
@@ -158,20 +652,103 @@ class ExpiryDateExtractor:
         return "Unknown"
 
 
-# Test function
-if __name__ == "__main__":
-    extractor = ExpiryDateExtractor()
-    
-    # Test with sample image
-    test_image = "static/uploads/test.jpg"
+# Command line batch extraction
+IMAGE_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif', 'bmp'}
+
+_cli_extractor = None
+
+
+def _cli_init_worker(options):
+    """Create one extractor per CLI worker process"""
+    global _cli_extractor
+    _cli_extractor = ExpiryDateExtractor(**options)
+
+
+def _cli_extract(path):
+    """Extract date and food name from one image (runs in a worker process)"""
+    start = time.perf_counter()
     try:
-        expiry_date, extracted_text = extractor.extract_expiry_date(test_image)
-        food_name = extractor.extract_food_name(extracted_text)
-        
-        print("Extracted Text:")
-        print(extracted_text)
-        print("\n" + "="*50)
-        print(f"Food Name: {food_name}")
-        print(f"Expiry Date: {expiry_date}")
+        expiry_date, text = _cli_extractor.extract_expiry_date(path)
+        food_name = _cli_extractor.extract_food_name(text)
+        error = None
     except Exception as e:
-        print(f"Error: {str(e)}")
+        expiry_date, text, food_name, error = None, "", "Unknown", str(e)
+    return {
+        'path': path,
+        'expiry_date': expiry_date,
+        'food_name': food_name,
+        'text': text,
+        'error': error,
+        'seconds': time.perf_counter() - start
+    }
+
+
+def collect_image_paths(paths, extract_dir):
+    """Expand files, directories and zip archives into a list of image paths"""
+    images = []
+    for path in paths:
+        if os.path.isdir(path):
+            for name in sorted(os.listdir(path)):
+                if name.rsplit('.', 1)[-1].lower() in IMAGE_EXTENSIONS:
+                    images.append(os.path.join(path, name))
+        elif path.lower().endswith('.zip'):
+            with zipfile.ZipFile(path) as archive:
+                for member in archive.namelist():
+                    if member.rsplit('.', 1)[-1].lower() in IMAGE_EXTENSIONS:
+                        images.append(archive.extract(member, extract_dir))
+        else:
+            images.append(path)
+    return images
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Extract expiry dates from food label images.')
+    parser.add_argument('paths', nargs='*', default=['static/uploads'],
+                        help='image files, directories or zip archives')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1,
+                        help='worker processes (default: all cores)')
+    parser.add_argument('--parallel-passes', action='store_true',
+                        help='run the PSM passes concurrently')
+    parser.add_argument('--no-short-circuit', action='store_true',
+                        help='always run every PSM pass')
+    parser.add_argument('--detect-regions', action='store_true',
+                        help='OCR text-line crops before the whole image')
+    parser.add_argument('--backend', choices=sorted(OCR_BACKENDS),
+                        help='OCR engine (default: OCR_BACKEND env var or pytesseract)')
+    parser.add_argument('--text', action='store_true', help='print the extracted text')
+    args = parser.parse_args(argv)
+    
+    options = {
+        'parallel_passes': args.parallel_passes,
+        'short_circuit': not args.no_short_circuit,
+        'detect_regions': args.detect_regions,
+        'ocr_backend': args.backend
+    }
+    
+    with tempfile.TemporaryDirectory() as extract_dir:
+        images = collect_image_paths(args.paths, extract_dir)
+        if not images:
+            print("No images found")
+            return 1
+        
+        workers = max(1, min(args.workers, len(images)))
+        start = time.perf_counter()
+        with ProcessPoolExecutor(max_workers=workers, initializer=_cli_init_worker,
+                                 initargs=(options,)) as executor:
+            futures = [executor.submit(_cli_extract, path) for path in images]
+            for future in as_completed(futures):
+                result = future.result()
+                status = result['error'] or f"{result['expiry_date'] or '-'} | {result['food_name']}"
+                print(f"{os.path.basename(result['path'])}: {status} ({result['seconds'] * 1000:.0f} ms)")
+                if args.text:
+                    print(result['text'])
+        elapsed = time.perf_counter() - start
+    
+    print("=" * 50)
+    print(f"{len(images)} images in {elapsed:.2f}s with {workers} workers "
+          f"({len(images) / elapsed:.2f} images/sec)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,209 @@
+import argparse
+import os
+import re
+import sqlite3
+import sys
+import tempfile
+from datetime import date, timedelta
+
+try:
+    import mysql.connector
+except ImportError:
+    mysql = None
+
+# Plan lines that mean a query reads a whole table or sorts rows itself
+SQLITE_FULL_SCAN = re.compile(r'^SCAN (?!.*\bUSING (?:COVERING )?INDEX\b)')
+SQLITE_SORT = re.compile(r'USE TEMP B-TREE FOR (?:ORDER BY|GROUP BY|DISTINCT)')
+AUDITED_STATEMENTS = ('SELECT', 'UPDATE', 'DELETE', 'WITH')
+
+SEED_USERS = 3
+SEED_ITEMS_PER_USER = 200
+CATEGORIES = ['Dairy', 'Vegetables', 'Fruits', 'Meat & Poultry', 'Bakery', 'Other']
+
+
+class OfflineAssistant:
+    """Stands in for the AI client so the audit never calls the model API"""
+    
+    def __getattr__(self, name):
+        return lambda *args, **kwargs: {'success': False, 'response': '', 'advice': '',
+                                        'meal_plan': '', 'recipe_name': None}
+
+
+def normalize(sql):
+    """Statement shape with literals removed, used to report each query once"""
+    sql = re.sub(r"'(?:[^']|'')*'", '?', sql)
+    sql = re.sub(r'\b\d+(?:\.\d+)?\b', '?', sql)
+    return ' '.join(sql.split())
+
+
+def seed(app_module):
+    """Create users and enough food items that the planner prefers indexes over scans"""
+    today = date.today()
+    client = app_module.app.test_client()
+    for index in range(SEED_USERS):
+        username = f'audit{index}'
+        client.post('/signup', data={'username': username, 'email': f'{username}@example.com',
+                                     'password': 'audit', 'confirm_password': 'audit'})
+        client.post('/login', data={'username': username, 'password': 'audit'})
+        items = [{
+            'food_name': f'Item {n}',
+            'expiry_date': (today + timedelta(days=n % 120 - 30)).isoformat(),
+            'category': CATEGORIES[n % len(CATEGORIES)],
+            'quantity': '1'
+        } for n in range(SEED_ITEMS_PER_USER)]
+        client.post('/add_food/batch', json={'items': items})
+        client.get('/logout')
+    
+    conn = app_module.db_pool.connection()
+    conn.execute('ANALYZE')
+    conn.commit()
+    conn.close()
+
+
+def drive(app_module, food_ids):
+    """Hit every database-backed route and background job once as a logged-in user"""
+    client = app_module.app.test_client()
+    client.post('/login', data={'username': 'audit0', 'password': 'audit'})
+    
+    client.get('/index')
+    page = client.get('/api/food_items', query_string={'status': 'Fresh'}).get_json()
+    client.get('/api/food_items', query_string={'status': 'Fresh', 'after': page['next_cursor']})
+    client.get('/api/food_items', query_string={'category': 'Dairy', 'status': 'Expired'})
+    client.get('/dashboard')
+    client.get('/api/check_notifications')
+    client.get('/api/changes', query_string={'since': 0})
+    client.get('/api/metrics')
+    client.post('/add_food', data={'food_name': 'Audit Milk', 'expiry_date': date.today().isoformat(),
+                                   'category': 'Dairy', 'quantity': '1'})
+    client.post('/add_food/batch', json={'items': [{'food_name': 'Audit Bread',
+                                                    'expiry_date': date.today().isoformat()}]})
+    client.post(f'/delete_food/{food_ids[0]}')
+    client.post('/delete_food/batch', json={'status': 'Expired', 'category': 'Bakery'})
+    client.post('/delete_food/batch', json={'status': 'Expired'})
+    client.get('/export/food_items.csv').get_data()
+    client.get('/api/changes', query_string={'since': 1})
+    client.post('/ai/chat', json={'message': 'audit'})
+    client.get(f'/ai/storage-tip/{food_ids[1]}')
+    client.get('/ai/meal-plan')
+    client.post('/ai/generate-recipes')
+    client.get('/logout')
+    
+    app_module.notification_engine.run_once()
+
+
+def explain_sqlite(conn, sql):
+    """(plan lines, problems) for one statement"""
+    plan = [row[3] for row in conn.execute(f'EXPLAIN QUERY PLAN {sql}')]
+    problems = [line for line in plan if SQLITE_FULL_SCAN.search(line) or SQLITE_SORT.search(line)]
+    return plan, problems
+
+
+def audit_sqlite():
+    """Run the SQLite app against a seeded temporary database and explain every statement it issued"""
+    workdir = tempfile.mkdtemp(prefix='query_audit_')
+    os.environ['DATABASE_PATH'] = os.path.join(workdir, 'audit.db')
+    os.environ['OCR_CACHE_PATH'] = os.path.join(workdir, 'ocr_cache.db')
+    os.environ['AI_CACHE_PATH'] = os.path.join(workdir, 'ai_cache.db')
+    import app_sqlite
+    
+    app_sqlite.ai_assistant = OfflineAssistant()
+    app_sqlite.init_db()
+    seed(app_sqlite)
+    
+    conn = app_sqlite.db_pool.connection()
+    food_ids = [row[0] for row in conn.execute('''
+        SELECT f.id FROM food_items f JOIN users u ON u.id = f.user_id
+        WHERE u.username = 'audit0' LIMIT 2
+    ''')]
+    conn.close()
+    
+    statements = {}
+    
+    def trace(sql):
+        if sql.lstrip().upper().startswith(AUDITED_STATEMENTS):
+            statements.setdefault(normalize(sql), sql)
+    
+    # Idle connections were opened before tracing started
+    app_sqlite.db_pool.close_all()
+    app_sqlite.db_pool.trace_callback = trace
+    drive(app_sqlite, food_ids)
+    app_sqlite.db_pool.trace_callback = None
+    
+    conn = sqlite3.connect(os.environ['DATABASE_PATH'])
+    results = []
+    for shape, sql in statements.items():
+        plan, problems = explain_sqlite(conn, sql)
+        results.append((shape, plan, problems))
+    conn.close()
+    return results
+
+
+def audit_mysql(config):
+    """Explain the sample of every statement performance_schema recorded for the app's schema"""
+    conn = mysql.connector.connect(**config)
+    cursor = conn.cursor(dictionary=True)
+    cursor.execute('''
+        SELECT DIGEST_TEXT, QUERY_SAMPLE_TEXT
+        FROM performance_schema.events_statements_summary_by_digest
+        WHERE SCHEMA_NAME = %s AND QUERY_SAMPLE_TEXT IS NOT NULL
+    ''', (config['database'],))
+    samples = cursor.fetchall()
+    
+    results = []
+    for sample in samples:
+        sql = sample['QUERY_SAMPLE_TEXT']
+        if not sql.lstrip().upper().startswith(AUDITED_STATEMENTS) or 'performance_schema' in sql:
+            continue
+        try:
+            cursor.execute(f'EXPLAIN {sql}')
+            rows = cursor.fetchall()
+        except mysql.connector.Error as e:
+            # Truncated samples (long statements) cannot be explained
+            results.append((sample['DIGEST_TEXT'], [], [f'not explained: {e.msg}']))
+            continue
+        plan = [f"{row['table']}: type={row['type']} key={row['key']} rows={row['rows']} "
+                f"extra={row['Extra'] or ''}" for row in rows]
+        problems = [line for row, line in zip(rows, plan)
+                    if row['type'] == 'ALL' or 'Using filesort' in (row['Extra'] or '')
+                    or 'Using temporary' in (row['Extra'] or '')]
+        results.append((sample['DIGEST_TEXT'], plan, problems))
+    cursor.close()
+    conn.close()
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description='Explain every query the app issues and flag full scans and sorts.')
+    parser.add_argument('--mysql', action='store_true',
+                        help='audit statements recorded by performance_schema on the MySQL server '
+                             '(MYSQL_HOST/MYSQL_USER/MYSQL_PASSWORD/MYSQL_DATABASE)')
+    parser.add_argument('--verbose', action='store_true', help='print the plan of every query')
+    args = parser.parse_args(argv)
+    
+    if args.mysql:
+        results = audit_mysql({
+            'host': os.getenv('MYSQL_HOST', 'localhost'),
+            'user': os.getenv('MYSQL_USER', 'root'),
+            'password': os.getenv('MYSQL_PASSWORD', ''),
+            'database': os.getenv('MYSQL_DATABASE', 'food_expiry_tracker')
+        })
+    else:
+        results = audit_sqlite()
+    
+    flagged = 0
+    for shape, plan, problems in results:
+        if problems:
+            flagged += 1
+        if problems or args.verbose:
+            print(f"{'FLAG' if problems else 'ok  '} {shape}")
+            for line in plan:
+                print(f"       {line}")
+    print("=" * 50)
+    print(f"{len(results)} queries audited, {flagged} with full scans or sorts")
+    # Non-zero exit so a CI step fails when an index regresses
+    return 1 if flagged else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,218 @@
+import argparse
+import array
+import json
+import mmap
+import os
+import struct
+import sys
+import tempfile
+import time
+from collections.abc import Mapping
+
+# Layout, all integers unsigned 32-bit little-endian:
+#   header      magic, version and the five counts below
+#   recipes     8 words each: name offset/length, instructions offset/length, extra offset/length,
+#               first ingredient ref, ingredient count
+#   ingredients 4 words each: text offset/length, first posting, posting count
+#   refs        ingredient ids of every recipe's ingredient list, in order
+#   postings    ids of the recipes using each ingredient, ascending
+#   strings     UTF-8 text the offsets point into; extra holds any other recipe keys as JSON
+MAGIC = b'RCAT'
+VERSION = 1
+HEADER = struct.Struct('<4sIIIIII')
+RECIPE_WORDS = 8
+INGREDIENT_WORDS = 4
+KNOWN_FIELDS = ('name', 'ingredients', 'instructions')
+
+
+def intern_ingredients(recipes):
+    """Number each distinct ingredient text.
+    Returns (texts, each recipe's ingredient ids, each ingredient's recipe ids)"""
+    ids = {}
+    texts = []
+    refs = []
+    postings = []
+    for recipe_id, recipe in enumerate(recipes):
+        recipe_refs = []
+        for text in recipe.get('ingredients', []):
+            ingredient_id = ids.get(text)
+            if ingredient_id is None:
+                ingredient_id = len(texts)
+                ids[text] = ingredient_id
+                texts.append(text)
+                postings.append([])
+            recipe_refs.append(ingredient_id)
+            if not postings[ingredient_id] or postings[ingredient_id][-1] != recipe_id:
+                postings[ingredient_id].append(recipe_id)
+        refs.append(recipe_refs)
+    return texts, refs, postings
+
+
+def build_catalogue(recipes, path):
+    """Write recipes (the recipes.json list) to path in the binary format, replacing it atomically so
+    processes that have the old file mapped keep reading it"""
+    for index, recipe in enumerate(recipes):
+        ingredients = recipe.get('ingredients', [])
+        if not isinstance(recipe.get('name'), str) or not isinstance(ingredients, list) or \
+                not all(isinstance(ingredient, str) for ingredient in ingredients):
+            raise ValueError(f"Recipe {index} needs a name and a list of ingredients")
+    texts, refs, postings = intern_ingredients(recipes)
+    
+    strings = bytearray()
+    
+    def add_string(text):
+        data = text.encode('utf-8')
+        offset = len(strings)
+        strings.extend(data)
+        return offset, len(data)
+    
+    recipe_table = array.array('I')
+    ref_table = array.array('I')
+    for recipe, recipe_refs in zip(recipes, refs):
+        extra = {key: value for key, value in recipe.items() if key not in KNOWN_FIELDS}
+        recipe_table.extend(add_string(recipe['name']))
+        recipe_table.extend(add_string(str(recipe.get('instructions', ''))))
+        recipe_table.extend(add_string(json.dumps(extra)) if extra else (0, 0))
+        recipe_table.extend((len(ref_table), len(recipe_refs)))
+        ref_table.extend(recipe_refs)
+    
+    ingredient_table = array.array('I')
+    posting_table = array.array('I')
+    for text, recipe_ids in zip(texts, postings):
+        ingredient_table.extend(add_string(text))
+        ingredient_table.extend((len(posting_table), len(recipe_ids)))
+        posting_table.extend(recipe_ids)
+    
+    if sys.byteorder != 'little':
+        for table in (recipe_table, ingredient_table, ref_table, posting_table):
+            table.byteswap()
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, temp_path = tempfile.mkstemp(dir=directory, prefix='.recipes-', suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(HEADER.pack(MAGIC, VERSION, len(recipes), len(texts), len(ref_table), len(posting_table),
+                                len(strings)))
+            for table in (recipe_table, ingredient_table, ref_table, posting_table):
+                table.tofile(f)
+            f.write(strings)
+        os.replace(temp_path, path)
+    except BaseException:
+        os.unlink(temp_path)
+        raise
+    return {'recipes': len(recipes), 'ingredients': len(texts), 'bytes': os.path.getsize(path)}
+
+
+def is_catalogue(path):
+    """True if path holds a binary catalogue rather than JSON"""
+    with open(path, 'rb') as f:
+        return f.read(len(MAGIC)) == MAGIC
+
+
+class Recipe(Mapping):
+    """One catalogue recipe, read like the recipes.json dict; each field is decoded when first accessed"""
+    
+    def __init__(self, catalogue, recipe_id):
+        self._catalogue = catalogue
+        self._id = recipe_id
+        self._extra = None
+    
+    def _word(self, index):
+        return self._catalogue._recipes[self._id * RECIPE_WORDS + index]
+    
+    def _extra_fields(self):
+        if self._extra is None:
+            text = self._catalogue._text(self._word(4), self._word(5))
+            self._extra = json.loads(text) if text else {}
+        return self._extra
+    
+    def __getitem__(self, key):
+        if key == 'name':
+            return self._catalogue._text(self._word(0), self._word(1))
+        if key == 'instructions':
+            return self._catalogue._text(self._word(2), self._word(3))
+        if key == 'ingredients':
+            start = self._word(6)
+            return [self._catalogue.ingredient(i) for i in self._catalogue._refs[start:start + self._word(7)]]
+        return self._extra_fields()[key]
+    
+    def __iter__(self):
+        yield from KNOWN_FIELDS
+        yield from self._extra_fields()
+    
+    def __len__(self):
+        return len(KNOWN_FIELDS) + len(self._extra_fields())
+
+
+class RecipeCatalogue:
+    """A built catalogue mapped read-only, so every worker process shares the same pages"""
+    
+    def __init__(self, path):
+        if sys.byteorder != 'little':
+            raise ValueError("Binary recipe catalogues can only be mapped on little-endian hosts")
+        with open(path, 'rb') as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if len(self._mmap) < HEADER.size:
+            raise ValueError(f"{path} is not a recipe catalogue")
+        magic, version, recipes, ingredients, refs, postings, strings = HEADER.unpack_from(self._mmap)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"{path} is not a version {VERSION} recipe catalogue, rebuild it")
+        words = recipes * RECIPE_WORDS + ingredients * INGREDIENT_WORDS + refs + postings
+        if len(self._mmap) != HEADER.size + words * 4 + strings:
+            raise ValueError(f"{path} is truncated, rebuild it")
+        
+        view = memoryview(self._mmap)
+        table = view[HEADER.size:HEADER.size + words * 4].cast('I')
+        self._recipes = table[:recipes * RECIPE_WORDS]
+        start = recipes * RECIPE_WORDS
+        self._ingredients = table[start:start + ingredients * INGREDIENT_WORDS]
+        start += ingredients * INGREDIENT_WORDS
+        self._refs = table[start:start + refs]
+        self._postings = table[start + refs:]
+        self._strings = view[HEADER.size + words * 4:]
+        self.ingredient_count = ingredients
+    
+    def _text(self, offset, length):
+        return str(self._strings[offset:offset + length], 'utf-8')
+    
+    def ingredient(self, ingredient_id):
+        base = ingredient_id * INGREDIENT_WORDS
+        return self._text(self._ingredients[base], self._ingredients[base + 1])
+    
+    def vocabulary(self):
+        """(ingredient text, ids of the recipes using it) per ingredient; the ids are a view of the mapping"""
+        for ingredient_id in range(self.ingredient_count):
+            base = ingredient_id * INGREDIENT_WORDS
+            start = self._ingredients[base + 2]
+            yield self.ingredient(ingredient_id), self._postings[start:start + self._ingredients[base + 3]]
+    
+    def __len__(self):
+        return len(self._recipes) // RECIPE_WORDS
+    
+    def __getitem__(self, recipe_id):
+        if not 0 <= recipe_id < len(self):
+            raise IndexError(recipe_id)
+        return Recipe(self, recipe_id)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description='Compile recipes.json into a binary catalogue the apps memory-map.')
+    parser.add_argument('source', nargs='?', default='recipes.json', help='recipe JSON list')
+    parser.add_argument('-o', '--output', default='recipes.bin', help='catalogue to write')
+    args = parser.parse_args(argv)
+    
+    start = time.perf_counter()
+    with open(args.source, 'r') as f:
+        recipes = json.load(f)
+    try:
+        stats = build_catalogue(recipes, args.output)
+    except ValueError as e:
+        print(f"Catalogue build error: {e}")
+        return 1
+    print(f"Wrote {stats['recipes']} recipes ({stats['ingredients']} distinct ingredients, "
+          f"{stats['bytes']} bytes) to {args.output} in {time.perf_counter() - start:.2f}s")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,235 @@
+import heapq
+import json
+import os
+import threading
+import time
+from collections import defaultdict
+
+from recipe_catalogue import RecipeCatalogue, intern_ingredients, is_catalogue
+
+# Substring lookups go through ingredient trigrams; shorter food names scan the ingredient vocabulary
+NGRAM = 3
+
+
+def urgency(days_remaining):
+    """Weight of an expiring food: 1 if it expires today (or has expired), 1/2 tomorrow, 1/3 the day after"""
+    return 1.0 / (1 + max(days_remaining or 0, 0))
+
+
+def normalize(text):
+    """Lowercase with runs of whitespace collapsed, the form every ingredient and food name is matched in"""
+    return ' '.join(str(text).lower().split())
+
+
+def load_recipes(path):
+    """(recipes, vocabulary) from a binary catalogue (see recipe_catalogue.py) or a recipes.json list"""
+    if is_catalogue(path):
+        catalogue = RecipeCatalogue(path)
+        return catalogue, catalogue.vocabulary()
+    with open(path, 'r') as f:
+        recipes = json.load(f)
+    texts, _, postings = intern_ingredients(recipes)
+    return recipes, zip(texts, postings)
+
+
+def ngrams(text):
+    return {text[i:i + NGRAM] for i in range(len(text) - NGRAM + 1)}
+
+
+class _Catalogue:
+    """One immutable load of the recipe file; replaced as a whole on reload"""
+    
+    def __init__(self, recipes, vocabulary):
+        self.recipes = recipes
+        # Ingredients that normalize alike share an id; each keeps one recipe id list per spelling
+        self.ingredient_ids = {}
+        self.ingredients = []
+        self.postings = []
+        for text, recipe_ids in vocabulary:
+            ingredient = normalize(text)
+            if not ingredient:
+                continue
+            ingredient_id = self.ingredient_ids.get(ingredient)
+            if ingredient_id is None:
+                ingredient_id = len(self.ingredients)
+                self.ingredient_ids[ingredient] = ingredient_id
+                self.ingredients.append(ingredient)
+                self.postings.append([])
+            self.postings[ingredient_id].append(recipe_ids)
+        self.max_length = max((len(i) for i in self.ingredients), default=0)
+        
+        grams = defaultdict(list)
+        for ingredient_id, ingredient in enumerate(self.ingredients):
+            for gram in ngrams(ingredient):
+                grams[gram].append(ingredient_id)
+        self.grams = dict(grams)
+    
+    def containing(self, food):
+        """Ingredient ids whose text contains food ("milk" -> "coconut milk")"""
+        if len(food) < NGRAM:
+            return {i for i, ingredient in enumerate(self.ingredients) if food in ingredient}
+        lists = sorted((self.grams.get(gram, ()) for gram in ngrams(food)), key=len)
+        if not lists[0]:
+            return set()
+        candidates = set(lists[0])
+        for other in lists[1:]:
+            candidates.intersection_update(other)
+            if not candidates:
+                return candidates
+        # Trigrams can all occur without being contiguous, so confirm
+        return {i for i in candidates if food in self.ingredients[i]}
+    
+    def contained_in(self, food):
+        """Ingredient ids whose text occurs inside food ("chicken breast fillets" -> "chicken breast")"""
+        found = set()
+        longest = min(self.max_length, len(food))
+        for start in range(len(food)):
+            for end in range(start + 1, min(len(food), start + longest) + 1):
+                ingredient_id = self.ingredient_ids.get(food[start:end])
+                if ingredient_id is not None:
+                    found.add(ingredient_id)
+        return found
+    
+    def matching_ingredients(self, food_name):
+        food = normalize(food_name)
+        if not food:
+            return set()
+        return self.containing(food) | self.contained_in(food)
+    
+    def recipes_using(self, food):
+        """Ids of recipes sharing an ingredient with the food"""
+        return set().union(*(ids for i in self.matching_ingredients(food) for ids in self.postings[i]))
+
+
+class RecipeIndex:
+    """recipes.json indexed by ingredient, loaded once and reloaded when the file changes"""
+    
+    def __init__(self, path, check_interval=1.0):
+        self.path = path
+        # Seconds between mtime checks, so lookups do not stat the file every time
+        self.check_interval = check_interval
+        self._catalogue = _Catalogue([], ())
+        self._mtime = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+        self.loaded_at = None
+        self.load_seconds = None
+        self.reloads = 0
+        self._reload_if_changed(force=True)
+    
+    def _reload_if_changed(self, force=False):
+        now = time.monotonic()
+        if not force and now - self._checked_at < self.check_interval:
+            return
+        with self._lock:
+            if not force and now - self._checked_at < self.check_interval:
+                return
+            self._checked_at = now
+            try:
+                mtime = os.stat(self.path).st_mtime_ns
+            except OSError as e:
+                if self._mtime is not None or force:
+                    print(f"Recipe catalogue error: {e}")
+                return
+            if mtime == self._mtime:
+                return
+            # Remembered even if loading fails, so a bad file is reported once rather than every check
+            self._mtime = mtime
+            start = time.perf_counter()
+            try:
+                # Built fully before the swap, so concurrent lookups see the old or the new index
+                self._catalogue = _Catalogue(*load_recipes(self.path))
+            except (OSError, ValueError) as e:
+                # Keep serving the previous catalogue (e.g. the file is half written)
+                print(f"Recipe catalogue error: {e}")
+                return
+            self.load_seconds = round(time.perf_counter() - start, 3)
+            self.loaded_at = time.time()
+            self.reloads += 1
+    
+    @property
+    def catalogue(self):
+        self._reload_if_changed()
+        return self._catalogue
+    
+    def _matches(self, catalogue, foods):
+        """Score and bitmask of the foods used, for every recipe using at least one of them.
+        foods are (food_name, days_remaining); a food listed twice counts once, at its soonest expiry"""
+        weights = {}
+        names = {}
+        for food_name, days_remaining in foods:
+            food = normalize(food_name)
+            if food:
+                weights[food] = max(weights.get(food, 0.0), urgency(days_remaining))
+                names.setdefault(food, food_name)
+        
+        scores = defaultdict(float)
+        masks = defaultdict(int)
+        for bit, food in enumerate(weights):
+            weight = weights[food]
+            for recipe_id in catalogue.recipes_using(food):
+                scores[recipe_id] += weight
+                masks[recipe_id] |= 1 << bit
+        return list(weights.values()), list(names.values()), scores, masks
+    
+    def _suggestion(self, catalogue, recipe_id, names, scores, masks):
+        mask = masks[recipe_id]
+        uses = [name for bit, name in enumerate(names) if mask >> bit & 1]
+        return dict(catalogue.recipes[recipe_id], uses=uses, score=round(scores[recipe_id], 3))
+    
+    def rank(self, foods, limit=5):
+        """The limit best recipes by summed urgency of the foods they use, ties in file order"""
+        catalogue = self.catalogue
+        weights, names, scores, masks = self._matches(catalogue, foods)
+        # Heap of limit entries rather than sorting every matching recipe
+        best = heapq.nlargest(limit, scores, key=lambda recipe_id: (scores[recipe_id], -recipe_id))
+        return [self._suggestion(catalogue, recipe_id, names, scores, masks) for recipe_id in best]
+    
+    def cover(self, foods, limit=5):
+        """Up to limit recipes chosen greedily to use as many of the foods as possible, most urgent first,
+        remaining slots filled by rank"""
+        catalogue = self.catalogue
+        weights, names, scores, masks = self._matches(catalogue, foods)
+        
+        def gain(recipe_id):
+            remaining = masks[recipe_id] & uncovered
+            return sum(weight for bit, weight in enumerate(weights) if remaining >> bit & 1)
+        
+        # Recipes using the same foods are interchangeable for covering, keep the first of each
+        representatives = {}
+        for recipe_id, mask in masks.items():
+            if mask not in representatives or recipe_id < representatives[mask]:
+                representatives[mask] = recipe_id
+        
+        # Lazy greedy: a recipe's gain only shrinks as foods get covered, so a popped entry whose
+        # recomputed gain still beats the next entry is the best pick without rescoring the rest
+        uncovered = (1 << len(weights)) - 1
+        heap = [(-scores[recipe_id], recipe_id) for recipe_id in representatives.values()]
+        heapq.heapify(heap)
+        chosen = []
+        while heap and uncovered and len(chosen) < limit:
+            _, recipe_id = heapq.heappop(heap)
+            entry = (-gain(recipe_id), recipe_id)
+            if heap and entry > heap[0]:
+                heapq.heappush(heap, entry)
+                continue
+            if not entry[0]:
+                break
+            chosen.append(recipe_id)
+            uncovered &= ~masks[recipe_id]
+        
+        if len(chosen) < limit:
+            taken = set(chosen)
+            rest = (recipe_id for recipe_id in scores if recipe_id not in taken)
+            chosen += heapq.nsmallest(limit - len(chosen), rest,
+                                      key=lambda recipe_id: (-scores[recipe_id], recipe_id))
+        return [self._suggestion(catalogue, recipe_id, names, scores, masks) for recipe_id in chosen]
+    
+    def stats(self):
+        catalogue = self._catalogue
+        return {
+            'recipes': len(catalogue.recipes),
+            'ingredients': len(catalogue.ingredients),
+            'reloads': self.reloads,
+            'load_seconds': self.load_seconds
+        }
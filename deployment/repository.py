@@ -0,0 +1,611 @@
+import base64
+import binascii
+import sqlite3
+import threading
+import weakref
+from collections import namedtuple
+from contextlib import contextmanager
+from datetime import date, datetime, timedelta
+
+from change_feed import MAX_CHANGES, ChangeFeed
+from dashboard_summary import NEAR_EXPIRY_DAYS, DashboardSummary, item_status
+from db_pool import PoolTimeout, request_connection
+
+try:
+    import mysql.connector
+except ImportError:
+    mysql = None
+
+User = namedtuple('User', 'id username email password_hash')
+FoodItem = namedtuple(
+    'FoodItem',
+    'id food_name expiry_date purchase_date status category quantity days_remaining',
+    defaults=(None,) * 8
+)
+
+DEFAULT_CATEGORIES = [
+    ('Dairy', 'Milk, cheese, yogurt, butter'),
+    ('Vegetables', 'Fresh vegetables'),
+    ('Fruits', 'Fresh fruits'),
+    ('Meat & Poultry', 'Chicken, beef, pork, lamb'),
+    ('Seafood', 'Fish and shellfish'),
+    ('Beverages', 'Drinks and juices'),
+    ('Bakery', 'Bread, pastries, cakes'),
+    ('Frozen Foods', 'Frozen meals and items'),
+    ('Canned Goods', 'Canned vegetables, fruits, soups'),
+    ('Condiments', 'Sauces, dressings, spices'),
+    ('Snacks', 'Chips, cookies, crackers'),
+    ('Other', 'Miscellaneous items')
+]
+
+# Every statement the app runs, written once with '?' placeholders. Dates are always passed as
+# parameters (never CURDATE()/date('now')), so the text is identical for both databases and
+# constant across requests, which is what lets the statement caches hit.
+STATEMENTS = {
+    'user_by_username': 'SELECT id, username, email, password_hash FROM users WHERE username = ?',
+    'insert_user': 'INSERT INTO users (username, email, password_hash) VALUES (?, ?, ?)',
+    'items_for_user': '''
+        SELECT id, food_name, expiry_date, purchase_date, category, quantity
+        FROM food_items
+        WHERE user_id = ?
+        ORDER BY expiry_date ASC, id ASC
+    ''',
+    'items_for_user_limited': '''
+        SELECT id, food_name, expiry_date, purchase_date, category, quantity
+        FROM food_items
+        WHERE user_id = ?
+        ORDER BY expiry_date ASC, id ASC
+        LIMIT ?
+    ''',
+    # Keyset pages in (expiry_date, id) order: the BETWEEN lower bound is the previous page's last
+    # expiry date (or the status window's start), ties on that date are broken by id
+    'items_page': '''
+        SELECT id, food_name, expiry_date, purchase_date, category, quantity
+        FROM food_items
+        WHERE user_id = ? AND expiry_date BETWEEN ? AND ?
+        AND (expiry_date > ? OR id > ?)
+        ORDER BY expiry_date ASC, id ASC
+        LIMIT ?
+    ''',
+    'items_page_category': '''
+        SELECT id, food_name, expiry_date, purchase_date, category, quantity
+        FROM food_items
+        WHERE user_id = ? AND category = ? AND expiry_date BETWEEN ? AND ?
+        AND (expiry_date > ? OR id > ?)
+        ORDER BY expiry_date ASC, id ASC
+        LIMIT ?
+    ''',
+    'items_expiring_between': '''
+        SELECT id, food_name, expiry_date
+        FROM food_items
+        WHERE user_id = ? AND expiry_date BETWEEN ? AND ?
+        ORDER BY expiry_date ASC, id ASC
+        LIMIT ?
+    ''',
+    'item_by_id': '''
+        SELECT id, food_name, expiry_date, purchase_date, category, quantity, status
+        FROM food_items
+        WHERE id = ? AND user_id = ?
+    ''',
+    'insert_item': '''
+        INSERT INTO food_items
+        (user_id, food_name, expiry_date, purchase_date, category, quantity, notes, image_path, status, revision)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    ''',
+    'user_revision': 'SELECT revision, pruned_through FROM user_revisions WHERE user_id = ?',
+    'items_changed_since': '''
+        SELECT id, food_name, expiry_date, purchase_date, category, quantity
+        FROM food_items
+        WHERE user_id = ? AND revision > ?
+        LIMIT ?
+    ''',
+    'deletions_since': '''
+        SELECT food_item_id FROM food_deletions
+        WHERE user_id = ? AND revision > ?
+        LIMIT ?
+    ''',
+    'delete_item': 'DELETE FROM food_items WHERE id = ? AND user_id = ?',
+    # Rows a bulk delete will remove, with what the summary and change feed need; {ids} is filled
+    # with one placeholder per id
+    'items_to_delete_by_id': '''
+        SELECT id, category, status, expiry_date
+        FROM food_items
+        WHERE user_id = ? AND id IN ({ids})
+    ''',
+    'items_to_delete_between': '''
+        SELECT id, category, status, expiry_date
+        FROM food_items
+        WHERE user_id = ? AND expiry_date BETWEEN ? AND ?
+    ''',
+    'items_to_delete_between_category': '''
+        SELECT id, category, status, expiry_date
+        FROM food_items
+        WHERE user_id = ? AND category = ? AND expiry_date BETWEEN ? AND ?
+    '''
+}
+
+# Large enough to mean "no limit" for the LIMIT-parameterised statements
+NO_LIMIT = 2 ** 31 - 1
+
+PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+# Ids per IN (...) list when deleting by id
+DELETE_CHUNK_SIZE = 500
+
+
+class DatabaseUnavailable(Exception):
+    """No database connection could be checked out"""
+
+
+def valid_food_items(items):
+    """(items with a food name and a YYYY-MM-DD expiry date, number skipped)"""
+    valid = []
+    for item in items:
+        if not isinstance(item, dict):
+            continue
+        try:
+            datetime.strptime(str(item.get('expiry_date')), '%Y-%m-%d')
+        except ValueError:
+            continue
+        if item.get('food_name'):
+            valid.append(item)
+    return valid, len(items) - len(valid)
+
+
+def encode_cursor(item):
+    """Opaque page cursor pointing just after the given item"""
+    return base64.urlsafe_b64encode(f"{item.expiry_date.isoformat()}:{item.id}".encode()).decode()
+
+
+def decode_cursor(cursor):
+    """(expiry_date, id) from encode_cursor, raises ValueError if malformed"""
+    try:
+        expiry_date, food_id = base64.urlsafe_b64decode(cursor.encode()).decode().split(':')
+        return datetime.strptime(expiry_date, '%Y-%m-%d').date(), int(food_id)
+    except (binascii.Error, UnicodeDecodeError) as e:
+        raise ValueError(f"invalid cursor: {e}")
+
+
+def status_window(status, today):
+    """(first, last) expiry dates of items with the given status, the inverse of item_status"""
+    near_expiry_date = today + timedelta(days=NEAR_EXPIRY_DAYS)
+    windows = {
+        None: (date.min, date.max),
+        'Expired': (date.min, today - timedelta(days=1)),
+        'Near Expiry': (today, near_expiry_date),
+        'Fresh': (near_expiry_date + timedelta(days=1), date.max)
+    }
+    if status not in windows:
+        raise ValueError(f"unknown status: {status}")
+    return windows[status]
+
+
+def food_item_dict(item):
+    """JSON-ready dict of a FoodItem (dates as YYYY-MM-DD)"""
+    data = item._asdict()
+    for field in ('expiry_date', 'purchase_date'):
+        if data[field] is not None:
+            data[field] = data[field].isoformat()
+    return data
+
+
+def _to_date(value):
+    if isinstance(value, str):
+        return datetime.strptime(value[:10], '%Y-%m-%d').date()
+    if isinstance(value, datetime):
+        return value.date()
+    return value
+
+
+class FoodRepository:
+    """All queries the app runs, shared by the MySQL and SQLite versions"""
+    
+    dialect = None
+    integrity_errors = ()
+    backend_errors = ()
+    
+    def __init__(self, pool):
+        self.pool = pool
+        self.summary = DashboardSummary(self.dialect)
+        self.changes = ChangeFeed(self.dialect)
+        # Wakes change streams in this process as soon as a write commits
+        self._changed = threading.Condition()
+        # Rendered for this backend's placeholder style once, not per call
+        self.statements = {name: sql.replace('?', pool.paramstyle) for name, sql in STATEMENTS.items()}
+    
+    @contextmanager
+    def _connection(self):
+        """The request's pooled connection (or a fresh checkout outside a request)"""
+        try:
+            conn = request_connection(self.pool)
+        except (PoolTimeout,) + self.backend_errors as e:
+            print(f"Database connection error: {e}")
+            raise DatabaseUnavailable(str(e))
+        try:
+            yield conn
+        finally:
+            # Returns the connection unless it belongs to the request (released at teardown)
+            conn.close()
+    
+    def _cursor(self, conn, name):
+        """Cursor for running the named statement"""
+        return conn.cursor()
+    
+    def _execute(self, conn, name, params=()):
+        cursor = self._cursor(conn, name)
+        cursor.execute(self.statements[name], params)
+        return cursor
+    
+    def _fetchall(self, conn, name, params=()):
+        return self._execute(conn, name, params).fetchall()
+    
+    def _notify_change(self):
+        with self._changed:
+            self._changed.notify_all()
+    
+    @staticmethod
+    def _food_item(row, today, columns):
+        values = dict(zip(columns, row))
+        expiry_date = _to_date(values['expiry_date'])
+        values['expiry_date'] = expiry_date
+        if 'purchase_date' in values:
+            values['purchase_date'] = _to_date(values['purchase_date'])
+        # Status and days remaining are derived here, so reads never depend on the stored status
+        values['status'] = item_status(expiry_date, today)
+        values['days_remaining'] = (expiry_date - today).days
+        return FoodItem(**values)
+    
+    # Users
+    
+    def get_user_by_username(self, username):
+        with self._connection() as conn:
+            rows = self._fetchall(conn, 'user_by_username', (username,))
+        return User(*rows[0]) if rows else None
+    
+    def create_user(self, username, email, password_hash):
+        """Insert a user, returns False if the username or email is taken"""
+        with self._connection() as conn:
+            try:
+                self._execute(conn, 'insert_user', (username, email, password_hash))
+                conn.commit()
+            except self.integrity_errors:
+                conn.rollback()
+                return False
+        return True
+    
+    # Food items
+    
+    def list_items(self, user_id, limit=None, today=None):
+        """User's items soonest-expiring first, with status and days_remaining"""
+        today = today or date.today()
+        columns = ('id', 'food_name', 'expiry_date', 'purchase_date', 'category', 'quantity')
+        with self._connection() as conn:
+            if limit is None:
+                rows = self._fetchall(conn, 'items_for_user', (user_id,))
+            else:
+                rows = self._fetchall(conn, 'items_for_user_limited', (user_id, limit))
+        return [self._food_item(row, today, columns) for row in rows]
+    
+    def list_items_page(self, user_id, after=None, limit=PAGE_SIZE, status=None, category=None, today=None):
+        """One page of items in (expiry_date, id) order, optionally filtered by status and category.
+        Returns (items, cursor of the next page or None)"""
+        today = today or date.today()
+        first, last = status_window(status, today)
+        after_date, after_id = decode_cursor(after) if after else (date.min, 0)
+        params = [user_id]
+        name = 'items_page'
+        if category:
+            params.append(category)
+            name = 'items_page_category'
+        # One extra row tells whether another page follows
+        params += [max(first, after_date).isoformat(), last.isoformat(), after_date.isoformat(), after_id,
+                   limit + 1]
+        columns = ('id', 'food_name', 'expiry_date', 'purchase_date', 'category', 'quantity')
+        with self._connection() as conn:
+            rows = self._fetchall(conn, name, params)
+        items = [self._food_item(row, today, columns) for row in rows[:limit]]
+        next_cursor = encode_cursor(items[-1]) if len(rows) > limit else None
+        return items, next_cursor
+    
+    def items_expiring_between(self, user_id, start, end, limit=None, today=None):
+        """Items with start <= expiry_date <= end, soonest first"""
+        today = today or date.today()
+        with self._connection() as conn:
+            rows = self._fetchall(conn, 'items_expiring_between',
+                                  (user_id, start.isoformat(), end.isoformat(), limit or NO_LIMIT))
+        return [self._food_item(row, today, ('id', 'food_name', 'expiry_date')) for row in rows]
+    
+    def near_expiry_items(self, user_id, limit=None, today=None):
+        """Items expiring today or within NEAR_EXPIRY_DAYS"""
+        today = today or date.today()
+        return self.items_expiring_between(user_id, today, today + timedelta(days=NEAR_EXPIRY_DAYS),
+                                           limit, today)
+    
+    def unexpired_items(self, user_id, limit=None, today=None):
+        """Items that have not expired yet"""
+        today = today or date.today()
+        return self.items_expiring_between(user_id, today, date.max, limit, today)
+    
+    def get_item(self, user_id, food_id, today=None):
+        today = today or date.today()
+        columns = ('id', 'food_name', 'expiry_date', 'purchase_date', 'category', 'quantity')
+        with self._connection() as conn:
+            rows = self._fetchall(conn, 'item_by_id', (food_id, user_id))
+        return self._food_item(rows[0], today, columns) if rows else None
+    
+    def add_items(self, user_id, items, today=None):
+        """Insert dicts with food_name, expiry_date and optional purchase_date/category/quantity/
+        notes/image_path in one transaction, returns the number inserted"""
+        today = today or date.today()
+        rows = []
+        for item in items:
+            status = item_status(item['expiry_date'], today)
+            rows.append((user_id, item['food_name'], item['expiry_date'],
+                         item.get('purchase_date') or today.isoformat(), item.get('category') or 'Other',
+                         item.get('quantity', ''), item.get('notes', ''), item.get('image_path', ''), status))
+        if not rows:
+            return 0
+        
+        with self._connection() as conn:
+            cursor = conn.cursor()
+            try:
+                revision = self.changes.next_revision(cursor, user_id)
+                cursor.executemany(self.statements['insert_item'], [row + (revision,) for row in rows])
+                self.summary.record_added(cursor, [(row[0], row[4], row[8], row[2]) for row in rows])
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+            finally:
+                cursor.close()
+        self._notify_change()
+        return len(rows)
+    
+    def add_item(self, user_id, item, today=None):
+        return self.add_items(user_id, [item], today)
+    
+    def delete_item(self, user_id, food_id):
+        """Delete one of the user's items, returns False if it does not exist"""
+        with self._connection() as conn:
+            rows = self._fetchall(conn, 'item_by_id', (food_id, user_id))
+            if not rows:
+                return False
+            _, _, expiry_date, _, category, _, status = rows[0]
+            cursor = conn.cursor()
+            try:
+                revision = self.changes.next_revision(cursor, user_id)
+                cursor.execute(self.statements['delete_item'], (food_id, user_id))
+                self.changes.record_deleted(cursor, user_id, [food_id], revision)
+                self.summary.record_removed(cursor, [(user_id, category, status, expiry_date)])
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+            finally:
+                cursor.close()
+        self._notify_change()
+        return True
+    
+    def delete_items(self, user_id, ids=None, status=None, category=None, today=None):
+        """Delete the user's items by id list, or by status and/or category, in one transaction.
+        Returns the number deleted"""
+        today = today or date.today()
+        with self._connection() as conn:
+            cursor = conn.cursor()
+            try:
+                if ids is not None:
+                    rows = []
+                    ids = list(ids)
+                    for start in range(0, len(ids), DELETE_CHUNK_SIZE):
+                        chunk = ids[start:start + DELETE_CHUNK_SIZE]
+                        placeholders = ', '.join([self.pool.paramstyle] * len(chunk))
+                        cursor.execute(self.statements['items_to_delete_by_id'].format(ids=placeholders),
+                                       [user_id] + chunk)
+                        rows += cursor.fetchall()
+                else:
+                    first, last = status_window(status, today)
+                    if category:
+                        cursor.execute(self.statements['items_to_delete_between_category'],
+                                       (user_id, category, first.isoformat(), last.isoformat()))
+                    else:
+                        cursor.execute(self.statements['items_to_delete_between'],
+                                       (user_id, first.isoformat(), last.isoformat()))
+                    rows = cursor.fetchall()
+                if not rows:
+                    conn.rollback()
+                    return 0
+                
+                revision = self.changes.next_revision(cursor, user_id)
+                cursor.executemany(self.statements['delete_item'], [(row[0], user_id) for row in rows])
+                self.changes.record_deleted(cursor, user_id, [row[0] for row in rows], revision)
+                self.summary.record_removed(cursor, [(user_id,) + tuple(row[1:]) for row in rows])
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+            finally:
+                cursor.close()
+        self._notify_change()
+        return len(rows)
+    
+    # Change feed
+    
+    def current_revision(self, user_id):
+        with self._connection() as conn:
+            rows = self._fetchall(conn, 'user_revision', (user_id,))
+        return rows[0][0] if rows else 0
+    
+    def changes_since(self, user_id, since, today=None):
+        """Items written and ids deleted after revision since, as a JSON-ready dict. reset=True means
+        the client is too far behind (or too much changed) and should reload its list instead"""
+        today = today or date.today()
+        columns = ('id', 'food_name', 'expiry_date', 'purchase_date', 'category', 'quantity')
+        feed = {'revision': since, 'reset': False, 'items': [], 'deleted': []}
+        with self._connection() as conn:
+            rows = self._fetchall(conn, 'user_revision', (user_id,))
+            revision, pruned_through = rows[0] if rows else (0, 0)
+            # Unchanged users cost this one primary key lookup
+            if revision == since:
+                return feed
+            feed['revision'] = revision
+            if since < pruned_through or since > revision:
+                feed['reset'] = True
+                return feed
+            items = self._fetchall(conn, 'items_changed_since', (user_id, since, MAX_CHANGES + 1))
+            deleted = self._fetchall(conn, 'deletions_since', (user_id, since, MAX_CHANGES + 1))
+        if len(items) + len(deleted) > MAX_CHANGES:
+            feed['reset'] = True
+            return feed
+        feed['items'] = [food_item_dict(self._food_item(row, today, columns)) for row in items]
+        feed['deleted'] = [row[0] for row in deleted]
+        return feed
+    
+    def wait_for_change(self, timeout):
+        """Block until a write commits in this process or timeout seconds pass"""
+        with self._changed:
+            self._changed.wait(timeout)
+    
+    def dashboard(self, user_id, today=None):
+        """(stats, category_data, monthly_trend) from the summary table"""
+        with self._connection() as conn:
+            cursor = conn.cursor()
+            try:
+                return self.summary.load(cursor, user_id, today)
+            finally:
+                cursor.close()
+
+
+class SQLiteRepository(FoodRepository):
+    """SQLite backend; sqlite3 keeps compiled statements per connection (cached_statements)"""
+    
+    dialect = 'sqlite'
+    integrity_errors = (sqlite3.IntegrityError,)
+    backend_errors = (sqlite3.Error,)
+    
+    def init_schema(self):
+        """Create tables and indexes (database.sql is the MySQL equivalent)"""
+        with self._connection() as conn:
+            conn.executescript('''
+                CREATE TABLE IF NOT EXISTS users (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    username TEXT UNIQUE NOT NULL,
+                    email TEXT UNIQUE NOT NULL,
+                    password_hash TEXT NOT NULL,
+                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                );
+                
+                CREATE TABLE IF NOT EXISTS food_items (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    user_id INTEGER NOT NULL,
+                    food_name TEXT NOT NULL,
+                    expiry_date DATE NOT NULL,
+                    purchase_date DATE DEFAULT (date('now')),
+                    image_path TEXT,
+                    status TEXT DEFAULT 'Fresh',
+                    category TEXT,
+                    quantity TEXT,
+                    notes TEXT,
+                    revision INTEGER NOT NULL DEFAULT 0,
+                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
+                );
+                
+                CREATE TABLE IF NOT EXISTS categories (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    name TEXT UNIQUE NOT NULL,
+                    description TEXT
+                );
+                
+                -- One row per item and kind, filled by the notification engine
+                CREATE TABLE IF NOT EXISTS notifications (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    user_id INTEGER NOT NULL,
+                    food_item_id INTEGER NOT NULL,
+                    kind TEXT NOT NULL DEFAULT 'near_expiry',
+                    message TEXT NOT NULL,
+                    is_sent INTEGER DEFAULT 0,
+                    sent_at TIMESTAMP,
+                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE,
+                    FOREIGN KEY (food_item_id) REFERENCES food_items(id) ON DELETE CASCADE
+                );
+                CREATE UNIQUE INDEX IF NOT EXISTS idx_notifications_item_kind ON notifications(food_item_id, kind);
+                CREATE INDEX IF NOT EXISTS idx_notifications_unsent ON notifications(is_sent, user_id);
+                
+                -- Per-user lists ordered/ranged by (expiry date, id), covering food_name for the
+                -- near-expiry lists, and the notification engine's expiry date ranges
+                DROP INDEX IF EXISTS idx_food_user_expiry;
+                CREATE INDEX IF NOT EXISTS idx_food_user_expiry_id ON food_items(user_id, expiry_date, id, food_name);
+                CREATE INDEX IF NOT EXISTS idx_food_expiry_status ON food_items(expiry_date, status);
+                
+                -- Dashboard counters (see dashboard_summary.py)
+                CREATE TABLE IF NOT EXISTS dashboard_summary (
+                    user_id INTEGER NOT NULL,
+                    dimension TEXT NOT NULL,
+                    bucket TEXT NOT NULL,
+                    item_count INTEGER NOT NULL DEFAULT 0,
+                    PRIMARY KEY (user_id, dimension, bucket)
+                );
+                
+                -- Change feed (see change_feed.py)
+                CREATE TABLE IF NOT EXISTS user_revisions (
+                    user_id INTEGER PRIMARY KEY,
+                    revision INTEGER NOT NULL DEFAULT 0,
+                    pruned_through INTEGER NOT NULL DEFAULT 0
+                );
+                CREATE TABLE IF NOT EXISTS food_deletions (
+                    user_id INTEGER NOT NULL,
+                    food_item_id INTEGER NOT NULL,
+                    revision INTEGER NOT NULL,
+                    deleted_at TIMESTAMP NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS idx_food_deletions_user_revision ON food_deletions(user_id, revision);
+                CREATE INDEX IF NOT EXISTS idx_food_deletions_deleted_at ON food_deletions(deleted_at);
+            ''')
+            # Databases created before the change feed have no revision column
+            columns = [row[1] for row in conn.execute('PRAGMA table_info(food_items)')]
+            if 'revision' not in columns:
+                conn.execute('ALTER TABLE food_items ADD COLUMN revision INTEGER NOT NULL DEFAULT 0')
+            conn.execute('CREATE INDEX IF NOT EXISTS idx_food_user_revision ON food_items(user_id, revision)')
+            conn.executemany('INSERT OR IGNORE INTO categories (name, description) VALUES (?, ?)',
+                             DEFAULT_CATEGORIES)
+            conn.commit()
+            
+            # Fill the counters for databases created before the summary table existed, or while it still
+            # counted stored statuses rather than expiry dates
+            has_summary = conn.execute(
+                "SELECT 1 FROM dashboard_summary WHERE dimension = 'expiry_date' LIMIT 1").fetchone()
+            has_status_buckets = conn.execute(
+                "SELECT 1 FROM dashboard_summary WHERE dimension IN ('status', 'expired_month') LIMIT 1"
+            ).fetchone()
+            has_items = conn.execute('SELECT 1 FROM food_items LIMIT 1').fetchone()
+            if (has_items and not has_summary) or has_status_buckets:
+                self.summary.rebuild(conn)
+
+
+class MySQLRepository(FoodRepository):
+    """MySQL backend with server-side prepared statements reused per connection"""
+    
+    dialect = 'mysql'
+    
+    def __init__(self, pool):
+        if mysql is None:
+            raise RuntimeError("mysql-connector-python is not installed")
+        self.integrity_errors = (mysql.connector.IntegrityError,)
+        self.backend_errors = (mysql.connector.Error,)
+        super().__init__(pool)
+        # connection -> (server connection id, {statement name: prepared cursor})
+        self._prepared = weakref.WeakKeyDictionary()
+    
+    def _cursor(self, conn, name):
+        raw = conn.raw_connection
+        connection_id = raw.connection_id
+        cached = self._prepared.get(raw)
+        if cached is None or cached[0] != connection_id:
+            # New connection, or a health check reconnected it and dropped its prepared statements
+            cached = (connection_id, {})
+            self._prepared[raw] = cached
+        cursors = cached[1]
+        if name not in cursors:
+            cursors[name] = raw.cursor(prepared=True)
+        return cursors[name]
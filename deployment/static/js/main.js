@@ -1,5 +1,9 @@
 // Main JavaScript for Food Expiry Tracker
 
+// OCR job polling
+const OCR_POLL_INTERVAL_MS = 1000;
+const OCR_POLL_MAX_ATTEMPTS = 60;
+
 // Upload Area Functionality
 document.addEventListener('DOMContentLoaded', function() {
     const uploadArea = document.getElementById('uploadArea');
@@ -97,27 +101,34 @@ document.addEventListener('DOMContentLoaded', function() {
         })
         .then(response => response.json())
         .then(data => {
-            if (data.success) {
-                // Auto-fill form
-                if (data.food_name) {
-                    foodNameInput.value = data.food_name;
-                }
-                if (data.expiry_date) {
-                    expiryDateInput.value = data.expiry_date;
-                }
+            if (data.job_id) {
                 if (data.image_path) {
                     imagePathInput.value = data.image_path;
                 }
-                
-                showOCRStatus('success', '✓ ' + data.message);
+                pollOCRStatus(data.job_id, 0);
             } else {
-                if (data.image_path) {
-                    imagePathInput.value = data.image_path;
-                }
-                if (data.food_name) {
-                    foodNameInput.value = data.food_name;
-                }
-                showOCRStatus('warning', '⚠ ' + data.message);
+                handleOCRResult(data);
+            }
+        })
+        .catch(error => {
+            showOCRStatus('error', '✗ Error processing image: ' + error);
+        });
+    }
+
+    // Poll a queued OCR job until its result is ready
+    function pollOCRStatus(jobId, attempt) {
+        if (attempt >= OCR_POLL_MAX_ATTEMPTS) {
+            showOCRStatus('warning', '⚠ OCR is taking too long. Please enter details manually.');
+            return;
+        }
+
+        fetch(`/upload/status/${jobId}`)
+        .then(response => response.json())
+        .then(data => {
+            if (data.status === 'pending') {
+                setTimeout(() => pollOCRStatus(jobId, attempt + 1), OCR_POLL_INTERVAL_MS);
+            } else {
+                handleOCRResult(data);
             }
         })
         .catch(error => {
@@ -125,6 +136,54 @@ document.addEventListener('DOMContentLoaded', function() {
         });
     }
 
+    // Fill the form from an OCR result
+    function handleOCRResult(data) {
+        if (data.success) {
+            // Auto-fill form
+            if (data.food_name) {
+                foodNameInput.value = data.food_name;
+            }
+            if (data.expiry_date) {
+                expiryDateInput.value = data.expiry_date;
+            }
+            if (data.image_path) {
+                imagePathInput.value = data.image_path;
+            }
+            
+            showOCRStatus('success', '✓ ' + data.message + candidateButtons(data.candidates, data.expiry_date));
+        } else {
+            if (data.image_path) {
+                imagePathInput.value = data.image_path;
+            }
+            if (data.food_name) {
+                foodNameInput.value = data.food_name;
+            }
+            showOCRStatus('warning', '⚠ ' + data.message + candidateButtons(data.candidates, null));
+        }
+    }
+
+    // Other ranked dates the OCR found, offered as one-click alternatives
+    function candidateButtons(candidates, chosen) {
+        const others = (candidates || []).filter(c => c.date !== chosen);
+        if (others.length === 0) {
+            return '';
+        }
+        const buttons = others.map(c =>
+            `<button type="button" class="btn btn-sm btn-outline-secondary ms-1 ocr-candidate" data-date="${c.date}">${c.date}</button>`
+        ).join('');
+        return `<div class="mt-2"><small>Other dates found:</small>${buttons}</div>`;
+    }
+
+    // Use an alternative OCR date
+    if (ocrStatus) {
+        ocrStatus.addEventListener('click', function(e) {
+            const button = e.target.closest('.ocr-candidate');
+            if (button) {
+                expiryDateInput.value = button.getAttribute('data-date');
+            }
+        });
+    }
+
     // Show OCR status
     function showOCRStatus(type, message) {
         const alertClass = {
@@ -155,7 +214,7 @@ function deleteFood(foodId) {
         .then(response => response.json())
         .then(data => {
             if (data.success) {
-                location.reload();
+                removeFoodRow(foodId);
             } else {
                 alert('Error deleting item: ' + data.message);
             }
@@ -196,18 +255,87 @@ Object.keys(filterButtons).forEach(buttonId => {
     }
 });
 
-function filterTable(status) {
+// Food list: first page is rendered by /index, filters and further pages come from /api/food_items
+let currentStatusFilter = null;
+
+function escapeHTML(text) {
+    const div = document.createElement('div');
+    div.textContent = text == null ? '' : String(text);
+    return div.innerHTML;
+}
+
+function foodRowHTML(item) {
+    const daysLeft = item.days_remaining >= 0 ? `${item.days_remaining} days` : `${-item.days_remaining} days ago`;
+    const badgeClass = {'Fresh': 'bg-success', 'Near Expiry': 'bg-warning'}[item.status] || 'bg-danger';
+    return `
+        <tr data-status="${escapeHTML(item.status)}" data-food-id="${item.id}" data-expiry="${escapeHTML(item.expiry_date)}">
+            <td><strong>${escapeHTML(item.food_name)}</strong></td>
+            <td>${escapeHTML(item.category)}</td>
+            <td>${escapeHTML(item.quantity || '-')}</td>
+            <td>${escapeHTML(item.purchase_date || '-')}</td>
+            <td>${escapeHTML(item.expiry_date)}</td>
+            <td>${daysLeft}</td>
+            <td><span class="badge ${badgeClass}">${escapeHTML(item.status)}</span></td>
+            <td>
+                <button class="btn btn-sm btn-danger delete-btn" data-food-id="${item.id}">
+                    <i class="fas fa-trash"></i>
+                </button>
+            </td>
+        </tr>
+    `;
+}
+
+// Show the table once it has rows (or a filter is applied), the "no items" message otherwise
+function updateEmptyState() {
     const table = document.getElementById('foodTable');
-    if (!table) return;
+    const empty = !currentStatusFilter && !table.querySelector('tbody tr');
+    document.getElementById('foodTableWrapper').classList.toggle('d-none', empty);
+    document.getElementById('emptyFoodMessage').classList.toggle('d-none', !empty);
+}
+
+// Replace the list (after = null) or append the page following the cursor
+function loadFoodItems(status, after) {
+    const table = document.getElementById('foodTable');
+    if (!table) return Promise.resolve();
     
-    const rows = table.querySelectorAll('tbody tr');
+    const params = new URLSearchParams();
+    if (status) params.set('status', status);
+    if (after) params.set('after', after);
     
-    rows.forEach(row => {
-        if (status === null) {
-            row.style.display = '';
-        } else {
-            const rowStatus = row.getAttribute('data-status');
-            row.style.display = rowStatus === status ? '' : 'none';
+    // Unchanged pages come back as 304 and are served from the browser cache (ETag)
+    return fetch(`/api/food_items?${params}`)
+        .then(response => response.json())
+        .then(data => {
+            if (!data.success) return;
+            const tbody = table.querySelector('tbody');
+            if (!after) {
+                tbody.innerHTML = '';
+            }
+            tbody.insertAdjacentHTML('beforeend', data.items.map(foodRowHTML).join(''));
+            table.setAttribute('data-next-cursor', data.next_cursor || '');
+            const loadMore = document.getElementById('loadMoreItems');
+            if (loadMore) {
+                loadMore.classList.toggle('d-none', !data.next_cursor);
+            }
+            updateEmptyState();
+        })
+        .catch(error => {
+            console.error('Food list error:', error);
+        });
+}
+
+function filterTable(status) {
+    currentStatusFilter = status;
+    loadFoodItems(status, null);
+}
+
+const loadMoreButton = document.getElementById('loadMoreItems');
+if (loadMoreButton) {
+    loadMoreButton.addEventListener('click', function() {
+        const table = document.getElementById('foodTable');
+        const cursor = table.getAttribute('data-next-cursor');
+        if (cursor) {
+            loadFoodItems(currentStatusFilter, cursor);
         }
     });
 }
@@ -271,31 +399,42 @@ function searchTable() {
     });
 }
 
-// Export to CSV (optional feature)
+// Export to CSV (streamed by the server, includes items not loaded in the table)
 function exportToCSV() {
-    const table = document.getElementById('foodTable');
-    if (!table) return;
-    
-    let csv = [];
-    const rows = table.querySelectorAll('tr');
+    window.location.href = '/export/food_items.csv';
+}
+
+// Delete every expired item in one request
+function clearExpired() {
+    if (!confirm('Delete all expired items?')) return;
     
-    rows.forEach(row => {
-        const cols = row.querySelectorAll('td, th');
-        const rowData = [];
-        cols.forEach(col => {
-            rowData.push(col.textContent.trim());
-        });
-        csv.push(rowData.join(','));
+    fetch('/delete_food/batch', {
+        method: 'POST',
+        headers: {'Content-Type': 'application/json'},
+        body: JSON.stringify({status: 'Expired'})
+    })
+    .then(response => response.json())
+    .then(data => {
+        if (data.success) {
+            document.querySelectorAll('#foodTable tr[data-status="Expired"]').forEach(row => row.remove());
+            updateEmptyState();
+        } else {
+            alert('Error deleting items: ' + data.message);
+        }
+    })
+    .catch(error => {
+        alert('Error: ' + error);
     });
-    
-    const csvContent = csv.join('\n');
-    const blob = new Blob([csvContent], { type: 'text/csv' });
-    const url = window.URL.createObjectURL(blob);
-    const a = document.createElement('a');
-    a.href = url;
-    a.download = 'food_items_' + new Date().toISOString().split('T')[0] + '.csv';
-    a.click();
-    window.URL.revokeObjectURL(url);
+}
+
+const clearExpiredButton = document.getElementById('clearExpired');
+if (clearExpiredButton) {
+    clearExpiredButton.addEventListener('click', clearExpired);
+}
+
+const exportCSVButton = document.getElementById('exportCSV');
+if (exportCSVButton) {
+    exportCSVButton.addEventListener('click', exportToCSV);
 }
 
 // Dark mode toggle (optional)
@@ -309,9 +448,88 @@ if (localStorage.getItem('darkMode') === 'true') {
     document.body.classList.add('dark-mode');
 }
 
-// Auto-refresh status every 5 minutes
-setInterval(() => {
-    if (window.location.pathname === '/index') {
-        location.reload();
+// Live updates: apply /api/changes to the table instead of reloading the page
+const CHANGES_POLL_INTERVAL_MS = 60 * 1000;
+const CHANGES_STREAM_MAX_ERRORS = 3;
+
+function removeFoodRow(foodId) {
+    const row = document.querySelector(`#foodTable tr[data-food-id="${foodId}"]`);
+    if (row) {
+        row.remove();
+    }
+}
+
+// Insert or replace one item's row at its (expiry_date, id) position
+function upsertFoodRow(item) {
+    const table = document.getElementById('foodTable');
+    removeFoodRow(item.id);
+    if (currentStatusFilter && item.status !== currentStatusFilter) {
+        return;
+    }
+    
+    const tbody = table.querySelector('tbody');
+    const following = Array.from(tbody.querySelectorAll('tr')).find(row => {
+        const expiry = row.getAttribute('data-expiry');
+        return expiry > item.expiry_date ||
+            (expiry === item.expiry_date && Number(row.getAttribute('data-food-id')) > item.id);
+    });
+    if (following) {
+        following.insertAdjacentHTML('beforebegin', foodRowHTML(item));
+    } else if (!table.getAttribute('data-next-cursor')) {
+        // Past the last loaded row only when there is no further page that will bring it
+        tbody.insertAdjacentHTML('beforeend', foodRowHTML(item));
+    }
+}
+
+function applyChanges(feed) {
+    const table = document.getElementById('foodTable');
+    if (feed.reset) {
+        loadFoodItems(currentStatusFilter, null);
+    } else {
+        feed.deleted.forEach(removeFoodRow);
+        feed.items.forEach(upsertFoodRow);
+        updateEmptyState();
+    }
+    table.setAttribute('data-revision', feed.revision);
+}
+
+function pollChanges() {
+    const table = document.getElementById('foodTable');
+    fetch(`/api/changes?since=${table.getAttribute('data-revision')}`)
+        .then(response => response.json())
+        .then(data => {
+            if (data.success) {
+                applyChanges(data);
+            }
+        })
+        .catch(error => {
+            console.error('Change poll error:', error);
+        });
+}
+
+function watchChanges() {
+    const table = document.getElementById('foodTable');
+    if (!table) return;
+    
+    if (!window.EventSource) {
+        setInterval(pollChanges, CHANGES_POLL_INTERVAL_MS);
+        return;
     }
-}, 5 * 60 * 1000);
+    
+    // The stream reconnects by itself (sending Last-Event-ID); fall back to polling if it keeps failing
+    let errors = 0;
+    const source = new EventSource(`/api/changes/stream?since=${table.getAttribute('data-revision')}`);
+    source.addEventListener('changes', function(e) {
+        errors = 0;
+        applyChanges(JSON.parse(e.data));
+    });
+    source.onerror = function() {
+        errors += 1;
+        if (errors >= CHANGES_STREAM_MAX_ERRORS) {
+            source.close();
+            setInterval(pollChanges, CHANGES_POLL_INTERVAL_MS);
+        }
+    };
+}
+
+watchChanges();
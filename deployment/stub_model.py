@@ -0,0 +1,165 @@
+import argparse
+import codecs
+import json
+import time
+import urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+DEFAULT_URL = 'http://127.0.0.1:8808'
+
+
+def stub_recipe(ingredients, dietary_preferences=None):
+    """Deterministic recipe in the shape the AI assistant returns"""
+    main = ingredients[0].title() if ingredients else 'Pantry'
+    quick = bool(dietary_preferences)
+    return {
+        'recipe_name': f"{'Quick ' if quick else ''}{main} Skillet",
+        'description': f"A stub recipe using {', '.join(ingredients) or 'whatever is left'}.",
+        'cooking_time': '15 minutes' if quick else '35 minutes',
+        'servings': '2',
+        'difficulty': 'Easy',
+        'ingredients': list(ingredients) + ['salt', 'olive oil'],
+        'instructions': [f"Prepare the {ingredient}." for ingredient in ingredients] + ['Cook and serve.'],
+        'tips': 'Generated by the stub model server.'
+    }
+
+
+class StubModelHandler(BaseHTTPRequestHandler):
+    """Answers the assistant's calls after a configurable delay; /chat streams its reply word by word"""
+    
+    protocol_version = 'HTTP/1.1'
+    
+    def do_POST(self):
+        payload = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))) or b'{}')
+        if self.path == '/chat':
+            self.stream_chat(payload)
+            return
+        
+        time.sleep(self.server.latency)
+        if self.path == '/recipe':
+            body = stub_recipe(payload.get('ingredients', []), payload.get('dietary_preferences'))
+        elif self.path == '/storage-tip':
+            body = {'advice': f"Keep {payload.get('food_name', 'it')} sealed and refrigerated."}
+        elif self.path == '/quick-tip':
+            body = {'tip': f"Use {payload.get('food_name', 'it')} within a few days of opening."}
+        elif self.path == '/meal-plan':
+            names = ', '.join(item['name'] for item in payload.get('items', [])) or 'your pantry'
+            body = {'meal_plan': f"Monday to Sunday: meals built around {names}."}
+        else:
+            self.send_error(404)
+            return
+        data = json.dumps(body).encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+    
+    def stream_chat(self, payload):
+        items = [item['food_name'] for item in payload.get('context', {}).get('food_items', [])]
+        reply = (f"You asked: {payload.get('message', '')}. You have {len(items)} items"
+                 f"{': ' + ', '.join(items) if items else ''}. Use the ones expiring soonest first.")
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/plain; charset=utf-8')
+        self.send_header('Transfer-Encoding', 'chunked')
+        self.end_headers()
+        time.sleep(self.server.latency)
+        for index, word in enumerate(reply.split(' ')):
+            data = (word if index == 0 else ' ' + word).encode('utf-8')
+            self.wfile.write(f"{len(data):X}\r\n".encode('ascii') + data + b"\r\n")
+            self.wfile.flush()
+            time.sleep(self.server.token_delay)
+        self.wfile.write(b"0\r\n\r\n")
+    
+    def log_message(self, format, *args):
+        pass
+
+
+def serve(port=8808, latency=1.0, token_delay=0.05):
+    server = ThreadingHTTPServer(('127.0.0.1', port), StubModelHandler)
+    server.daemon_threads = True
+    server.latency = latency
+    server.token_delay = token_delay
+    return server
+
+
+class StubModelAssistant:
+    """Drop-in for FoodAIAssistant that talks to the stub server, for testing the AI routes offline"""
+    
+    def __init__(self, base_url=DEFAULT_URL, timeout=30):
+        self.base_url = base_url.rstrip('/')
+        self.timeout = timeout
+    
+    def _open(self, path, payload):
+        request = urllib.request.Request(self.base_url + path, data=json.dumps(payload).encode('utf-8'),
+                                         headers={'Content-Type': 'application/json'})
+        return urllib.request.urlopen(request, timeout=self.timeout)
+    
+    def _post(self, path, payload):
+        with self._open(path, payload) as response:
+            return json.loads(response.read())
+    
+    def stream_chat(self, message, context):
+        """Yield the reply text as the server sends it"""
+        decoder = codecs.getincrementaldecoder('utf-8')()
+        with self._open('/chat', {'message': message, 'context': context}) as response:
+            while True:
+                data = response.read1(4096)
+                if not data:
+                    break
+                text = decoder.decode(data)
+                if text:
+                    yield text
+    
+    def chat_with_assistant(self, message, context):
+        try:
+            return {'success': True, 'response': ''.join(self.stream_chat(message, context))}
+        except OSError as e:
+            return {'success': False, 'response': f"Stub model error: {e}"}
+    
+    def generate_recipe_from_ingredients(self, ingredients, dietary_preferences=None):
+        try:
+            return self._post('/recipe', {'ingredients': ingredients,
+                                          'dietary_preferences': dietary_preferences})
+        except OSError as e:
+            print(f"Stub model error: {e}")
+            return None
+    
+    def get_food_storage_advice(self, food_name):
+        try:
+            return {'success': True, 'advice': self._post('/storage-tip', {'food_name': food_name})['advice']}
+        except OSError as e:
+            return {'success': False, 'advice': f"Stub model error: {e}"}
+    
+    def suggest_meals_for_week(self, available_items):
+        try:
+            meal_plan = self._post('/meal-plan', {'items': available_items})['meal_plan']
+            return {'success': True, 'meal_plan': meal_plan}
+        except OSError as e:
+            return {'success': False, 'meal_plan': f"Stub model error: {e}"}
+    
+    def get_quick_tip(self, food_name):
+        try:
+            return self._post('/quick-tip', {'food_name': food_name})['tip']
+        except OSError as e:
+            return f"Stub model error: {e}"
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description='Local stand-in for the AI model API; run the SQLite app with AI_BACKEND=stub.')
+    parser.add_argument('--port', type=int, default=8808)
+    parser.add_argument('--latency', type=float, default=1.0, help='seconds before each answer starts')
+    parser.add_argument('--token-delay', type=float, default=0.05, help='seconds between streamed chat words')
+    args = parser.parse_args(argv)
+    
+    server = serve(args.port, args.latency, args.token_delay)
+    print(f"Stub model server on http://127.0.0.1:{args.port} (latency {args.latency}s)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()